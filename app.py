@@ -1,11 +1,28 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from flask_mysqldb import MySQL
-from werkzeug.security import generate_password_hash, check_password_hash
-from functools import wraps
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context, send_from_directory
 from datetime import datetime, timedelta
 import os
+import io
+import csv
+import json
+import logging
+import time
+import uuid
+
+import click
+import MySQLdb.cursors
+
+from config import Config
+from utils.db_pool import MySQLPool, PoolAgotado
+from utils.checkout import consolidar_items, verificar_stock, registrar_detalles, descontar_stock
+from utils.movimientos import (consolidar_lineas, registrar_entrada, verificar_salida, registrar_salida,
+                               verificar_traslado, registrar_traslado)
+from utils import resumen_ventas, resumen_inventario, catalogos, busqueda, codigos, stock, reservas, exportacion, perfil_sql, metricas, importacion, trabajos, diario_ventas, auth, sesiones, versiones, fragmentos, serializacion
+from utils.auth import login_required, admin_required
+from utils.reservas import StockInsuficiente, ejecutar_transaccion, ER_DUP_ENTRY
+from utils.paginacion import codificar_cursor, decodificar_cursor, limite_pagina
 
 app = Flask(__name__)
+app.config.from_object(Config)
 app.secret_key = os.environ.get('SECRET_KEY', 'tu-clave-secreta-super-segura-cambiar-en-produccion')
 
 # Configuración de MySQL
@@ -15,30 +32,43 @@ app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', 'admin')
 app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'proyecto')
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
 
-mysql = MySQL(app)
-
-# Decorador para requerir login
-def login_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Debes iniciar sesión para acceder a esta página', 'warning')
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return decorated_function
-
-# Decorador para requerir rol de administrador
-def admin_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            flash('Debes iniciar sesión para acceder a esta página', 'warning')
-            return redirect(url_for('login'))
-        if session.get('rol_id') != 1:
-            flash('No tienes permisos para acceder a esta página', 'danger')
-            return redirect(url_for('index'))
-        return f(*args, **kwargs)
-    return decorated_function
+mysql = MySQLPool(app)
+perfil_sql.init_app(app)
+metricas.init_app(app)
+sesiones.init_app(app, mysql)
+
+# Métricas de negocio y del pool (utils/metricas.py)
+metricas.definir('pos_ventas_total', 'counter', 'Ventas registradas')
+metricas.definir('pos_ventas_monto_total', 'counter', 'Monto vendido')
+metricas.definir('pos_items_por_venta', 'histogram', 'Líneas de producto por venta',
+                 buckets=metricas.BUCKETS_ITEMS)
+metricas.definir('pos_unidades_vendidas_total', 'counter', 'Unidades vendidas')
+metricas.definir('pos_ventas_rechazadas_total', 'counter', 'Ventas rechazadas por falta de stock')
+metricas.definir('pos_db_pool_conexiones', 'gauge', 'Conexiones del pool por estado (suma de workers)')
+metricas.definir('pos_db_pool_timeouts_total', 'counter', 'Esperas de conexión vencidas')
+
+def recolectar_pool():
+    if mysql._pool is None:
+        return
+    datos = mysql._pool.metricas()
+    metricas.fijar('pos_db_pool_conexiones', datos['en_uso'], estado='en_uso')
+    metricas.fijar('pos_db_pool_conexiones', datos['libres'], estado='libres')
+    metricas.fijar('pos_db_pool_timeouts_total', datos['timeouts'])
+
+metricas.registrar_recolector(recolectar_pool)
+
+metricas.definir('pos_ventas_diario_total', 'counter', 'Ventas anotadas en el diario local')
+# Todos los workers leen el mismo diario: se toma el máximo, no la suma
+metricas.definir('pos_ventas_diario', 'gauge', 'Ventas del diario local por estado', agregacion='max')
+
+def recolectar_diario():
+    if diario_ventas.modo() == diario_ventas.MODO_DIRECTO:
+        return
+    conteo = diario_ventas.contar()
+    for estado in (diario_ventas.PENDIENTE, diario_ventas.CONFLICTO):
+        metricas.fijar('pos_ventas_diario', conteo.get(estado, 0), estado=estado.lower())
+
+metricas.registrar_recolector(recolectar_diario)
 
 @app.context_processor
 def utility_processor():
@@ -84,17 +114,30 @@ def login():
             user = cur.fetchone()
             cur.close()
             
-            if user and check_password_hash(user['ContrasenaHash'], password):
+            valida, nuevo_hash = (auth.verificar_login(user['ContrasenaHash'], password)
+                                  if user else (False, None))
+            if valida:
+                if nuevo_hash:
+                    # Cambiaron PASSWORD_METODO o su costo: se regenera con la contraseña ya verificada
+                    cur = mysql.connection.cursor()
+                    cur.execute("UPDATE Usuarios SET ContrasenaHash = %s WHERE ID_Usuario = %s",
+                                (nuevo_hash, user['ID_Usuario']))
+                    mysql.connection.commit()
+                    cur.close()
                 session['user_id'] = user['ID_Usuario']
                 session['username'] = user['NombreUsuario']
                 session['rol_id'] = user['Rol_ID']
                 session['rol_nombre'] = user['Nombre_Rol']
+                sesiones.recordar_permisos(user['ID_Usuario'], user['Rol_ID'], user['Nombre_Rol'])
                 flash(f'Bienvenido {username}', 'success')
                 return redirect(url_for('index'))
             else:
                 # Log del intento fallido (opcional)
                 flash('Usuario o contraseña incorrectos', 'danger')
                 
+        except auth.VerificacionSaturada:
+            flash('Hay muchos inicios de sesión en curso, intente de nuevo en unos segundos', 'warning')
+            return render_template('login.html'), 503
         except Exception as e:
             flash('Error en el sistema, por favor intente más tarde', 'danger')
             # Log del error real para administradores
@@ -114,22 +157,20 @@ def logout():
 def dashboard():
     cur = mysql.connection.cursor()
     
-    # Obtener estadísticas
+    # Obtener estadísticas (desde los resúmenes diarios, ver utils/resumen_ventas.py)
     # Total de ventas del día
     cur.execute("""
         SELECT COALESCE(SUM(Total), 0) as total_dia
-        FROM Facturacion
-        WHERE DATE(Fecha) = CURDATE() AND Estado = 1
+        FROM Resumen_Ventas_Diario
+        WHERE Fecha = CURDATE()
     """)
     ventas_dia = cur.fetchone()['total_dia']
     
     # Total de ventas del mes
     cur.execute("""
         SELECT COALESCE(SUM(Total), 0) as total_mes
-        FROM Facturacion
-        WHERE MONTH(Fecha) = MONTH(CURDATE()) 
-        AND YEAR(Fecha) = YEAR(CURDATE()) 
-        AND Estado = 1
+        FROM Resumen_Ventas_Diario
+        WHERE Fecha >= CURDATE() - INTERVAL (DAYOFMONTH(CURDATE()) - 1) DAY AND Fecha <= CURDATE()
     """)
     ventas_mes = cur.fetchone()['total_mes']
     
@@ -149,24 +190,26 @@ def dashboard():
     
     # Ventas de los últimos 7 días
     cur.execute("""
-        SELECT DATE(Fecha) as fecha, COALESCE(SUM(Total), 0) as total
-        FROM Facturacion
-        WHERE Fecha >= DATE_SUB(CURDATE(), INTERVAL 7 DAY) AND Estado = 1
-        GROUP BY DATE(Fecha)
+        SELECT Fecha as fecha, Total as total
+        FROM Resumen_Ventas_Diario
+        WHERE Fecha >= DATE_SUB(CURDATE(), INTERVAL 7 DAY)
         ORDER BY fecha ASC
     """)
     ventas_semana = cur.fetchall()
     
     # Productos más vendidos
     cur.execute("""
-        SELECT p.Descripcion, SUM(df.Cantidad) as total_vendido
-        FROM Detalle_Facturacion df
-        INNER JOIN Productos p ON df.ID_Producto = p.ID_Producto
-        INNER JOIN Facturacion f ON df.ID_Factura = f.ID_Factura
-        WHERE f.Fecha >= DATE_SUB(CURDATE(), INTERVAL 30 DAY) AND f.Estado = 1
-        GROUP BY p.ID_Producto, p.Descripcion
-        ORDER BY total_vendido DESC
-        LIMIT 5
+        SELECT p.Descripcion, r.total_vendido
+        FROM (
+            SELECT ID_Producto, SUM(Cantidad) as total_vendido
+            FROM Resumen_Ventas_Producto
+            WHERE Fecha >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+            GROUP BY ID_Producto
+            ORDER BY total_vendido DESC
+            LIMIT 5
+        ) r
+        INNER JOIN Productos p ON r.ID_Producto = p.ID_Producto
+        ORDER BY r.total_vendido DESC
     """)
     productos_mas_vendidos = cur.fetchall()
     
@@ -188,18 +231,26 @@ def dashboard():
 @app.route('/productos')
 @admin_required
 def productos():
-    cur = mysql.connection.cursor()
-    cur.execute("""
-        SELECT p.*, c.Descripcion as Categoria, u.Descripcion as Unidad, u.Abreviatura
-        FROM Productos p
-        LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
-        LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
-        WHERE p.Estado = 1
-        ORDER BY p.Descripcion
-    """)
-    productos = cur.fetchall()
-    cur.close()
-    return render_template('productos/lista.html', productos=productos)
+    def cargar():
+        cur = mysql.connection.cursor()
+        cur.execute("""
+            SELECT p.*, c.Descripcion as Categoria, u.Descripcion as Unidad, u.Abreviatura
+            FROM Productos p
+            LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
+            LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
+            WHERE p.Estado = 1
+            ORDER BY p.Descripcion
+        """)
+        productos = cur.fetchall()
+        cur.close()
+        return {'productos': productos}
+    
+    # La tabla se cachea por versión de los datos que muestra (utils/fragmentos.py); las
+    # existencias cambian con cada movimiento
+    dependencias = (versiones.PRODUCTOS, versiones.CATALOGOS, versiones.MOVIMIENTOS)
+    return fragmentos.condicional(fragmentos.version(*dependencias), lambda: render_template(
+        'productos/lista.html',
+        tabla=fragmentos.renderizar('productos/_tabla.html', dependencias, cargar)))
 
 @app.route('/productos/nuevo', methods=['GET', 'POST'])
 @admin_required
@@ -211,30 +262,60 @@ def producto_nuevo():
         costo_promedio = request.form.get('costo_promedio', 0)
         categoria_id = request.form['categoria_id']
         stock_minimo = request.form.get('stock_minimo', 5)
+        codigo_barras = request.form.get('codigo_barras', '').strip() or None
         
         cur = mysql.connection.cursor()
         cur.execute("""
-            INSERT INTO Productos (Descripcion, Unidad_Medida, Precio_Venta, Costo_Promedio, 
+            INSERT INTO Productos (Descripcion, Codigo_Barras, Unidad_Medida, Precio_Venta, Costo_Promedio, 
                                  Categoria_ID, Stock_Minimo, Usuario_Creador)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (descripcion, unidad_medida, precio_venta, costo_promedio, categoria_id, 
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        """, (descripcion, codigo_barras, unidad_medida, precio_venta, costo_promedio, categoria_id, 
               stock_minimo, session['user_id']))
+        producto_id = cur.lastrowid
         mysql.connection.commit()
+        versiones.incrementar(mysql.connection, versiones.PRODUCTOS)
         cur.close()
+        busqueda.actualizar_producto(producto_id, descripcion)
+        codigos.recargar_producto(producto_id)
         
         flash('Producto creado exitosamente', 'success')
         return redirect(url_for('productos'))
     
     # GET - Cargar datos para el formulario
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM Categorias ORDER BY Descripcion")
-    categorias = cur.fetchall()
-    cur.execute("SELECT * FROM Unidades_Medida ORDER BY Descripcion")
-    unidades = cur.fetchall()
-    cur.close()
+    categorias = catalogos.obtener('categorias')
+    unidades = catalogos.obtener('unidades')
     
     return render_template('productos/form.html', categorias=categorias, unidades=unidades)
 
+@app.route('/productos/importar', methods=['GET', 'POST'])
+@admin_required
+def productos_importar():
+    if request.method == 'GET':
+        return render_template('productos/importar.html', lote=app.config['IMPORTACION_LOTE'])
+    
+    archivo = request.files.get('archivo')
+    if not archivo or not archivo.filename:
+        return jsonify({'success': False, 'message': 'Selecciona un archivo CSV'}), 400
+    
+    # Werkzeug deja las subidas grandes en un archivo temporal: se lee como texto por partes
+    texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    lote = limite_pagina(request.form.get('lote'), por_defecto=app.config['IMPORTACION_LOTE'], maximo=5000)
+    usuario_id = session['user_id']
+    
+    def generar():
+        try:
+            for progreso in importacion.importar_productos(mysql.connection, texto, usuario_id, lote):
+                yield json.dumps(progreso) + '\n'
+        except (importacion.ArchivoInvalido, UnicodeDecodeError, csv.Error) as e:
+            yield json.dumps({'terminado': True, 'error': str(e)}) + '\n'
+        finally:
+            # Los índices en memoria se reconstruyen completos en el próximo uso
+            busqueda.invalidar()
+            codigos.invalidar()
+    
+    # Un objeto JSON por línea: progreso por lote y el resumen final
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
 @app.route('/productos/editar/<int:id>', methods=['GET', 'POST'])
 @admin_required
 def producto_editar(id):
@@ -247,16 +328,20 @@ def producto_editar(id):
         costo_promedio = request.form.get('costo_promedio', 0)
         categoria_id = request.form['categoria_id']
         stock_minimo = request.form.get('stock_minimo', 5)
+        codigo_barras = request.form.get('codigo_barras', '').strip() or None
         
         cur.execute("""
             UPDATE Productos 
-            SET Descripcion = %s, Unidad_Medida = %s, Precio_Venta = %s, 
+            SET Descripcion = %s, Codigo_Barras = %s, Unidad_Medida = %s, Precio_Venta = %s, 
                 Costo_Promedio = %s, Categoria_ID = %s, Stock_Minimo = %s
             WHERE ID_Producto = %s
-        """, (descripcion, unidad_medida, precio_venta, costo_promedio, 
+        """, (descripcion, codigo_barras, unidad_medida, precio_venta, costo_promedio, 
               categoria_id, stock_minimo, id))
         mysql.connection.commit()
+        versiones.incrementar(mysql.connection, versiones.PRODUCTOS)
         cur.close()
+        busqueda.actualizar_producto(id, descripcion)
+        codigos.recargar_producto(id)
         
         flash('Producto actualizado exitosamente', 'success')
         return redirect(url_for('productos'))
@@ -264,11 +349,9 @@ def producto_editar(id):
     # GET
     cur.execute("SELECT * FROM Productos WHERE ID_Producto = %s", (id,))
     producto = cur.fetchone()
-    cur.execute("SELECT * FROM Categorias ORDER BY Descripcion")
-    categorias = cur.fetchall()
-    cur.execute("SELECT * FROM Unidades_Medida ORDER BY Descripcion")
-    unidades = cur.fetchall()
     cur.close()
+    categorias = catalogos.obtener('categorias')
+    unidades = catalogos.obtener('unidades')
     
     return render_template('productos/form.html', producto=producto, 
                          categorias=categorias, unidades=unidades)
@@ -279,7 +362,10 @@ def producto_eliminar(id):
     cur = mysql.connection.cursor()
     cur.execute("UPDATE Productos SET Estado = 0 WHERE ID_Producto = %s", (id,))
     mysql.connection.commit()
+    versiones.incrementar(mysql.connection, versiones.PRODUCTOS)
     cur.close()
+    busqueda.quitar_producto(id)
+    codigos.recargar_producto(id)
     
     flash('Producto eliminado exitosamente', 'success')
     return redirect(url_for('productos'))
@@ -288,10 +374,7 @@ def producto_eliminar(id):
 @app.route('/categorias')
 @admin_required
 def categorias():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM Categorias ORDER BY Descripcion")
-    categorias = cur.fetchall()
-    cur.close()
+    categorias = catalogos.obtener('categorias')
     return render_template('productos/categorias.html', categorias=categorias)
 
 @app.route('/categorias/nueva', methods=['POST'])
@@ -302,6 +385,7 @@ def categoria_nueva():
     cur.execute("INSERT INTO Categorias (Descripcion) VALUES (%s)", (descripcion,))
     mysql.connection.commit()
     cur.close()
+    catalogos.invalidar('categorias')
     flash('Categoría creada exitosamente', 'success')
     return redirect(url_for('categorias'))
 
@@ -313,7 +397,9 @@ def categoria_editar(id):
     cur.execute("UPDATE Categorias SET Descripcion = %s WHERE ID_Categoria = %s", 
                 (descripcion, id))
     mysql.connection.commit()
+    versiones.incrementar(mysql.connection, versiones.CATALOGOS)
     cur.close()
+    catalogos.invalidar('categorias')
     flash('Categoría actualizada exitosamente', 'success')
     return redirect(url_for('categorias'))
 
@@ -323,7 +409,9 @@ def categoria_eliminar(id):
     cur = mysql.connection.cursor()
     cur.execute("DELETE FROM Categorias WHERE ID_Categoria = %s", (id,))
     mysql.connection.commit()
+    versiones.incrementar(mysql.connection, versiones.CATALOGOS)
     cur.close()
+    catalogos.invalidar('categorias')
     flash('Categoría eliminada exitosamente', 'success')
     return redirect(url_for('categorias'))
 
@@ -331,10 +419,7 @@ def categoria_eliminar(id):
 @app.route('/unidades-medida')
 @admin_required
 def unidades_medida():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM Unidades_Medida ORDER BY Descripcion")
-    unidades = cur.fetchall()
-    cur.close()
+    unidades = catalogos.obtener('unidades')
     return render_template('productos/unidades.html', unidades=unidades)
 
 @app.route('/unidades-medida/nueva', methods=['POST'])
@@ -347,6 +432,7 @@ def unidad_nueva():
                 (descripcion, abreviatura))
     mysql.connection.commit()
     cur.close()
+    catalogos.invalidar('unidades')
     flash('Unidad de medida creada exitosamente', 'success')
     return redirect(url_for('unidades_medida'))
 
@@ -359,7 +445,9 @@ def unidad_editar(id):
     cur.execute("UPDATE Unidades_Medida SET Descripcion = %s, Abreviatura = %s WHERE ID_Unidad = %s", 
                 (descripcion, abreviatura, id))
     mysql.connection.commit()
+    versiones.incrementar(mysql.connection, versiones.CATALOGOS)
     cur.close()
+    catalogos.invalidar('unidades')
     flash('Unidad de medida actualizada exitosamente', 'success')
     return redirect(url_for('unidades_medida'))
 
@@ -369,7 +457,9 @@ def unidad_eliminar(id):
     cur = mysql.connection.cursor()
     cur.execute("DELETE FROM Unidades_Medida WHERE ID_Unidad = %s", (id,))
     mysql.connection.commit()
+    versiones.incrementar(mysql.connection, versiones.CATALOGOS)
     cur.close()
+    catalogos.invalidar('unidades')
     flash('Unidad de medida eliminada exitosamente', 'success')
     return redirect(url_for('unidades_medida'))
 
@@ -377,10 +467,7 @@ def unidad_eliminar(id):
 @app.route('/proveedores')
 @admin_required
 def proveedores():
-    cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM Proveedores ORDER BY Nombre")
-    proveedores = cur.fetchall()
-    cur.close()
+    proveedores = catalogos.obtener('proveedores')
     return render_template('proveedores/lista.html', proveedores=proveedores)
 
 @app.route('/proveedores/nuevo', methods=['GET', 'POST'])
@@ -399,6 +486,7 @@ def proveedor_nuevo():
         """, (nombre, telefono, direccion, ruc_cedula))
         mysql.connection.commit()
         cur.close()
+        catalogos.invalidar('proveedores')
         
         flash('Proveedor creado exitosamente', 'success')
         return redirect(url_for('proveedores'))
@@ -422,7 +510,9 @@ def proveedor_editar(id):
             WHERE ID_Proveedor = %s
         """, (nombre, telefono, direccion, ruc_cedula, id))
         mysql.connection.commit()
+        versiones.incrementar(mysql.connection, versiones.CATALOGOS)
         cur.close()
+        catalogos.invalidar('proveedores')
         
         flash('Proveedor actualizado exitosamente', 'success')
         return redirect(url_for('proveedores'))
@@ -439,7 +529,9 @@ def proveedor_eliminar(id):
     cur = mysql.connection.cursor()
     cur.execute("DELETE FROM Proveedores WHERE ID_Proveedor = %s", (id,))
     mysql.connection.commit()
+    versiones.incrementar(mysql.connection, versiones.CATALOGOS)
     cur.close()
+    catalogos.invalidar('proveedores')
     flash('Proveedor eliminado exitosamente', 'success')
     return redirect(url_for('proveedores'))
 
@@ -447,52 +539,47 @@ def proveedor_eliminar(id):
 @app.route('/ventas')
 @login_required
 def ventas():
-    cur = mysql.connection.cursor()
-    
+    # Los productos se cargan por páginas desde /api/productos/catalogo
     try:
-        # Obtener productos activos con stock (corregido para tu estructura)
-        cur.execute("""
-            SELECT p.*, c.Descripcion as Categoria, u.Abreviatura,
-                   COALESCE(ib.Existencias, 0) as Stock_Bodega
-            FROM Productos p
-            LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
-            LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
-            LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = 1
-            WHERE p.Estado = 1 AND (p.Existencias > 0 OR ib.Existencias > 0)
-            ORDER BY p.Descripcion
-        """)
-        productos = cur.fetchall()
-        
         # Obtener métodos de pago activos
-        cur.execute("SELECT * FROM Metodos_Pago ORDER BY Nombre")
-        metodos_pago = cur.fetchall()
+        metodos_pago = catalogos.obtener('metodos_pago')
         
         # Obtener categorías activas para filtros
-        cur.execute("SELECT * FROM Categorias ORDER BY Descripcion")
-        categorias = cur.fetchall()
+        categorias = catalogos.obtener('categorias')
         
         # Obtener bodega principal para ventas
-        cur.execute("SELECT * FROM Bodegas WHERE ID_Bodega = 1")
-        bodega_principal = cur.fetchone()
+        bodega_principal = catalogos.bodega(1)
         
-        return render_template('ventas/pos.html', 
-                             productos=productos, 
-                             metodos_pago=metodos_pago,
-                             categorias=categorias,
-                             bodega_principal=bodega_principal)
+        # Solo depende de las tablas de referencia (ya en caché): el navegador revalida con ETag
+        return fragmentos.condicional((metodos_pago, categorias, bodega_principal), lambda: render_template(
+            'ventas/pos.html',
+            metodos_pago=metodos_pago,
+            categorias=categorias,
+            bodega_principal=bodega_principal))
     except Exception as e:
         flash(f'Error al cargar datos: {str(e)}', 'danger')
         return render_template('ventas/pos.html', 
-                             productos=[], 
                              metodos_pago=[],
                              categorias=[],
                              bodega_principal=None)
-    finally:
-        cur.close()
+
+def anotar_venta_en_diario(venta):
+    """Confirma la venta al cajero tras guardarla en el diario local (utils/diario_ventas.py)"""
+    if diario_ventas.anotar(venta):
+        metricas.incrementar('pos_ventas_diario_total')
+    return jsonify({
+        'success': True,
+        'pendiente': True,
+        'message': 'Venta registrada, se sincronizará con el servidor',
+        'clave': venta['clave'],
+        'total': venta['total'],
+        'cambio': venta['cambio']
+    })
 
 @app.route('/ventas/procesar', methods=['POST'])
 @login_required
 def procesar_venta():
+    venta = None
     try:
         data = request.get_json()
         items = data.get('items', [])
@@ -500,6 +587,8 @@ def procesar_venta():
         efectivo = data.get('efectivo', 0)
         observacion = data.get('observacion', '')
         bodega_id = data.get('bodega_id', 1)
+        # El POS manda una clave por venta: los reintentos no la registran dos veces
+        clave = str(data.get('clave') or uuid.uuid4().hex)[:64]
         
         # Validaciones básicas
         if not items:
@@ -512,110 +601,101 @@ def procesar_venta():
         total = sum(float(item['subtotal']) for item in items)
         cambio = max(float(efectivo) - total, 0)
         
-        cur = mysql.connection.cursor()
-        
-        # Verificar stock disponible EN LA BODEGA (corregido)
-        productos_sin_stock = []
-        for item in items:
-            producto_id = item['producto_id']
-            cantidad_necesaria = float(item['cantidad'])
-            
-            cur.execute("""
-                SELECT p.Descripcion, COALESCE(ib.Existencias, 0) as Stock_Bodega
-                FROM Productos p
-                LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
-                WHERE p.ID_Producto = %s AND p.Estado = 1
-            """, (bodega_id, producto_id))
-            
-            inventario = cur.fetchone()
-            stock_disponible = float(inventario['Stock_Bodega']) if inventario else 0
-            
-            if not inventario:
-                productos_sin_stock.append(f"Producto ID {producto_id} no encontrado")
-            elif stock_disponible < cantidad_necesaria:
-                productos_sin_stock.append(
-                    f"{inventario['Descripcion']} (disp: {stock_disponible}, neces: {cantidad_necesaria})"
-                )
-        
-        if productos_sin_stock:
-            mensaje_error = "Stock insuficiente: " + ", ".join(productos_sin_stock)
-            return jsonify({'success': False, 'message': mensaje_error}), 400
-        
-        # Insertar factura (corregido para tu estructura)
-        cur.execute("""
-            INSERT INTO Facturacion (Total, Efectivo, Cambio, ID_MetodoPago, Observacion, ID_Usuario)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (total, efectivo, cambio, metodo_pago_id, observacion, session['user_id']))
+        # Agrupar líneas repetidas y ordenar por producto para bloquear siempre en el mismo orden
+        try:
+            lineas = consolidar_items(items)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
-        factura_id = cur.lastrowid
+        ahora = datetime.now()
+        venta = {
+            'clave': clave,
+            'fecha': ahora.strftime('%Y-%m-%d'),
+            'hora': ahora.strftime('%H:%M:%S'),
+            'usuario_id': session['user_id'],
+            'metodo_pago_id': metodo_pago_id,
+            'total': total,
+            'efectivo': efectivo,
+            'cambio': cambio,
+            'observacion': observacion,
+            'bodega_id': bodega_id,
+            'lineas': lineas
+        }
+        if diario_ventas.modo() == diario_ventas.MODO_DIARIO:
+            # Sin esperar a MySQL: el stock se verifica al sincronizar
+            return anotar_venta_en_diario(venta)
         
         # Obtener ID del tipo de movimiento para venta (corregido)
-        cur.execute("""
-            SELECT ID_TipoMovimiento 
-            FROM Catalogo_Movimientos 
-            WHERE Descripcion LIKE '%VENTA%' AND Adicion = 'SALIDA'
-        """)
-        tipo_movimiento_venta = cur.fetchone()
+        tipo_movimiento_venta = catalogos.tipo_movimiento_venta()
         
         if not tipo_movimiento_venta:
-            mysql.connection.rollback()
             return jsonify({'success': False, 'message': 'Tipo de movimiento para venta no configurado'}), 500
         
-        # Insertar movimiento de inventario para la venta
-        cur.execute("""
-            INSERT INTO Movimientos_Inventario 
-            (ID_TipoMovimiento, Observacion, ID_Bodega)
-            VALUES (%s, %s, %s)
-        """, (tipo_movimiento_venta['ID_TipoMovimiento'], f"Venta - Factura #{factura_id}", bodega_id))
-        
-        movimiento_id = cur.lastrowid
-        
-        # Insertar detalles de factura y ACTUALIZAR STOCK
-        for item in items:
-            producto_id = item['producto_id']
-            cantidad = float(item['cantidad'])
-            precio_venta = float(item['precio_venta'])
-            subtotal = float(item['subtotal'])
+        def registrar(cur):
+            # Reintento de una venta ya registrada (p. ej. se perdió la respuesta)
+            cur.execute("SELECT ID_Factura FROM Facturacion WHERE Clave_Idempotencia = %s", (clave,))
+            existente = cur.fetchone()
+            if existente:
+                return existente['ID_Factura'], False
             
-            # Insertar detalle de factura
-            cur.execute("""
-                INSERT INTO Detalle_Facturacion (ID_Factura, ID_Producto, Cantidad, Precio_Venta, Subtotal)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (factura_id, producto_id, cantidad, precio_venta, subtotal))
+            # Verificar y bloquear stock de todo el carrito EN LA BODEGA (utils/reservas.py)
+            productos_sin_stock = verificar_stock(cur, bodega_id, lineas)
+            if productos_sin_stock:
+                raise StockInsuficiente(productos_sin_stock)
             
-            # Insertar detalle en movimiento de inventario (corregido tipo de datos)
+            # Insertar factura (corregido para tu estructura)
             cur.execute("""
-                INSERT INTO Detalle_Movimiento_Inventario 
-                (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (movimiento_id, producto_id, cantidad, 0, 0))
+                INSERT INTO Facturacion
+                (Total, Efectivo, Cambio, ID_MetodoPago, Observacion, ID_Usuario, Clave_Idempotencia)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (total, efectivo, cambio, metodo_pago_id, observacion, session['user_id'], clave))
             
-            # ACTUALIZAR STOCK EN PRODUCTOS
-            cur.execute("""
-                UPDATE Productos 
-                SET Existencias = Existencias - %s
-                WHERE ID_Producto = %s
-            """, (cantidad, producto_id))
+            factura_id = cur.lastrowid
             
-            # ACTUALIZAR INVENTARIO EN BODEGA (manejar INSERT si no existe)
+            # Insertar movimiento de inventario para la venta
             cur.execute("""
-                SELECT 1 FROM Inventario_Bodega 
-                WHERE ID_Producto = %s AND ID_Bodega = %s
-            """, (producto_id, bodega_id))
+                INSERT INTO Movimientos_Inventario 
+                (ID_TipoMovimiento, Observacion, ID_Bodega)
+                VALUES (%s, %s, %s)
+            """, (tipo_movimiento_venta['ID_TipoMovimiento'], f"Venta - Factura #{factura_id}", bodega_id))
             
-            if cur.fetchone():
-                cur.execute("""
-                    UPDATE Inventario_Bodega 
-                    SET Existencias = Existencias - %s 
-                    WHERE ID_Producto = %s AND ID_Bodega = %s
-                """, (cantidad, producto_id, bodega_id))
-            else:
-                cur.execute("""
-                    INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
-                    VALUES (%s, %s, %s)
-                """, (bodega_id, producto_id, -cantidad))
+            movimiento_id = cur.lastrowid
+            
+            # Insertar detalles de factura y movimiento por lotes y ACTUALIZAR STOCK
+            registrar_detalles(cur, factura_id, movimiento_id, lineas)
+            if stock.por_aplicacion():
+                descontar_stock(cur, bodega_id, lineas)
+            
+            # Actualizar resúmenes diarios del dashboard en la misma transacción,
+            # siempre al final: son filas que comparten todas las ventas del día
+            resumen_ventas.registrar_venta(cur, metodo_pago_id, total, lineas)
+            resumen_inventario.registrar_movimiento(cur, tipo_movimiento_venta, lineas)
+            
+            return factura_id, True
         
-        mysql.connection.commit()
+        # Se reintenta completa ante deadlocks o esperas de lock vencidas
+        try:
+            factura_id, nueva = ejecutar_transaccion(mysql.connection, registrar)
+        except MySQLdb.IntegrityError as e:
+            # Otro reintento con la misma clave se registró entre el SELECT y el
+            # INSERT: la venta ya existe y se responde con esa factura
+            if not e.args or e.args[0] != ER_DUP_ENTRY:
+                raise
+            cur = mysql.connection.cursor()
+            cur.execute("SELECT ID_Factura FROM Facturacion WHERE Clave_Idempotencia = %s", (clave,))
+            existente = cur.fetchone()
+            cur.close()
+            if existente is None:
+                raise
+            factura_id, nueva = existente['ID_Factura'], False
+        if nueva:
+            codigos.ajustar_stock(bodega_id, [(linea['producto_id'], -linea['cantidad']) for linea in lineas])
+            versiones.incrementar(mysql.connection, versiones.MOVIMIENTOS)
+            
+            metricas.incrementar('pos_ventas_total')
+            metricas.incrementar('pos_ventas_monto_total', total)
+            metricas.incrementar('pos_unidades_vendidas_total', sum(linea['cantidad'] for linea in lineas))
+            metricas.observar('pos_items_por_venta', len(lineas))
         
         return jsonify({
             'success': True, 
@@ -625,58 +705,118 @@ def procesar_venta():
             'cambio': cambio
         })
         
+    except StockInsuficiente as e:
+        metricas.incrementar('pos_ventas_rechazadas_total')
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except (MySQLdb.OperationalError, PoolAgotado) as e:
+        # Sin conexión con MySQL: en modo respaldo la venta queda en el diario local
+        if venta is not None and diario_ventas.modo() == diario_ventas.MODO_RESPALDO and diario_ventas.sin_conexion(e):
+            return anotar_venta_en_diario(venta)
+        return jsonify({'success': False, 'message': f'Error al procesar la venta: {str(e)}'}), 500
     except Exception as e:
         mysql.connection.rollback()
         return jsonify({'success': False, 'message': f'Error al procesar la venta: {str(e)}'}), 500
-    finally:
-        cur.close()
+
+def filtro_ventas(fecha_inicio, fecha_fin, rol_id=None, usuario_id=None):
+    """
+    Condiciones WHERE del historial según el rol del usuario y el rango de
+    fechas. Sin ``rol_id`` se usa el usuario de la sesión (fuera de un
+    request, p. ej. en un trabajo en segundo plano, hay que pasarlo).
+    """
+    if rol_id is None:
+        rol_id, usuario_id = session.get('rol_id'), session.get('user_id')
+    if rol_id == 2:  # Vendedor
+        condiciones = ["f.ID_Usuario = %s", "f.Estado = 1"]
+        params = [usuario_id]
+    else:  # Administrador
+        condiciones = ["f.Estado = 1"]
+        params = []
+    
+    if fecha_inicio:
+        condiciones.append("f.Fecha >= %s")
+        params.append(fecha_inicio)
+    
+    if fecha_fin:
+        condiciones.append("f.Fecha <= %s")
+        params.append(fecha_fin)
+    
+    return " AND ".join(condiciones), params
+
+def totales_ventas(cur, fecha_inicio, fecha_fin):
+    """Cantidad y monto de todo el rango filtrado (no solo de la página)"""
+    if session.get('rol_id') != 2:
+        # Sin filtro por usuario el resumen diario ya tiene los totales: O(días)
+        condiciones = []
+        params = []
+        if fecha_inicio:
+            condiciones.append("Fecha >= %s")
+            params.append(fecha_inicio)
+        if fecha_fin:
+            condiciones.append("Fecha <= %s")
+            params.append(fecha_fin)
+        where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        cur.execute(f"""
+            SELECT COALESCE(SUM(Num_Facturas), 0) as Cantidad, COALESCE(SUM(Total), 0) as Monto
+            FROM Resumen_Ventas_Diario
+            {where}
+        """, params)
+    else:
+        where, params = filtro_ventas(fecha_inicio, fecha_fin)
+        cur.execute(f"""
+            SELECT COUNT(*) as Cantidad, COALESCE(SUM(f.Total), 0) as Monto
+            FROM Facturacion f
+            WHERE {where}
+        """, params)
+    fila = cur.fetchone()
+    return int(fila['Cantidad']), float(fila['Monto'])
 
 @app.route('/ventas/historial')
 @login_required
 def ventas_historial():
     fecha_inicio = request.args.get('fecha_inicio', '')
     fecha_fin = request.args.get('fecha_fin', '')
+    limite = limite_pagina(request.args.get('limite'), por_defecto=100)
+    
+    try:
+        cursor = decodificar_cursor(request.args.get('cursor'), 3)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('ventas_historial', fecha_inicio=fecha_inicio, fecha_fin=fecha_fin))
     
     cur = mysql.connection.cursor()
     
     try:
-        # Construir consulta base (optimizada)
-        if session.get('rol_id') == 2:  # Vendedor
-            sql = """
-                SELECT f.*, u.NombreUsuario, m.Nombre as MetodoPago
-                FROM Facturacion f
-                INNER JOIN Usuarios u ON f.ID_Usuario = u.ID_Usuario
-                INNER JOIN Metodos_Pago m ON f.ID_MetodoPago = m.ID_MetodoPago
-                WHERE f.ID_Usuario = %s AND f.Estado = 1
-            """
-            params = [session['user_id']]
-        else:  # Administrador
-            sql = """
-                SELECT f.*, u.NombreUsuario, m.Nombre as MetodoPago
-                FROM Facturacion f
-                INNER JOIN Usuarios u ON f.ID_Usuario = u.ID_Usuario
-                INNER JOIN Metodos_Pago m ON f.ID_MetodoPago = m.ID_MetodoPago
-                WHERE f.Estado = 1
-            """
-            params = []
-        
-        # Aplicar filtros de fecha
-        if fecha_inicio:
-            sql += " AND f.Fecha >= %s"
-            params.append(fecha_inicio)
+        # Keyset sobre (Fecha, Hora, ID_Factura) descendente, ver scripts/08_indices_ventas.sql
+        where, params = filtro_ventas(fecha_inicio, fecha_fin)
+        if cursor:
+            # La hora viaja en segundos; como TIME se pasa en texto (un número sería HHMMSS)
+            hora = str(timedelta(seconds=int(cursor[1])))
+            where += """ AND (f.Fecha < %s OR (f.Fecha = %s AND (f.Hora < %s
+                         OR (f.Hora = %s AND f.ID_Factura < %s))))"""
+            params.extend([cursor[0], cursor[0], hora, hora, cursor[2]])
         
-        if fecha_fin:
-            sql += " AND f.Fecha <= %s"
-            params.append(fecha_fin)
+        sql = f"""
+            SELECT f.ID_Factura, f.Fecha, f.Hora, f.Total, u.NombreUsuario, m.Nombre as MetodoPago
+            FROM Facturacion f
+            INNER JOIN Usuarios u ON f.ID_Usuario = u.ID_Usuario
+            INNER JOIN Metodos_Pago m ON f.ID_MetodoPago = m.ID_MetodoPago
+            WHERE {where}
+            ORDER BY f.Fecha DESC, f.Hora DESC, f.ID_Factura DESC
+            LIMIT %s
+        """
         
-        sql += " ORDER BY f.Fecha DESC, f.Hora DESC LIMIT 100"
+        # Se pide una fila extra para saber si hay otra página
+        cur.execute(sql, params + [limite + 1])
+        ventas = list(cur.fetchall())
         
-        cur.execute(sql, params)
-        ventas = cur.fetchall()
+        siguiente = None
+        if len(ventas) > limite:
+            ventas = ventas[:limite]
+            ultimo = ventas[-1]
+            siguiente = codificar_cursor([ultimo['Fecha'], ultimo['Hora'], ultimo['ID_Factura']])
         
-        # Estadísticas
-        total_ventas = len(ventas)
-        total_monto = sum(float(venta['Total']) for venta in ventas) if ventas else 0
+        # Estadísticas del rango completo
+        total_ventas, total_monto = totales_ventas(cur, fecha_inicio, fecha_fin)
         
         mensaje = f'Mostrando {total_ventas} ventas - Total: ${total_monto:.2f}' if fecha_inicio or fecha_fin else f'Historial de ventas - {total_ventas} registros'
         
@@ -684,13 +824,83 @@ def ventas_historial():
                              ventas=ventas, 
                              fecha_inicio=fecha_inicio, 
                              fecha_fin=fecha_fin,
-                             mensaje=mensaje)
+                             mensaje=mensaje,
+                             total_ventas=total_ventas,
+                             total_monto=total_monto,
+                             siguiente=siguiente,
+                             limite=limite,
+                             es_continuacion=cursor is not None)
     except Exception as e:
         flash(f'Error al cargar historial: {str(e)}', 'danger')
         return render_template('ventas/historial.html', ventas=[])
     finally:
         cur.close()
 
+COLUMNAS_EXPORTACION_VENTAS = [
+    ('ID_Factura', 'Factura'),
+    ('Fecha', 'Fecha'),
+    ('Hora', 'Hora'),
+    ('Total', 'Total'),
+    ('Efectivo', 'Efectivo'),
+    ('Cambio', 'Cambio'),
+    ('MetodoPago', 'Método de Pago'),
+    ('NombreUsuario', 'Vendedor'),
+    ('Observacion', 'Observación'),
+]
+
+def sql_exportacion_ventas(where):
+    return f"""
+        SELECT f.ID_Factura, f.Fecha, f.Hora, f.Total, f.Efectivo, f.Cambio,
+               m.Nombre as MetodoPago, u.NombreUsuario, f.Observacion
+        FROM Facturacion f
+        INNER JOIN Usuarios u ON f.ID_Usuario = u.ID_Usuario
+        INNER JOIN Metodos_Pago m ON f.ID_MetodoPago = m.ID_MetodoPago
+        WHERE {where}
+        ORDER BY f.Fecha, f.Hora, f.ID_Factura
+    """
+
+@app.route('/ventas/exportar')
+@login_required
+def ventas_exportar():
+    fecha_inicio = request.args.get('fecha_inicio', '')
+    fecha_fin = request.args.get('fecha_fin', '')
+    formato = request.args.get('formato', 'csv')
+    
+    if formato not in ('csv', 'xlsx'):
+        flash('Formato de exportación no válido', 'danger')
+        return redirect(url_for('ventas_historial'))
+    
+    if formato == 'xlsx':
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            flash('La exportación a Excel requiere el paquete openpyxl', 'danger')
+            return redirect(url_for('ventas_historial', fecha_inicio=fecha_inicio, fecha_fin=fecha_fin))
+    
+    where, params = filtro_ventas(fecha_inicio, fecha_fin)
+    sql = sql_exportacion_ventas(where)
+    
+    def generar():
+        # Cursor sin buffer: las filas se leen del servidor a medida que se escriben
+        cur = mysql.connection.cursor(MySQLdb.cursors.SSDictCursor)
+        try:
+            cur.execute(sql, params)
+            if formato == 'xlsx':
+                yield from exportacion.xlsx_por_bloques(cur, COLUMNAS_EXPORTACION_VENTAS, 'Ventas')
+            else:
+                yield from exportacion.csv_por_bloques(cur, COLUMNAS_EXPORTACION_VENTAS)
+        finally:
+            cur.close()
+    
+    rango = f"{fecha_inicio or 'inicio'}_{fecha_fin or datetime.now().strftime('%Y-%m-%d')}"
+    mimetypes = {
+        'csv': 'text/csv; charset=utf-8',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    }
+    return Response(stream_with_context(generar()),
+                    mimetype=mimetypes[formato],
+                    headers={'Content-Disposition': f'attachment; filename=ventas_{rango}.{formato}'})
+
 @app.route('/ventas/detalle/<int:id>')
 @login_required
 def venta_detalle(id):
@@ -733,6 +943,78 @@ def venta_detalle(id):
     finally:
         cur.close()
 
+# Las APIs de productos del POS responden 304 mientras no cambien productos, existencias ni
+# nombres de categorías/unidades (ETag y Last-Modified, utils/fragmentos.py)
+DEPENDENCIAS_API_PRODUCTOS = (versiones.PRODUCTOS, versiones.MOVIMIENTOS, versiones.CATALOGOS)
+
+# Campos que entrega cada API de productos (utils/serializacion.py)
+PRODUCTO_POS = serializacion.Proyeccion(
+    ID_Producto=None, Descripcion=None, Precio_Venta=serializacion.numero,
+    Existencias=serializacion.numero, Stock_Bodega=serializacion.numero,
+    Categoria_ID=None, Categoria=None, Abreviatura=None)
+PRODUCTO_DETALLE = PRODUCTO_POS.con(Codigo_Barras=None, Stock_Minimo=serializacion.numero)
+
+@app.route('/api/productos/catalogo')
+@login_required
+def catalogo_productos():
+    categoria_id = request.args.get('categoria', '')
+    bodega_id = request.args.get('bodega_id', 1)
+    limite = limite_pagina(request.args.get('limite'))
+    
+    try:
+        cursor = decodificar_cursor(request.args.get('cursor'), 2)
+        formato = serializacion.formato(request.args.get('formato'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def generar():
+        cur = mysql.connection.cursor()
+        
+        try:
+            sql = """
+                SELECT p.ID_Producto, p.Descripcion, p.Precio_Venta, p.Existencias, p.Categoria_ID,
+                       c.Descripcion as Categoria, u.Abreviatura,
+                       COALESCE(ib.Existencias, 0) as Stock_Bodega
+                FROM Productos p
+                LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
+                LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
+                LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
+                WHERE p.Estado = 1 AND (p.Existencias > 0 OR ib.Existencias > 0)
+            """
+            params = [bodega_id]
+        
+            if categoria_id and categoria_id != 'todas':
+                sql += " AND p.Categoria_ID = %s"
+                params.append(categoria_id)
+        
+            # Continuar después de la última fila de la página anterior
+            if cursor:
+                sql += " AND (p.Descripcion > %s OR (p.Descripcion = %s AND p.ID_Producto > %s))"
+                params.extend([cursor[0], cursor[0], cursor[1]])
+        
+            # Se pide una fila extra para saber si hay otra página
+            sql += " ORDER BY p.Descripcion, p.ID_Producto LIMIT %s"
+            params.append(limite + 1)
+        
+            cur.execute(sql, params)
+            productos = list(cur.fetchall())
+        
+            siguiente = None
+            if len(productos) > limite:
+                productos = productos[:limite]
+                ultimo = productos[-1]
+                siguiente = codificar_cursor([ultimo['Descripcion'], ultimo['ID_Producto']])
+        
+            # formato=columnas: {'campos': [...], 'filas': [[...]]} sin repetir los nombres por fila
+            return serializacion.respuesta({'productos': PRODUCTO_POS.lista(productos, formato),
+                                            'siguiente': siguiente})
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            cur.close()
+        
+    return fragmentos.condicional_datos(DEPENDENCIAS_API_PRODUCTOS, generar)
+
 @app.route('/api/productos/buscar')
 @login_required
 def buscar_productos():
@@ -740,87 +1022,128 @@ def buscar_productos():
     categoria_id = request.args.get('categoria', '')
     bodega_id = request.args.get('bodega_id', 1)
     
-    cur = mysql.connection.cursor()
-    
-    try:
-        sql = """
-            SELECT p.*, c.Descripcion as Categoria, u.Abreviatura,
-                   COALESCE(ib.Existencias, 0) as Stock_Bodega
-            FROM Productos p
-            LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
-            LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
-            LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
-            WHERE p.Estado = 1 AND (p.Existencias > 0 OR ib.Existencias > 0)
-        """
-        params = [bodega_id]
+    def generar():
+        cur = mysql.connection.cursor()
+        
+        try:
+            sql = """
+                SELECT p.ID_Producto, p.Descripcion, p.Precio_Venta, p.Existencias, p.Categoria_ID,
+                       c.Descripcion as Categoria, u.Abreviatura,
+                       COALESCE(ib.Existencias, 0) as Stock_Bodega
+                FROM Productos p
+                LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
+                LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
+                LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
+                WHERE p.Estado = 1 AND (p.Existencias > 0 OR ib.Existencias > 0)
+            """
+            params = [bodega_id]
         
-        if query:
-            sql += " AND (p.Descripcion LIKE %s OR p.ID_Producto = %s)"
-            params.extend([f'%{query}%', query if query.isdigit() else '0'])
+            ranking = None
+            if query:
+                # Candidatos desde el índice de trigramas (utils/busqueda.py) en lugar de LIKE '%q%'
+                ranking = {producto_id: i for i, (producto_id, _) in enumerate(busqueda.buscar(query, limite=500))}
+                if query.isdigit():
+                    ranking[int(query)] = -1
+                if not ranking:
+                    return serializacion.respuesta([])
+                sql += f" AND p.ID_Producto IN ({', '.join(['%s'] * len(ranking))})"
+                params.extend(ranking)
         
-        if categoria_id and categoria_id != 'todas':
-            sql += " AND p.Categoria_ID = %s"
-            params.append(categoria_id)
+            if categoria_id and categoria_id != 'todas':
+                sql += " AND p.Categoria_ID = %s"
+                params.append(categoria_id)
         
-        sql += " ORDER BY p.Descripcion LIMIT 50"
+            if ranking is None:
+                sql += " ORDER BY p.Descripcion LIMIT 50"
         
-        cur.execute(sql, params)
-        productos = cur.fetchall()
+            cur.execute(sql, params)
+            productos = cur.fetchall()
+        
+            if ranking is not None:
+                productos = sorted(productos, key=lambda p: ranking[p['ID_Producto']])[:50]
         
-        return jsonify([dict(producto) for producto in productos])
+            return serializacion.respuesta(PRODUCTO_POS.objetos(productos))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            cur.close()
+        
+    return fragmentos.condicional_datos(DEPENDENCIAS_API_PRODUCTOS, generar)
+
+@app.route('/api/producto/codigo/<codigo>')
+@login_required
+def producto_por_codigo(codigo):
+    bodega_id = request.args.get('bodega_id', 1)
+    
+    # Resuelto desde el índice en memoria (utils/codigos.py), sin consultar MySQL
+    try:
+        producto = codigos.buscar(codigo.strip(), bodega_id)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
+    
+    if producto:
+        return jsonify(producto)
+    
+    return jsonify({'error': 'Producto no encontrado'}), 404
 
 @app.route('/api/producto/<int:id>')
 @login_required
 def obtener_producto(id):
     bodega_id = request.args.get('bodega_id', 1)
     
-    cur = mysql.connection.cursor()
-    try:
-        cur.execute("""
-            SELECT p.*, c.Descripcion as Categoria, u.Abreviatura,
-                   COALESCE(ib.Existencias, 0) as Stock_Bodega
-            FROM Productos p
-            LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
-            LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
-            LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
-            WHERE p.ID_Producto = %s AND p.Estado = 1
-        """, (bodega_id, id))
-        producto = cur.fetchone()
+    def generar():
+        cur = mysql.connection.cursor()
+        try:
+            cur.execute("""
+                SELECT p.ID_Producto, p.Descripcion, p.Precio_Venta, p.Existencias, p.Categoria_ID,
+                       c.Descripcion as Categoria, u.Abreviatura,
+                       COALESCE(ib.Existencias, 0) as Stock_Bodega, p.Codigo_Barras, p.Stock_Minimo
+                FROM Productos p
+                LEFT JOIN Categorias c ON p.Categoria_ID = c.ID_Categoria
+                LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
+                LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
+                WHERE p.ID_Producto = %s AND p.Estado = 1
+            """, (bodega_id, id))
+            producto = cur.fetchone()
         
-        if producto:
-            return jsonify(dict(producto))
+            if producto:
+                return serializacion.respuesta(PRODUCTO_DETALLE.objeto(producto))
         
-        return jsonify({'error': 'Producto no encontrado'}), 404
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-    finally:
-        cur.close()
+            return jsonify({'error': 'Producto no encontrado'}), 404
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            cur.close()
+        
+    return fragmentos.condicional_datos(DEPENDENCIAS_API_PRODUCTOS, generar)
 
 # Inventario - Gestión de movimientos
 @app.route('/inventario')
 @admin_required
 def inventario():
-    cur = mysql.connection.cursor()
-    
-    # Obtener movimientos recientes
-    cur.execute("""
-        SELECT mi.*, cm.Descripcion as TipoMovimiento, cm.Letra, 
-               p.Nombre as Proveedor, b.Nombre as Bodega
-        FROM Movimientos_Inventario mi
-        INNER JOIN Catalogo_Movimientos cm ON mi.ID_TipoMovimiento = cm.ID_TipoMovimiento
-        LEFT JOIN Proveedores p ON mi.ID_Proveedor = p.ID_Proveedor
-        LEFT JOIN Bodegas b ON mi.ID_Bodega = b.ID_Bodega
-        ORDER BY mi.Fecha DESC, mi.ID_Movimiento DESC
-        LIMIT 100
-    """)
-    movimientos = cur.fetchall()
+    def cargar():
+        cur = mysql.connection.cursor()
+        
+        # Obtener movimientos recientes
+        cur.execute("""
+            SELECT mi.*, cm.Descripcion as TipoMovimiento, cm.Letra, 
+                   p.Nombre as Proveedor, b.Nombre as Bodega
+            FROM Movimientos_Inventario mi
+            INNER JOIN Catalogo_Movimientos cm ON mi.ID_TipoMovimiento = cm.ID_TipoMovimiento
+            LEFT JOIN Proveedores p ON mi.ID_Proveedor = p.ID_Proveedor
+            LEFT JOIN Bodegas b ON mi.ID_Bodega = b.ID_Bodega
+            ORDER BY mi.Fecha DESC, mi.ID_Movimiento DESC
+            LIMIT 100
+        """)
+        movimientos = cur.fetchall()
+        
+        cur.close()
+        return {'movimientos': movimientos}
     
-    cur.close()
-    return render_template('inventario/lista.html', movimientos=movimientos)
+    dependencias = (versiones.MOVIMIENTOS, versiones.CATALOGOS)
+    return fragmentos.condicional(fragmentos.version(*dependencias), lambda: render_template(
+        'inventario/lista.html',
+        tabla=fragmentos.renderizar('inventario/_tabla.html', dependencias, cargar)))
 
 @app.route('/inventario/entrada', methods=['GET', 'POST'])
 @admin_required
@@ -839,67 +1162,45 @@ def inventario_entrada():
                 flash('No hay productos en el movimiento', 'warning')
                 return jsonify({'success': False, 'message': 'No hay productos en el movimiento'}), 400
             
-            cur = mysql.connection.cursor()
-            
             # VERIFICAR que el tipo de movimiento es de entrada
-            cur.execute("SELECT Descripcion, Adicion FROM Catalogo_Movimientos WHERE ID_TipoMovimiento = %s", (tipo_movimiento_id,))
-            tipo_movimiento = cur.fetchone()
+            tipo_movimiento = catalogos.tipo_movimiento(tipo_movimiento_id)
             
             if not tipo_movimiento or tipo_movimiento['Adicion'] != 'ENTRADA':
                 flash('Tipo de movimiento no válido para entrada', 'danger')
                 return jsonify({'success': False, 'message': 'Tipo de movimiento no válido para entrada'}), 400
             
-            # Insertar movimiento
-            cur.execute("""
-                INSERT INTO Movimientos_Inventario 
-                (ID_TipoMovimiento, N_Factura, ID_Proveedor, Observacion, ID_Bodega)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (tipo_movimiento_id, n_factura, proveedor_id, observacion, bodega_id))
-            
-            movimiento_id = cur.lastrowid
-            
             # Obtener nombre de bodega para el mensaje
-            cur.execute("SELECT Nombre FROM Bodegas WHERE ID_Bodega = %s", (bodega_id,))
-            bodega_nombre = cur.fetchone()['Nombre']
+            bodega_nombre = catalogos.bodega(bodega_id)['Nombre']
             
-            # Procesar cada item del movimiento
-            total_productos = 0
-            for item in items:
-                producto_id = item['producto_id']
-                cantidad = item['cantidad']
-                costo = item['costo']
-                costo_total = item['costo_total']
-                
-                total_productos += cantidad
-                
-                # Insertar detalle
+            # Líneas repetidas del mismo producto se suman con costo ponderado
+            try:
+                lineas = consolidar_lineas(items)
+            except ValueError as e:
+                flash(str(e), 'danger')
+                return jsonify({'success': False, 'message': str(e)}), 400
+            total_productos = sum(linea['cantidad'] for linea in lineas)
+            
+            def registrar(cur):
+                # Insertar movimiento
                 cur.execute("""
-                    INSERT INTO Detalle_Movimiento_Inventario 
-                    (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
+                    INSERT INTO Movimientos_Inventario 
+                    (ID_TipoMovimiento, N_Factura, ID_Proveedor, Observacion, ID_Bodega)
                     VALUES (%s, %s, %s, %s, %s)
-                """, (movimiento_id, producto_id, cantidad, costo, costo_total))
+                """, (tipo_movimiento_id, n_factura, proveedor_id, observacion, bodega_id))
                 
-                # ACTUALIZAR INVENTARIO EN BODEGA
-                cur.execute("""
-                    INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE 
-                    Existencias = Existencias + VALUES(Existencias)
-                """, (bodega_id, producto_id, cantidad))
+                movimiento_id = cur.lastrowid
                 
-                # ACTUALIZAR COSTO PROMEDIO Y EXISTENCIAS TOTALES
-                cur.execute("""
-                    UPDATE Productos 
-                    SET Existencias = Existencias + %s,
-                        Costo_Promedio = CASE 
-                            WHEN Existencias = 0 THEN %s
-                            ELSE ((Existencias * Costo_Promedio) + (%s * %s)) / (Existencias + %s)
-                        END
-                    WHERE ID_Producto = %s
-                """, (cantidad, costo, cantidad, costo, cantidad, producto_id))
+                # Costo promedio, stock y detalle por lotes (utils/movimientos.py)
+                registrar_entrada(cur, movimiento_id, bodega_id, lineas)
+                
+                # Actualizar resúmenes de los reportes en la misma transacción
+                resumen_inventario.registrar_movimiento(cur, tipo_movimiento, lineas)
+                
+                return movimiento_id
             
-            mysql.connection.commit()
-            cur.close()
+            movimiento_id = ejecutar_transaccion(mysql.connection, registrar)
+            codigos.ajustar_stock(bodega_id, [(linea['producto_id'], linea['cantidad']) for linea in lineas])
+            versiones.incrementar(mysql.connection, versiones.MOVIMIENTOS)
             
             flash(f'✅ Entrada de inventario registrada exitosamente! Movimiento #{movimiento_id} - {total_productos} unidades en {bodega_nombre}', 'success')
             return jsonify({
@@ -926,17 +1227,12 @@ def inventario_entrada():
     """)
     productos = cur.fetchall()
     
-    cur.execute("SELECT * FROM Proveedores ORDER BY Nombre")
-    proveedores = cur.fetchall()
-    
-    cur.execute("SELECT * FROM Bodegas ORDER BY Nombre")
-    bodegas = cur.fetchall()
-    
-    cur.execute("SELECT * FROM Catalogo_Movimientos WHERE Adicion = 'ENTRADA' ORDER BY Descripcion")
-    tipos_movimiento = cur.fetchall()
-    
     cur.close()
     
+    proveedores = catalogos.obtener('proveedores')
+    bodegas = catalogos.obtener('bodegas')
+    tipos_movimiento = catalogos.tipos_movimiento('ENTRADA')
+    
     return render_template('inventario/entrada.html',
                          productos=productos,
                          proveedores=proveedores,
@@ -958,91 +1254,51 @@ def inventario_salida():
                 flash('No hay productos en el movimiento', 'warning')
                 return jsonify({'success': False, 'message': 'No hay productos en el movimiento'}), 400
             
-            cur = mysql.connection.cursor()
-            
             # VERIFICAR que el tipo de movimiento es de salida
-            cur.execute("SELECT Descripcion, Adicion FROM Catalogo_Movimientos WHERE ID_TipoMovimiento = %s", (tipo_movimiento_id,))
-            tipo_movimiento = cur.fetchone()
+            tipo_movimiento = catalogos.tipo_movimiento(tipo_movimiento_id)
             
             if not tipo_movimiento or tipo_movimiento['Adicion'] != 'SALIDA':
                 flash('Tipo de movimiento no válido para salida', 'danger')
                 return jsonify({'success': False, 'message': 'Tipo de movimiento no válido para salida'}), 400
             
             # Obtener nombre de bodega para mensajes
-            cur.execute("SELECT Nombre FROM Bodegas WHERE ID_Bodega = %s", (bodega_id,))
-            bodega_nombre = cur.fetchone()['Nombre']
-            
-            # Verificar stock disponible EN LA BODEGA ESPECÍFICA
-            productos_sin_stock = []
-            for item in items:
-                cur.execute("""
-                    SELECT COALESCE(ib.Existencias, 0) as Existencias_Bodega, 
-                           p.Descripcion as Nombre_Producto
-                    FROM Productos p
-                    LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
-                    WHERE p.ID_Producto = %s
-                """, (bodega_id, item['producto_id']))
-                
-                inventario = cur.fetchone()
-                stock_disponible = inventario['Existencias_Bodega'] if inventario else 0
-                
-                if not inventario or stock_disponible < item['cantidad']:
-                    productos_sin_stock.append({
-                        'producto': inventario['Nombre_Producto'] if inventario else f"ID {item['producto_id']}",
-                        'disponible': stock_disponible,
-                        'solicitado': item['cantidad']
-                    })
-            
-            if productos_sin_stock:
-                mensaje_error = "Stock insuficiente: " + ", ".join([
-                    f"{p['producto']} (disp: {p['disponible']}, neces: {p['solicitado']})" 
-                    for p in productos_sin_stock
-                ])
-                flash(mensaje_error, 'danger')
-                return jsonify({'success': False, 'message': mensaje_error}), 400
-            
-            # Insertar movimiento
-            cur.execute("""
-                INSERT INTO Movimientos_Inventario 
-                (ID_TipoMovimiento, Observacion, ID_Bodega)
-                VALUES (%s, %s, %s)
-            """, (tipo_movimiento_id, observacion, bodega_id))
+            bodega_nombre = catalogos.bodega(bodega_id)['Nombre']
             
-            movimiento_id = cur.lastrowid
+            try:
+                lineas = consolidar_lineas(items)
+            except ValueError as e:
+                flash(str(e), 'danger')
+                return jsonify({'success': False, 'message': str(e)}), 400
+            total_productos = sum(linea['cantidad'] for linea in lineas)
             
-            # Insertar detalles y ACTUALIZAR INVENTARIO
-            total_productos = 0
-            for item in items:
-                producto_id = item['producto_id']
-                cantidad = item['cantidad']
-                costo = item.get('costo', 0)
-                costo_total = item.get('costo_total', 0)
-                
-                total_productos += cantidad
+            def registrar(cur):
+                # Verificar y bloquear el stock EN LA BODEGA con una sola lectura
+                faltantes = verificar_salida(cur, bodega_id, lineas)
+                if faltantes:
+                    raise StockInsuficiente([
+                        f"{f['producto']} (disp: {f['disponible']}, neces: {f['solicitado']})" for f in faltantes
+                    ], faltantes)
                 
-                # Insertar detalle
+                # Insertar movimiento
                 cur.execute("""
-                    INSERT INTO Detalle_Movimiento_Inventario 
-                    (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (movimiento_id, producto_id, cantidad, costo, costo_total))
+                    INSERT INTO Movimientos_Inventario 
+                    (ID_TipoMovimiento, Observacion, ID_Bodega)
+                    VALUES (%s, %s, %s)
+                """, (tipo_movimiento_id, observacion, bodega_id))
                 
-                # ACTUALIZAR INVENTARIO EN BODEGA
-                cur.execute("""
-                    UPDATE Inventario_Bodega 
-                    SET Existencias = Existencias - %s
-                    WHERE ID_Bodega = %s AND ID_Producto = %s
-                """, (cantidad, bodega_id, producto_id))
+                movimiento_id = cur.lastrowid
                 
-                # ACTUALIZAR EXISTENCIAS TOTALES EN PRODUCTOS
-                cur.execute("""
-                    UPDATE Productos 
-                    SET Existencias = Existencias - %s
-                    WHERE ID_Producto = %s
-                """, (cantidad, producto_id))
+                # Detalle y descuento de stock por lotes (utils/movimientos.py)
+                registrar_salida(cur, movimiento_id, bodega_id, lineas)
+                
+                # Actualizar resúmenes de los reportes en la misma transacción
+                resumen_inventario.registrar_movimiento(cur, tipo_movimiento, lineas)
+                
+                return movimiento_id
             
-            mysql.connection.commit()
-            cur.close()
+            movimiento_id = ejecutar_transaccion(mysql.connection, registrar)
+            codigos.ajustar_stock(bodega_id, [(linea['producto_id'], -linea['cantidad']) for linea in lineas])
+            versiones.incrementar(mysql.connection, versiones.MOVIMIENTOS)
             
             flash(f'✅ Salida de inventario registrada exitosamente! Movimiento #{movimiento_id} - {total_productos} unidades desde {bodega_nombre}', 'success')
             return jsonify({
@@ -1051,6 +1307,9 @@ def inventario_salida():
                 'movimiento_id': movimiento_id
             })
             
+        except StockInsuficiente as e:
+            flash(str(e), 'danger')
+            return jsonify({'success': False, 'message': str(e), 'faltantes': e.detalle}), 400
         except Exception as e:
             mysql.connection.rollback()
             flash(f'❌ Error al registrar salida de inventario: {str(e)}', 'danger')
@@ -1071,19 +1330,113 @@ def inventario_salida():
     """)
     productos = cur.fetchall()
     
-    cur.execute("SELECT * FROM Bodegas ORDER BY Nombre")
-    bodegas = cur.fetchall()
-    
-    cur.execute("SELECT * FROM Catalogo_Movimientos WHERE Adicion = 'SALIDA' ORDER BY Descripcion")
-    tipos_movimiento = cur.fetchall()
-    
     cur.close()
     
+    bodegas = catalogos.obtener('bodegas')
+    tipos_movimiento = catalogos.tipos_movimiento('SALIDA')
+    
     return render_template('inventario/salida.html',
                          productos=productos,
                          bodegas=bodegas,
                          tipos_movimiento=tipos_movimiento)
 
+@app.route('/inventario/traslado', methods=['GET', 'POST'])
+@admin_required
+def inventario_traslado():
+    if request.method == 'POST':
+        try:
+            data = request.get_json()
+            origen_id = data.get('bodega_origen_id')
+            destino_id = data.get('bodega_destino_id')
+            observacion = data.get('observacion', '')
+            items = data.get('items', [])
+            
+            if not items:
+                return jsonify({'success': False, 'message': 'No hay productos en el traslado'}), 400
+            
+            origen = catalogos.bodega(origen_id)
+            destino = catalogos.bodega(destino_id)
+            if not origen or not destino or origen['ID_Bodega'] == destino['ID_Bodega']:
+                return jsonify({'success': False, 'message': 'Selecciona dos bodegas distintas'}), 400
+            
+            tipo_salida = catalogos.tipo_movimiento_traslado('SALIDA')
+            tipo_entrada = catalogos.tipo_movimiento_traslado('ENTRADA')
+            if not tipo_salida or not tipo_entrada:
+                return jsonify({'success': False, 'message': 'Tipos de movimiento para traslado no configurados '
+                                '(scripts/10_traslados.sql)'}), 500
+            
+            try:
+                lineas = consolidar_lineas(items)
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            total_productos = sum(linea['cantidad'] for linea in lineas)
+            
+            def registrar(cur):
+                # Bloquear ambas bodegas en orden de llave y verificar el origen
+                faltantes = verificar_traslado(cur, origen['ID_Bodega'], destino['ID_Bodega'], lineas)
+                if faltantes:
+                    raise StockInsuficiente([
+                        f"{f['producto']} (disp: {f['disponible']}, neces: {f['solicitado']})" for f in faltantes
+                    ], faltantes)
+                
+                nota = f"Traslado {origen['Nombre']} -> {destino['Nombre']}" + (f": {observacion}" if observacion else '')
+                cur.execute("""
+                    INSERT INTO Movimientos_Inventario (ID_TipoMovimiento, Observacion, ID_Bodega)
+                    VALUES (%s, %s, %s)
+                """, (tipo_salida['ID_TipoMovimiento'], nota, origen['ID_Bodega']))
+                salida_id = cur.lastrowid
+                cur.execute("""
+                    INSERT INTO Movimientos_Inventario (ID_TipoMovimiento, Observacion, ID_Bodega)
+                    VALUES (%s, %s, %s)
+                """, (tipo_entrada['ID_TipoMovimiento'], f"{nota} (salida #{salida_id})", destino['ID_Bodega']))
+                entrada_id = cur.lastrowid
+                
+                registrar_traslado(cur, salida_id, entrada_id, origen['ID_Bodega'], destino['ID_Bodega'], lineas)
+                
+                # Solo cuentan como movimientos: el stock global no cambia
+                resumen_inventario.registrar_movimiento(cur, tipo_salida, [])
+                resumen_inventario.registrar_movimiento(cur, tipo_entrada, [])
+                
+                return salida_id, entrada_id
+            
+            # Todo o nada: nunca queda stock a medio trasladar
+            salida_id, entrada_id = ejecutar_transaccion(mysql.connection, registrar)
+            cambios = [(linea['producto_id'], linea['cantidad']) for linea in lineas]
+            codigos.ajustar_stock(origen['ID_Bodega'], [(pid, -cantidad) for pid, cantidad in cambios])
+            codigos.ajustar_stock(destino['ID_Bodega'], cambios)
+            versiones.incrementar(mysql.connection, versiones.MOVIMIENTOS)
+            
+            flash(f"✅ Traslado registrado: {total_productos} unidades de {origen['Nombre']} a {destino['Nombre']} "
+                  f"(movimientos #{salida_id} y #{entrada_id})", 'success')
+            return jsonify({
+                'success': True,
+                'message': 'Traslado registrado exitosamente',
+                'movimiento_salida_id': salida_id,
+                'movimiento_entrada_id': entrada_id
+            })
+            
+        except StockInsuficiente as e:
+            return jsonify({'success': False, 'message': str(e), 'faltantes': e.detalle}), 400
+        except Exception as e:
+            mysql.connection.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 500
+    
+    cur = mysql.connection.cursor()
+    cur.execute("""
+        SELECT ib.ID_Bodega, p.ID_Producto, p.Descripcion, u.Abreviatura, ib.Existencias
+        FROM Inventario_Bodega ib
+        INNER JOIN Productos p ON ib.ID_Producto = p.ID_Producto
+        LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
+        WHERE p.Estado = 1 AND ib.Existencias > 0
+        ORDER BY p.Descripcion
+    """)
+    existencias = cur.fetchall()
+    cur.close()
+    
+    return render_template('inventario/traslado.html',
+                         existencias=existencias,
+                         bodegas=catalogos.obtener('bodegas'))
+
 @app.route('/inventario/detalle/<int:id>')
 @admin_required
 def inventario_detalle(id):
@@ -1127,33 +1480,12 @@ def reportes():
     cur = mysql.connection.cursor()
     
     try:
-        # Productos con más movimientos
-        cur.execute("""
-            SELECT p.Descripcion, 
-                   SUM(CASE WHEN cm.Adicion = 'ENTRADA' THEN dmi.Cantidad ELSE 0 END) as Entradas,
-                   SUM(CASE WHEN cm.Adicion = 'SALIDA' THEN dmi.Cantidad ELSE 0 END) as Salidas,
-                   p.Existencias
-            FROM Detalle_Movimiento_Inventario dmi
-            INNER JOIN Productos p ON dmi.ID_Producto = p.ID_Producto
-            INNER JOIN Movimientos_Inventario mi ON dmi.ID_Movimiento = mi.ID_Movimiento
-            INNER JOIN Catalogo_Movimientos cm ON mi.ID_TipoMovimiento = cm.ID_TipoMovimiento
-            WHERE mi.Fecha >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY p.ID_Producto, p.Descripcion, p.Existencias
-            ORDER BY (Entradas + Salidas) DESC
-            LIMIT 10
-        """)
-        productos_movimientos = cur.fetchall()
-        
-        # Movimientos por tipo
-        cur.execute("""
-            SELECT cm.Descripcion, COUNT(*) as Total, cm.Letra, cm.Adicion
-            FROM Movimientos_Inventario mi
-            INNER JOIN Catalogo_Movimientos cm ON mi.ID_TipoMovimiento = cm.ID_TipoMovimiento
-            WHERE mi.Fecha >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
-            GROUP BY cm.ID_TipoMovimiento, cm.Descripcion, cm.Letra, cm.Adicion
-            ORDER BY Total DESC
-        """)
-        movimientos_tipo = cur.fetchall()
+        # Movimientos y análisis desde los resúmenes diarios (utils/resumen_inventario.py)
+        productos_movimientos = resumen_inventario.productos_con_movimiento(cur, dias=30)
+        movimientos_tipo = resumen_inventario.movimientos_por_tipo(cur, dias=30)
+        productos_sin_movimiento = resumen_inventario.productos_sin_movimiento(cur, dias=90)
+        abc = resumen_inventario.analisis_abc(cur, dias=90)
+        productos_rotacion = resumen_inventario.rotacion(cur, dias=30)
         
         # Valor del inventario
         cur.execute("""
@@ -1163,22 +1495,6 @@ def reportes():
         """)
         valor_inventario = cur.fetchone()['ValorTotal'] or 0
         
-        # Productos sin movimiento
-        cur.execute("""
-            SELECT p.Descripcion, p.Existencias, p.Fecha_Creacion
-            FROM Productos p
-            WHERE p.Estado = 1
-            AND NOT EXISTS (
-                SELECT 1 FROM Detalle_Movimiento_Inventario dmi
-                INNER JOIN Movimientos_Inventario mi ON dmi.ID_Movimiento = mi.ID_Movimiento
-                WHERE dmi.ID_Producto = p.ID_Producto
-                AND mi.Fecha >= DATE_SUB(CURDATE(), INTERVAL 90 DAY)
-            )
-            ORDER BY p.Fecha_Creacion DESC
-            LIMIT 10
-        """)
-        productos_sin_movimiento = cur.fetchall()
-        
         # Productos con stock bajo
         cur.execute("""
             SELECT p.Descripcion, p.Existencias, p.Stock_Minimo, 
@@ -1200,13 +1516,317 @@ def reportes():
         valor_inventario = 0
         productos_sin_movimiento = []
         productos_stock_bajo = []
+        abc = []
+        productos_rotacion = []
+    
+    resumen_abc = {clase: {'productos': 0, 'valor': 0.0} for clase in ('A', 'B', 'C')}
+    for fila in abc:
+        resumen_abc[fila['Clase']]['productos'] += 1
+        resumen_abc[fila['Clase']]['valor'] += float(fila['Valor_Salidas'])
     
     return render_template('inventario/reportes.html',
                          productos_movimientos=productos_movimientos,
                          movimientos_tipo=movimientos_tipo,
                          valor_inventario=valor_inventario,
                          productos_sin_movimiento=productos_sin_movimiento,
-                         productos_stock_bajo=productos_stock_bajo)
+                         productos_stock_bajo=productos_stock_bajo,
+                         resumen_abc=resumen_abc,
+                         productos_abc=abc[:10],
+                         productos_rotacion=productos_rotacion)
+
+@app.cli.command('reconstruir-resumen-ventas')
+def reconstruir_resumen_ventas():
+    """Recalcula los resúmenes diarios de ventas desde el historial"""
+    dias = resumen_ventas.reconstruir(mysql.connection)
+    print(f'Resumen de ventas reconstruido: {dias} días')
+
+@app.cli.command('reconstruir-resumen-inventario')
+def reconstruir_resumen_inventario():
+    """Recalcula los resúmenes diarios de movimientos de inventario desde el historial"""
+    filas = resumen_inventario.reconstruir(mysql.connection)
+    print(f'Resumen de inventario reconstruido: {filas} filas producto/día')
+
+@app.route('/api/sistema/metricas')
+@admin_required
+def metricas_sistema():
+    return jsonify({
+        'pool': mysql.pool.metricas(),
+        'cache_catalogos': catalogos.metricas(),
+        'reservas_stock': reservas.metricas(),
+        'sql': perfil_sql.metricas(),
+        'passwords': auth.metricas(),
+        'sesiones': sesiones.metricas(),
+        'fragmentos': fragmentos.metricas()
+    })
+
+@app.route('/metrics')
+def metrics():
+    """Métricas en formato de exposición de Prometheus"""
+    token = app.config.get('METRICAS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('No autorizado\n', status=401, mimetype='text/plain')
+    
+    return Response(metricas.prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.cli.command('importar-productos')
+@click.argument('archivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', default=None, type=int, help='Filas por transacción')
+@click.option('--usuario', default=None, type=int, help='ID del usuario creador')
+def importar_productos(archivo, lote, usuario):
+    """Crea o actualiza productos desde un CSV (clave: codigo_barras)"""
+    lote = lote or app.config['IMPORTACION_LOTE']
+    with open(archivo, encoding='utf-8-sig', newline='') as texto:
+        try:
+            for progreso in importacion.importar_productos(mysql.connection, texto, usuario, lote):
+                print(f"{progreso['procesadas']} filas - {progreso['insertados']} nuevos, "
+                      f"{progreso['actualizados']} actualizados, {progreso['con_error']} con error")
+        except importacion.ArchivoInvalido as e:
+            raise click.ClickException(str(e))
+    for error in progreso['errores']:
+        print(f"  línea {error['linea']}: {error['error']}")
+    if progreso['con_error'] > len(progreso['errores']):
+        print(f"  ... y {progreso['con_error'] - len(progreso['errores'])} errores más")
+
+@app.cli.command('reconciliar-stock')
+@click.option('--reparar', is_flag=True, help='Ajusta Productos.Existencias a la suma por bodega')
+def reconciliar_stock(reparar):
+    """Reporta (y opcionalmente corrige) el descuadre entre existencias globales y por bodega"""
+    reporte = stock.reconciliar(mysql.connection, reparar=reparar)
+    print(f"Modo de stock: {reporte['modo']} - triggers instalados: {', '.join(reporte['triggers']) or 'ninguno'}")
+    for advertencia in reporte['advertencias']:
+        print(f'ADVERTENCIA: {advertencia}')
+    for fila in reporte['diferencias']:
+        print(f"  #{fila['ID_Producto']} {fila['Descripcion']}: global {fila['Existencias']}, "
+              f"bodegas {fila['Suma_Bodegas']} (diferencia {fila['Diferencia']})")
+    print(f"{len(reporte['diferencias'])} productos descuadrados, {reporte['reparados']} reparados")
+
+@app.cli.command('revocar-sesiones')
+@click.option('--usuario', 'usuarios', multiple=True, type=int, help='ID del usuario (se puede repetir)')
+@click.option('--inactivos', is_flag=True, help='Todos los usuarios con Estado = 0')
+def revocar_sesiones(usuarios, inactivos):
+    """Cierra las sesiones abiertas de los usuarios indicados"""
+    if sesiones.backend() != sesiones.BACKEND_SQLITE:
+        print('Solo SESIONES_BACKEND=sqlite comparte las sesiones con este proceso; con los demás '
+              f'backends los workers las revocan en su próxima recarga de permisos '
+              f"(cada {app.config['SESIONES_PERMISOS_TTL']}s)")
+        return
+    usuarios = set(usuarios)
+    if inactivos:
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT ID_Usuario FROM Usuarios WHERE Estado = 0")
+        usuarios.update(fila['ID_Usuario'] for fila in cur.fetchall())
+        cur.close()
+    print(f'{sesiones.revocar_usuarios(usuarios)} sesiones revocadas de {len(usuarios)} usuarios')
+
+@app.route('/ventas/pendientes')
+@admin_required
+def ventas_pendientes():
+    return render_template('ventas/pendientes.html',
+                           modo=diario_ventas.modo(),
+                           conteo=diario_ventas.contar(),
+                           ventas=diario_ventas.listar())
+
+@app.route('/ventas/pendientes/<clave>/<accion>', methods=['POST'])
+@admin_required
+def venta_pendiente_accion(clave, accion):
+    if accion == 'reintentar':
+        hecho = diario_ventas.reintentar(clave)
+        mensaje = 'Venta devuelta a la cola de sincronización'
+    elif accion == 'descartar':
+        hecho = diario_ventas.descartar(clave)
+        mensaje = 'Venta descartada'
+    else:
+        return jsonify({'success': False, 'message': 'Acción no válida'}), 400
+    if not hecho:
+        return jsonify({'success': False, 'message': 'La venta ya no está en conflicto'}), 409
+    return jsonify({'success': True, 'message': mensaje})
+
+@app.cli.command('sincronizar-ventas')
+@click.option('--lote', default=None, type=int, help='Ventas por transacción')
+@click.option('--continuo', is_flag=True, help='Sigue sincronizando cada --intervalo segundos')
+@click.option('--intervalo', default=5.0, type=float, help='Segundos entre pasadas con --continuo')
+def sincronizar_ventas(lote, continuo, intervalo):
+    """Registra en MySQL las ventas del diario local (VENTAS_MODO=diario o respaldo)"""
+    lote = lote or app.config['VENTAS_SINCRONIZACION_LOTE']
+    while True:
+        try:
+            # Contexto por pasada: la conexión vuelve al pool (o se descarta si se cayó)
+            with app.app_context():
+                totales = diario_ventas.sincronizar(mysql.connection, lote=lote)
+        except (MySQLdb.OperationalError, PoolAgotado) as e:
+            if not continuo or not diario_ventas.sin_conexion(e):
+                raise
+            print(f'Sin conexión con MySQL, se reintenta en {intervalo}s: {e}')
+        else:
+            if totales['lotes'] or not continuo:
+                print(f"{totales['sincronizadas']} ventas sincronizadas en {totales['lotes']} lotes, "
+                      f"{totales['conflictos']} en conflicto")
+        if not continuo:
+            break
+        time.sleep(intervalo)
+
+# --- Trabajos en segundo plano (utils/trabajos.py) -------------------------
+
+@trabajos.tarea('exportar_ventas', 'Exportar historial de ventas',
+                parametros=('fecha_inicio', 'fecha_fin', 'formato'))
+def tarea_exportar_ventas(contexto):
+    parametros = contexto.parametros
+    formato = parametros.get('formato') or 'csv'
+    if formato not in ('csv', 'xlsx'):
+        raise ValueError('Formato de exportación no válido')
+    for clave in ('fecha_inicio', 'fecha_fin'):
+        if parametros.get(clave):
+            datetime.strptime(parametros[clave], '%Y-%m-%d')
+    
+    # Solo los administradores encolan trabajos: historial completo, sin filtro por vendedor
+    where, params = filtro_ventas(parametros.get('fecha_inicio'), parametros.get('fecha_fin'), rol_id=1)
+    conn = mysql.connection
+    cur = conn.cursor()
+    cur.execute(f"SELECT COUNT(*) as Total FROM Facturacion f WHERE {where}", params)
+    total = cur.fetchone()['Total']
+    cur.close()
+    
+    rango = f"{parametros.get('fecha_inicio') or 'inicio'}_{parametros.get('fecha_fin') or datetime.now().strftime('%Y-%m-%d')}"
+    cur = conn.cursor(MySQLdb.cursors.SSDictCursor)
+    try:
+        cur.execute(sql_exportacion_ventas(where), params)
+        lector = trabajos.CursorConAvance(cur, contexto, total, 'ventas')
+        if formato == 'xlsx':
+            bloques = exportacion.xlsx_por_bloques(lector, COLUMNAS_EXPORTACION_VENTAS, 'Ventas')
+        else:
+            bloques = exportacion.csv_por_bloques(lector, COLUMNAS_EXPORTACION_VENTAS)
+        with open(contexto.archivo(f'ventas_{rango}.{formato}'), 'wb') as archivo:
+            for bloque in bloques:
+                archivo.write(bloque.encode('utf-8') if isinstance(bloque, str) else bloque)
+    finally:
+        cur.close()
+    return {'filas': lector.leidas}
+
+@trabajos.tarea('importar_productos', 'Importar productos desde CSV', parametros=('lote',), con_archivo=True)
+def tarea_importar_productos(contexto):
+    ruta = os.path.join(trabajos.directorio(), contexto.parametros['archivo'])
+    lote = limite_pagina(contexto.parametros.get('lote'), por_defecto=app.config['IMPORTACION_LOTE'], maximo=5000)
+    try:
+        with open(ruta, encoding='utf-8-sig', newline='') as texto:
+            total = max(sum(1 for _ in texto) - 1, 0)
+            texto.seek(0)
+            # Al cancelar se detiene entre lotes: los lotes ya escritos se conservan
+            for progreso in importacion.importar_productos(mysql.connection, texto, contexto.usuario_id, lote):
+                contexto.progreso(progreso['procesadas'] * 100 / total if total else None,
+                                  f"{progreso['procesadas']} filas - {progreso['insertados']} nuevos, "
+                                  f"{progreso['actualizados']} actualizados, {progreso['con_error']} con error")
+    finally:
+        os.remove(ruta)
+    # Los índices de búsqueda y códigos de los workers web se recargan solos
+    # (BUSQUEDA_REFRESCO / CODIGOS_REFRESCO)
+    return progreso
+
+@trabajos.tarea('reconciliar_stock', 'Reconciliar stock global y por bodega', parametros=('reparar',))
+def tarea_reconciliar_stock(contexto):
+    contexto.progreso(mensaje='Comparando existencias...')
+    reparar = str(contexto.parametros.get('reparar', '')).lower() in ('1', 'true', 'on')
+    reporte = stock.reconciliar(mysql.connection, reparar=reparar)
+    reporte['total_diferencias'] = len(reporte['diferencias'])
+    reporte['diferencias'] = reporte['diferencias'][:200]
+    return reporte
+
+@trabajos.tarea('reconstruir_resumen_ventas', 'Reconstruir resumen de ventas')
+def tarea_reconstruir_resumen_ventas(contexto):
+    contexto.progreso(mensaje='Recalculando desde el historial...')
+    return {'dias': resumen_ventas.reconstruir(mysql.connection)}
+
+@trabajos.tarea('reconstruir_resumen_inventario', 'Reconstruir resumen de inventario')
+def tarea_reconstruir_resumen_inventario(contexto):
+    contexto.progreso(mensaje='Recalculando desde el historial...')
+    return {'filas': resumen_inventario.reconstruir(mysql.connection)}
+
+@trabajos.tarea('reporte_abc', 'Análisis ABC completo (CSV)', parametros=('dias',))
+def tarea_reporte_abc(contexto):
+    dias = limite_pagina(contexto.parametros.get('dias'), por_defecto=90, maximo=730)
+    cur = mysql.connection.cursor()
+    try:
+        filas = resumen_inventario.analisis_abc(cur, dias=dias)
+    finally:
+        cur.close()
+    
+    with open(contexto.archivo(f'analisis_abc_{dias}_dias.csv'), 'w', encoding='utf-8', newline='') as archivo:
+        archivo.write('\ufeff')
+        escritor = csv.writer(archivo)
+        escritor.writerow(['Producto', 'Clase', 'Unidades Salidas', 'Valor Salidas', 'Participación Acumulada (%)'])
+        for fila in filas:
+            escritor.writerow([fila['Descripcion'], fila['Clase'], fila['Salidas'], fila['Valor_Salidas'],
+                               round(fila['Participacion_Acumulada'] * 100, 2)])
+    return {'productos': len(filas)}
+
+@app.route('/trabajos')
+@admin_required
+def trabajos_lista():
+    cur = mysql.connection.cursor()
+    lista = trabajos.listar(cur)
+    cur.close()
+    return render_template('trabajos/lista.html', trabajos=lista, tareas=trabajos.tareas())
+
+@app.route('/api/trabajos', methods=['POST'])
+@admin_required
+def trabajo_encolar():
+    datos = request.get_json(silent=True) or request.form
+    tipo = datos.get('tipo', '')
+    try:
+        permitidos = trabajos.parametros_permitidos(tipo)
+    except trabajos.TareaDesconocida as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    parametros = {clave: datos[clave] for clave in permitidos if datos.get(clave) not in (None, '')}
+    
+    if trabajos.requiere_archivo(tipo):
+        archivo = request.files.get('archivo')
+        if not archivo or not archivo.filename:
+            return jsonify({'success': False, 'message': 'Selecciona un archivo'}), 400
+        parametros['archivo'] = f'entrada_{uuid.uuid4().hex}'
+        archivo.save(os.path.join(trabajos.directorio(), parametros['archivo']))
+    
+    trabajo_id = trabajos.encolar(mysql.connection, tipo, parametros, session['user_id'])
+    return jsonify({
+        'success': True,
+        'trabajo_id': trabajo_id,
+        'url': url_for('trabajo_estado', id=trabajo_id)
+    }), 202
+
+@app.route('/api/trabajos/<int:id>')
+@admin_required
+def trabajo_estado(id):
+    cur = mysql.connection.cursor()
+    trabajo = trabajos.obtener(cur, id)
+    cur.close()
+    if trabajo is None:
+        return jsonify({'success': False, 'message': 'Trabajo no encontrado'}), 404
+    trabajo['descarga'] = url_for('trabajo_descargar', id=id) if trabajo['Archivo'] else None
+    return jsonify(trabajo)
+
+@app.route('/api/trabajos/<int:id>/cancelar', methods=['POST'])
+@admin_required
+def trabajo_cancelar(id):
+    if trabajos.cancelar(mysql.connection, id):
+        return jsonify({'success': True})
+    return jsonify({'success': False, 'message': 'El trabajo ya terminó'}), 409
+
+@app.route('/trabajos/<int:id>/descargar')
+@admin_required
+def trabajo_descargar(id):
+    cur = mysql.connection.cursor()
+    trabajo = trabajos.obtener(cur, id)
+    cur.close()
+    if trabajo is None or not trabajo['Archivo']:
+        flash('El trabajo no tiene archivo para descargar', 'warning')
+        return redirect(url_for('trabajos_lista'))
+    return send_from_directory(trabajos.directorio(), trabajo['Archivo'], as_attachment=True,
+                               download_name=trabajo['Archivo'].split('_', 1)[1])
+
+@app.cli.command('trabajador')
+@click.option('--una-vez', is_flag=True, help='Procesa los trabajos pendientes y termina')
+def trabajador(una_vez):
+    """Ejecuta los trabajos en segundo plano encolados desde la administración"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    trabajos.trabajador(mysql, una_vez=una_vez)
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -5,11 +5,93 @@ class Config:
     
     # Configuración de MySQL
     MYSQL_HOST = os.environ.get('MYSQL_HOST', 'localhost')
+    MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
     MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'sistema_ventas')
     MYSQL_CURSORCLASS = 'DictCursor'
     
+    # Pool de conexiones (por worker)
+    MYSQL_POOL_MIN_SIZE = int(os.environ.get('MYSQL_POOL_MIN_SIZE', 1))
+    MYSQL_POOL_MAX_SIZE = int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10))
+    MYSQL_POOL_RECYCLE = int(os.environ.get('MYSQL_POOL_RECYCLE', 3600))  # segundos
+    MYSQL_POOL_TIMEOUT = float(os.environ.get('MYSQL_POOL_TIMEOUT', 10))  # espera máxima por conexión
+    MYSQL_POOL_PING_INTERVAL = int(os.environ.get('MYSQL_POOL_PING_INTERVAL', 30))  # ping si estuvo inactiva
+    
+    # Quién actualiza las existencias: 'aplicacion' (vistas, por lotes) o 'triggers'
+    # (scripts/03_triggers.sql). Ver utils/stock.py
+    STOCK_MODO = os.environ.get('STOCK_MODO', 'aplicacion')
+    
+    # Reservas de stock: reintentos ante deadlock / lock wait timeout (utils/reservas.py)
+    STOCK_REINTENTOS = int(os.environ.get('STOCK_REINTENTOS', 3))
+    STOCK_BACKOFF_BASE = 0.05  # segundos
+    STOCK_BACKOFF_MAX = 0.5
+    STOCK_LOCK_TIMEOUT = int(os.environ.get('STOCK_LOCK_TIMEOUT', 5))  # innodb_lock_wait_timeout
+    
+    # Caché de tablas de referencia (categorías, unidades, bodegas, ...)
+    CATALOGO_CACHE_TTL = int(os.environ.get('CATALOGO_CACHE_TTL', 300))  # segundos
+    CATALOGO_CACHE_MAXSIZE = 64
+    
+    # Índice de búsqueda de productos: reconstrucción completa cada N segundos
+    BUSQUEDA_REFRESCO = int(os.environ.get('BUSQUEDA_REFRESCO', 300))
+    
+    # Índice de códigos de barras del POS: recarga completa cada N segundos
+    CODIGOS_REFRESCO = int(os.environ.get('CODIGOS_REFRESCO', 60))
+    
+    # Perfilado de SQL por request (utils/perfil_sql.py)
+    SQL_PERFIL = os.environ.get('SQL_PERFIL', '1') == '1'
+    SQL_PERFIL_HEADER = os.environ.get('SQL_PERFIL_HEADER', '0') == '1'  # X-SQL-* y Server-Timing
+    SQL_LENTA_MS = int(os.environ.get('SQL_LENTA_MS', 200))  # se registra en el log
+    SQL_N_MAS_UNO = int(os.environ.get('SQL_N_MAS_UNO', 5))  # repeticiones de una sentencia por request
+    
+    # Token opcional para /metrics (Authorization: Bearer <token>)
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    # Con varios workers (gunicorn) cada uno vuelca sus métricas a este directorio
+    # y /metrics las suma; vaciarlo al arrancar el servidor (utils/metricas.py)
+    METRICAS_DIR = os.environ.get('METRICAS_DIR')
+    METRICAS_VOLCADO = float(os.environ.get('METRICAS_VOLCADO', 1))  # segundos entre volcados
+    
+    # Importación masiva de productos: filas por lote/transacción (utils/importacion.py)
+    IMPORTACION_LOTE = int(os.environ.get('IMPORTACION_LOTE', 500))
+    
+    # Ventas: 'directo' (MySQL), 'diario' (SQLite local, se sincroniza después) o
+    # 'respaldo' (MySQL y el diario solo si no hay conexión). Ver utils/diario_ventas.py
+    VENTAS_MODO = os.environ.get('VENTAS_MODO', 'directo')
+    VENTAS_DIARIO = os.environ.get('VENTAS_DIARIO')  # archivo SQLite; por defecto instance/ventas_diario.sqlite3
+    VENTAS_SINCRONIZACION_LOTE = int(os.environ.get('VENTAS_SINCRONIZACION_LOTE', 50))  # ventas por transacción
+    
+    # Trabajos en segundo plano (utils/trabajos.py, flask --app app trabajador)
+    TRABAJOS_DIR = os.environ.get('TRABAJOS_DIR')  # archivos de entrada y resultados; por defecto instance/trabajos
+    TRABAJOS_ESPERA = float(os.environ.get('TRABAJOS_ESPERA', 2))  # segundos entre consultas a la cola vacía
+    TRABAJOS_LATIDO = float(os.environ.get('TRABAJOS_LATIDO', 2))  # segundos entre registros de avance
+    TRABAJOS_ABANDONO = int(os.environ.get('TRABAJOS_ABANDONO', 120))  # sin latido: el trabajador cayó
+    
+    # Hash de contraseñas (utils/auth.py): 'pbkdf2' o 'scrypt' y su costo. Los hashes con
+    # otros parámetros se regeneran en el siguiente login de cada usuario
+    PASSWORD_METODO = os.environ.get('PASSWORD_METODO', 'pbkdf2')
+    PASSWORD_PBKDF2_ITERACIONES = int(os.environ.get('PASSWORD_PBKDF2_ITERACIONES', 600000))
+    PASSWORD_SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', 32768))
+    PASSWORD_SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', 8))
+    PASSWORD_SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', 1))
+    # Pool de verificación del login por worker: hilos (0 = la mitad de los núcleos), logins en
+    # espera antes de rechazar con 503 y segundos máximos de espera
+    PASSWORD_HILOS = int(os.environ.get('PASSWORD_HILOS', 0))
+    PASSWORD_COLA = int(os.environ.get('PASSWORD_COLA', 32))
+    PASSWORD_ESPERA = float(os.environ.get('PASSWORD_ESPERA', 10))
+    PASSWORD_CACHE_TTL = int(os.environ.get('PASSWORD_CACHE_TTL', 300))  # logins correctos recientes; 0 desactiva
+    
+    # Sesiones del lado del servidor (utils/sesiones.py): 'sqlite' (archivo compartido por los
+    # workers del equipo), 'memoria' (un solo proceso) o 'cookie' (cookie firmada de Flask)
+    SESIONES_BACKEND = os.environ.get('SESIONES_BACKEND', 'sqlite')
+    SESIONES_ARCHIVO = os.environ.get('SESIONES_ARCHIVO')  # por defecto instance/sesiones.sqlite3
+    # Segundos entre recargas de roles; en cada una se revocan las sesiones de usuarios desactivados
+    SESIONES_PERMISOS_TTL = int(os.environ.get('SESIONES_PERMISOS_TTL', 60))
+    
+    # Fragmentos HTML cacheados por versión de los datos (utils/fragmentos.py, utils/versiones.py)
+    VERSIONES_TTL = float(os.environ.get('VERSIONES_TTL', 1))  # segundos que se reutiliza la lectura de versiones
+    FRAGMENTOS_TTL = int(os.environ.get('FRAGMENTOS_TTL', 600))
+    FRAGMENTOS_MAXSIZE = 32
+    
     # Configuración de sesión
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hora
     SESSION_COOKIE_SECURE = False  # Cambiar a True en producción con HTTPS
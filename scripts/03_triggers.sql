@@ -1,68 +1,44 @@
 -- Triggers para mantener la integridad del inventario
+-- Solo se usan con STOCK_MODO=triggers (ver utils/stock.py). Con el modo por
+-- defecto (aplicacion) las vistas actualizan el stock y estos triggers NO deben
+-- existir: eliminarlos con scripts/07_stock_modo_aplicacion.sql
 USE sistema_ventas;
 
-DELIMITER //
+DROP TRIGGER IF EXISTS after_detalle_factura_insert;
+DROP TRIGGER IF EXISTS after_detalle_movimiento_insert;
+DROP TRIGGER IF EXISTS after_movimiento_update_bodega;
 
--- Trigger para actualizar existencias después de una venta
-CREATE TRIGGER after_detalle_factura_insert
-AFTER INSERT ON Detalle_Facturacion
-FOR EACH ROW
-BEGIN
-    UPDATE Productos 
-    SET Existencias = Existencias - NEW.Cantidad
-    WHERE ID_Producto = NEW.ID_Producto;
-END//
+DELIMITER //
 
--- Trigger para actualizar existencias después de un movimiento de inventario
+-- Trigger único para actualizar existencias globales y por bodega después de
+-- un movimiento de inventario. Las ventas también registran su movimiento de
+-- salida, por lo que no se descuenta además desde Detalle_Facturacion.
 CREATE TRIGGER after_detalle_movimiento_insert
 AFTER INSERT ON Detalle_Movimiento_Inventario
 FOR EACH ROW
-BEGIN
-    DECLARE tipo_adicion VARCHAR(10);
-    
-    SELECT Adicion INTO tipo_adicion
-    FROM Catalogo_Movimientos cm
-    INNER JOIN Movimientos_Inventario mi ON cm.ID_TipoMovimiento = mi.ID_TipoMovimiento
-    WHERE mi.ID_Movimiento = NEW.ID_Movimiento;
-    
-    IF tipo_adicion = 'SI' THEN
-        UPDATE Productos 
-        SET Existencias = Existencias + NEW.Cantidad
-        WHERE ID_Producto = NEW.ID_Producto;
-    ELSE
-        UPDATE Productos 
-        SET Existencias = Existencias - NEW.Cantidad
-        WHERE ID_Producto = NEW.ID_Producto;
-    END IF;
-END//
-
--- Trigger para actualizar inventario por bodega
-CREATE TRIGGER after_movimiento_update_bodega
-AFTER INSERT ON Detalle_Movimiento_Inventario
-FOR EACH ROW
 BEGIN
     DECLARE bodega_id INT;
     DECLARE tipo_adicion VARCHAR(10);
+    DECLARE delta DECIMAL(10,2);
     
     SELECT mi.ID_Bodega, cm.Adicion INTO bodega_id, tipo_adicion
     FROM Movimientos_Inventario mi
     INNER JOIN Catalogo_Movimientos cm ON mi.ID_TipoMovimiento = cm.ID_TipoMovimiento
     WHERE mi.ID_Movimiento = NEW.ID_Movimiento;
     
-    IF EXISTS (SELECT 1 FROM Inventario_Bodega WHERE ID_Bodega = bodega_id AND ID_Producto = NEW.ID_Producto) THEN
-        IF tipo_adicion = 'SI' THEN
-            UPDATE Inventario_Bodega 
-            SET Existencias = Existencias + NEW.Cantidad
-            WHERE ID_Bodega = bodega_id AND ID_Producto = NEW.ID_Producto;
-        ELSE
-            UPDATE Inventario_Bodega 
-            SET Existencias = Existencias - NEW.Cantidad
-            WHERE ID_Bodega = bodega_id AND ID_Producto = NEW.ID_Producto;
-        END IF;
+    IF tipo_adicion IN ('SI', 'ENTRADA') THEN
+        SET delta = NEW.Cantidad;
     ELSE
-        INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
-        VALUES (bodega_id, NEW.ID_Producto, NEW.Cantidad);
+        SET delta = -NEW.Cantidad;
     END IF;
+    
+    UPDATE Productos 
+    SET Existencias = Existencias + delta
+    WHERE ID_Producto = NEW.ID_Producto;
+    
+    INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
+    VALUES (bodega_id, NEW.ID_Producto, delta)
+    ON DUPLICATE KEY UPDATE Existencias = Existencias + VALUES(Existencias);
 END//
 
 DELIMITER ;
@@ -0,0 +1,31 @@
+-- Tablas de resumen diario de ventas para el dashboard
+-- Se actualizan en la misma transacción de cada venta (utils/resumen_ventas.py)
+-- Para poblarlas desde el historial: flask --app app reconstruir-resumen-ventas
+USE sistema_ventas;
+
+-- Totales por día
+CREATE TABLE Resumen_Ventas_Diario (
+    Fecha DATE PRIMARY KEY,
+    Total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Num_Facturas INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB;
+
+-- Cantidades y montos por día y producto
+CREATE TABLE Resumen_Ventas_Producto (
+    Fecha DATE NOT NULL,
+    ID_Producto INT NOT NULL,
+    Cantidad DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Monto DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (Fecha, ID_Producto),
+    FOREIGN KEY (ID_Producto) REFERENCES Productos(ID_Producto)
+) ENGINE=InnoDB;
+
+-- Totales por día y método de pago
+CREATE TABLE Resumen_Ventas_MetodoPago (
+    Fecha DATE NOT NULL,
+    ID_MetodoPago INT NOT NULL,
+    Total DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Num_Facturas INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Fecha, ID_MetodoPago),
+    FOREIGN KEY (ID_MetodoPago) REFERENCES Metodos_Pago(ID_MetodoPago)
+) ENGINE=InnoDB;
@@ -0,0 +1,6 @@
+-- Índices para la paginación por keyset del catálogo del POS
+-- (Estado, Descripcion) + la PK implícita cubre ORDER BY Descripcion, ID_Producto
+USE sistema_ventas;
+
+CREATE INDEX idx_productos_estado_descripcion ON Productos(Estado, Descripcion);
+CREATE INDEX idx_productos_categoria_descripcion ON Productos(Categoria_ID, Estado, Descripcion);
@@ -0,0 +1,5 @@
+-- Código de barras / SKU para la lectura rápida en el POS
+USE sistema_ventas;
+
+ALTER TABLE Productos ADD COLUMN Codigo_Barras VARCHAR(50) NULL AFTER Descripcion;
+CREATE UNIQUE INDEX idx_productos_codigo_barras ON Productos(Codigo_Barras);
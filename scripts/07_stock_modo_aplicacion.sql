@@ -0,0 +1,11 @@
+-- Elimina los triggers de stock para STOCK_MODO=aplicacion (modo por defecto).
+-- En este modo las vistas actualizan Productos.Existencias e Inventario_Bodega
+-- por lotes; con los triggers activos cada movimiento se aplicaría dos veces.
+-- Después de ejecutarlo, revisar el descuadre acumulado con:
+--   flask --app app reconciliar-stock            (solo reporte)
+--   flask --app app reconciliar-stock --reparar  (ajusta Productos.Existencias)
+USE sistema_ventas;
+
+DROP TRIGGER IF EXISTS after_detalle_factura_insert;
+DROP TRIGGER IF EXISTS after_detalle_movimiento_insert;
+DROP TRIGGER IF EXISTS after_movimiento_update_bodega;
@@ -0,0 +1,10 @@
+-- Índices para la paginación por keyset del historial de ventas
+-- ORDER BY Fecha DESC, Hora DESC, ID_Factura DESC se resuelve recorriendo el
+-- índice hacia atrás; la PK implícita desempata por ID_Factura
+USE sistema_ventas;
+
+-- Administrador: todas las facturas activas
+CREATE INDEX idx_facturacion_estado_fecha_hora ON Facturacion(Estado, Fecha, Hora);
+-- Vendedor: solo sus facturas; incluye Total para que el conteo y la suma
+-- del rango se resuelvan solo con el índice
+CREATE INDEX idx_facturacion_usuario_estado_fecha_hora ON Facturacion(ID_Usuario, Estado, Fecha, Hora, Total);
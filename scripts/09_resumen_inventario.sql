@@ -0,0 +1,30 @@
+-- Tablas de resumen diario de movimientos para los reportes de inventario
+-- Se actualizan en la misma transacción de cada venta, entrada y salida
+-- (utils/resumen_inventario.py)
+-- Para poblarlas desde el historial: flask --app app reconstruir-resumen-inventario
+USE sistema_ventas;
+
+-- Unidades y valor movidos por día y producto
+CREATE TABLE Resumen_Inventario_Producto (
+    Fecha DATE NOT NULL,
+    ID_Producto INT NOT NULL,
+    Entradas DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Salidas DECIMAL(14,2) NOT NULL DEFAULT 0,
+    Valor_Entradas DECIMAL(16,2) NOT NULL DEFAULT 0,
+    Valor_Salidas DECIMAL(16,2) NOT NULL DEFAULT 0,
+    Num_Movimientos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Fecha, ID_Producto),
+    FOREIGN KEY (ID_Producto) REFERENCES Productos(ID_Producto)
+) ENGINE=InnoDB;
+
+-- "Sin movimiento en N días" busca por producto y fecha
+CREATE INDEX idx_resumen_inventario_producto_fecha ON Resumen_Inventario_Producto(ID_Producto, Fecha);
+
+-- Cantidad de movimientos por día y tipo
+CREATE TABLE Resumen_Inventario_Tipo (
+    Fecha DATE NOT NULL,
+    ID_TipoMovimiento INT NOT NULL,
+    Num_Movimientos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (Fecha, ID_TipoMovimiento),
+    FOREIGN KEY (ID_TipoMovimiento) REFERENCES Catalogo_Movimientos(ID_TipoMovimiento)
+) ENGINE=InnoDB;
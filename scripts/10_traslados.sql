@@ -0,0 +1,8 @@
+-- Tipos de movimiento para los traslados entre bodegas (/inventario/traslado)
+-- Cada traslado registra una salida en la bodega de origen y una entrada en la
+-- de destino dentro de la misma transacción
+USE sistema_ventas;
+
+INSERT INTO Catalogo_Movimientos (Descripcion, Adicion, Letra) VALUES
+('Salida por Traslado', 'SALIDA', 'T'),
+('Entrada por Traslado', 'ENTRADA', 'T');
@@ -0,0 +1,26 @@
+-- Cola de trabajos en segundo plano (utils/trabajos.py)
+-- Los encolan las páginas de administración y los ejecuta: flask --app app trabajador
+-- La toma de trabajos usa FOR UPDATE SKIP LOCKED (MySQL 8.0+)
+USE sistema_ventas;
+
+CREATE TABLE Trabajos (
+    ID_Trabajo INT AUTO_INCREMENT PRIMARY KEY,
+    Tipo VARCHAR(50) NOT NULL,
+    Parametros TEXT,
+    Estado ENUM('PENDIENTE', 'EN_CURSO', 'TERMINADO', 'ERROR', 'CANCELADO') NOT NULL DEFAULT 'PENDIENTE',
+    Progreso TINYINT UNSIGNED,
+    Mensaje VARCHAR(500),
+    Resultado MEDIUMTEXT,
+    Archivo VARCHAR(255),
+    Cancelar TINYINT(1) NOT NULL DEFAULT 0,
+    Trabajador VARCHAR(100),
+    ID_Usuario INT,
+    Fecha_Creacion DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    Fecha_Inicio DATETIME,
+    Fecha_Fin DATETIME,
+    Latido DATETIME,
+    FOREIGN KEY (ID_Usuario) REFERENCES Usuarios(ID_Usuario)
+) ENGINE=InnoDB;
+
+-- El trabajador busca el siguiente pendiente y los abandonados en curso
+CREATE INDEX idx_trabajos_estado ON Trabajos(Estado, ID_Trabajo);
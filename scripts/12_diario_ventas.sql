@@ -0,0 +1,8 @@
+-- Clave de idempotencia de las ventas (utils/diario_ventas.py)
+-- El POS manda una clave por venta; la sincronización del diario local y los
+-- reintentos del navegador la usan para no registrar dos veces la misma venta
+USE sistema_ventas;
+
+ALTER TABLE Facturacion
+    ADD COLUMN Clave_Idempotencia VARCHAR(64) NULL,
+    ADD UNIQUE INDEX uq_facturacion_clave_idempotencia (Clave_Idempotencia);
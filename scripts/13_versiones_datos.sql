@@ -0,0 +1,16 @@
+-- Contadores de versión de los datos (utils/versiones.py)
+-- Las escrituras de productos, movimientos y tablas de referencia incrementan su
+-- contador al confirmarse; los fragmentos HTML cacheados y los ETag de las
+-- páginas se identifican con estas versiones
+USE sistema_ventas;
+
+CREATE TABLE IF NOT EXISTS Versiones_Datos (
+    Nombre VARCHAR(40) PRIMARY KEY,
+    Version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    Fecha_Modificacion TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO Versiones_Datos (Nombre) VALUES
+('productos'),
+('movimientos'),
+('catalogos');
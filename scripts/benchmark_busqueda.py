@@ -0,0 +1,96 @@
+"""
+Benchmark del índice de búsqueda de productos (utils/busqueda.py).
+
+Genera un catálogo sintético, construye el índice de trigramas y mide la
+latencia de consultas exactas, por prefijo y con errores de tipeo. No
+necesita base de datos.
+
+Uso:
+    python scripts/benchmark_busqueda.py [--productos 100000] [--consultas 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.busqueda import IndiceTrigramas
+
+PRODUCTOS = ['leche', 'arroz', 'frijoles', 'azúcar', 'café', 'galletas', 'jabón', 'detergente',
+             'aceite', 'harina', 'refresco', 'jugo', 'pan', 'queso', 'mantequilla', 'cereal',
+             'shampoo', 'papel higiénico', 'servilletas', 'cloro', 'atún', 'sardinas', 'pasta',
+             'salsa de tomate', 'mayonesa', 'yogurt', 'huevos', 'chocolate', 'dulces', 'agua']
+MARCAS = ['La Perfecta', 'Dos Pinos', 'Maggi', 'Nestlé', 'Coca Cola', 'Pepsi', 'Colgate',
+          'Xedex', 'Ariel', 'Suli', 'Del Monte', 'Sabemas', 'Eskimo', 'Toledo', 'Kern\'s']
+PRESENTACIONES = ['250 ml', '500 ml', '1 lt', '2 lt', '100 gr', '400 gr', '1 kg', '5 lb',
+                  'pack 6', 'caja 12', 'sobre', 'bolsa', 'lata', 'botella']
+
+
+def generar_catalogo(n, semilla=42):
+    azar = random.Random(semilla)
+    return [(i, f"{azar.choice(PRODUCTOS)} {azar.choice(MARCAS)} {azar.choice(PRESENTACIONES)} {i}")
+            for i in range(1, n + 1)]
+
+
+def con_error(palabra, azar):
+    """Intercambia dos letras contiguas para simular un error de tipeo"""
+    if len(palabra) < 4:
+        return palabra
+    i = azar.randrange(1, len(palabra) - 2)
+    return palabra[:i] + palabra[i + 1] + palabra[i] + palabra[i + 2:]
+
+
+def generar_consultas(catalogo, n, semilla=7):
+    azar = random.Random(semilla)
+    consultas = {'exacta': [], 'prefijo': [], 'tipeo': []}
+    for _ in range(n):
+        _, texto = azar.choice(catalogo)
+        palabras = texto.split()
+        consultas['exacta'].append(' '.join(palabras[:2]))
+        consultas['prefijo'].append(palabras[0][:3])
+        consultas['tipeo'].append(con_error(palabras[0], azar) + ' ' + palabras[1])
+    return consultas
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=100000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    args = parser.parse_args()
+
+    catalogo = generar_catalogo(args.productos)
+    indice = IndiceTrigramas()
+
+    inicio = time.perf_counter()
+    indice.reconstruir(catalogo)
+    print(f'Índice de {len(indice)} productos construido en {time.perf_counter() - inicio:.2f}s')
+
+    inicio = time.perf_counter()
+    for doc_id, texto in catalogo[:1000]:
+        indice.agregar(doc_id, texto + ' editado')
+    print(f'Reindexado incremental: {(time.perf_counter() - inicio) * 1000 / 1000:.3f}ms por producto')
+
+    print(f"{'tipo':>8} | {'p50':>8} {'p99':>8} {'máx':>8} | {'sin resultados':>14}")
+    for tipo, consultas in generar_consultas(catalogo, args.consultas).items():
+        tiempos = []
+        vacias = 0
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            resultados = indice.buscar(consulta, limite=50)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            vacias += not resultados
+        print(f"{tipo:>8} | {statistics.median(tiempos):>6.2f}ms {percentil(tiempos, 0.99):>6.2f}ms "
+              f"{max(tiempos):>6.2f}ms | {vacias:>14}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Benchmark del checkout: flujo por línea (anterior) vs. flujo por lotes.
+
+Ejecuta ambas variantes contra la base configurada en las variables
+MYSQL_* para carritos de distintos tamaños, dentro de una transacción que
+se revierte al final, y reporta viajes a la base y latencias p50/p99.
+
+Con ``--concurrencia N`` mide además N cajas vendiendo a la vez (productos
+distintos en cada una, así solo comparten las filas del resumen diario)
+con el resumen de ventas actualizado al principio de la transacción vs. al
+final, como lo hace procesar_venta.
+
+Uso:
+    python scripts/benchmark_checkout.py [--repeticiones 50] [--bodega 1] [--concurrencia 8]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+import MySQLdb
+import MySQLdb.cursors
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import resumen_ventas
+from utils.checkout import consolidar_items, verificar_stock, registrar_detalles, descontar_stock
+
+TAMANOS_CARRITO = [1, 5, 10, 20, 40, 80]
+LINEAS_POR_CAJA = 5
+
+
+class CursorContador:
+    """Envuelve un cursor y cuenta cada viaje a la base"""
+
+    def __init__(self, cur):
+        self._cur = cur
+        self.viajes = 0
+
+    def execute(self, *args, **kwargs):
+        self.viajes += 1
+        return self._cur.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        # MySQLdb agrupa los INSERT ... VALUES en una sola sentencia multi-fila
+        self.viajes += 1
+        return self._cur.executemany(*args, **kwargs)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cur, nombre)
+
+
+def checkout_por_linea(cur, bodega_id, items):
+    """Réplica del flujo anterior de procesar_venta (una sentencia por línea)"""
+    for item in items:
+        cur.execute("""
+            SELECT p.Descripcion, COALESCE(ib.Existencias, 0) as Stock_Bodega
+            FROM Productos p
+            LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
+            WHERE p.ID_Producto = %s AND p.Estado = 1
+        """, (bodega_id, item['producto_id']))
+        cur.fetchone()
+
+    cur.execute("INSERT INTO Facturacion (Total, ID_MetodoPago) VALUES (0, NULL)")
+    factura_id = cur.lastrowid
+    cur.execute("INSERT INTO Movimientos_Inventario (Observacion, ID_Bodega) VALUES ('benchmark', %s)",
+                (bodega_id,))
+    movimiento_id = cur.lastrowid
+
+    for item in items:
+        cur.execute("""
+            INSERT INTO Detalle_Facturacion (ID_Factura, ID_Producto, Cantidad, Precio_Venta, Subtotal)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (factura_id, item['producto_id'], item['cantidad'], item['precio_venta'], item['subtotal']))
+        cur.execute("""
+            INSERT INTO Detalle_Movimiento_Inventario
+            (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (movimiento_id, item['producto_id'], item['cantidad'], 0, 0))
+        cur.execute("UPDATE Productos SET Existencias = Existencias - %s WHERE ID_Producto = %s",
+                    (item['cantidad'], item['producto_id']))
+        cur.execute("SELECT 1 FROM Inventario_Bodega WHERE ID_Producto = %s AND ID_Bodega = %s",
+                    (item['producto_id'], bodega_id))
+        if cur.fetchone():
+            cur.execute("""
+                UPDATE Inventario_Bodega SET Existencias = Existencias - %s
+                WHERE ID_Producto = %s AND ID_Bodega = %s
+            """, (item['cantidad'], item['producto_id'], bodega_id))
+        else:
+            cur.execute("INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias) VALUES (%s, %s, %s)",
+                        (bodega_id, item['producto_id'], -item['cantidad']))
+
+
+def checkout_por_lotes(cur, bodega_id, items):
+    """Flujo actual de procesar_venta usando utils.checkout"""
+    lineas = consolidar_items(items)
+    verificar_stock(cur, bodega_id, lineas)
+    cur.execute("INSERT INTO Facturacion (Total, ID_MetodoPago) VALUES (0, NULL)")
+    factura_id = cur.lastrowid
+    cur.execute("INSERT INTO Movimientos_Inventario (Observacion, ID_Bodega) VALUES ('benchmark', %s)",
+                (bodega_id,))
+    movimiento_id = cur.lastrowid
+    registrar_detalles(cur, factura_id, movimiento_id, lineas)
+    descontar_stock(cur, bodega_id, lineas)
+
+
+def carrito(productos):
+    return [{
+        'producto_id': p['ID_Producto'],
+        'cantidad': 1,
+        'precio_venta': float(p['Precio_Venta'] or 0),
+        'subtotal': float(p['Precio_Venta'] or 0)
+    } for p in productos]
+
+
+def medir(conn, funcion, bodega_id, items, repeticiones):
+    tiempos = []
+    viajes = 0
+    for _ in range(repeticiones):
+        cur = CursorContador(conn.cursor())
+        inicio = time.perf_counter()
+        funcion(cur, bodega_id, items)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        viajes = cur.viajes
+        cur.close()
+        conn.rollback()
+    tiempos.sort()
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    return viajes, statistics.median(tiempos), p99
+
+
+def venta_con_resumen(conn, bodega_id, items, metodo_pago_id, resumen_al_final):
+    """Checkout por lotes más el resumen de ventas, antes o después del stock"""
+    lineas = consolidar_items(items)
+    total = sum(linea['subtotal'] for linea in lineas)
+    cur = conn.cursor()
+    try:
+        if not resumen_al_final:
+            resumen_ventas.registrar_venta(cur, metodo_pago_id, total, lineas)
+        checkout_por_lotes(cur, bodega_id, items)
+        if resumen_al_final:
+            resumen_ventas.registrar_venta(cur, metodo_pago_id, total, lineas)
+    finally:
+        cur.close()
+        # Revertir suelta los locks igual que el commit, sin dejar datos
+        conn.rollback()
+
+
+def cajas_concurrentes(conectar, bodega_id, carritos, metodo_pago_id, repeticiones, resumen_al_final):
+    """Una conexión por caja; devuelve (ventas/s, p50, p99) de todas las ventas"""
+    tiempos = []
+    lock = threading.Lock()
+    listos = threading.Barrier(len(carritos) + 1)
+
+    def caja(items):
+        conn = conectar()
+        propios = []
+        listos.wait()
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            venta_con_resumen(conn, bodega_id, items, metodo_pago_id, resumen_al_final)
+            propios.append((time.perf_counter() - inicio) * 1000)
+        conn.close()
+        with lock:
+            tiempos.extend(propios)
+
+    hilos = [threading.Thread(target=caja, args=(items,)) for items in carritos]
+    for hilo in hilos:
+        hilo.start()
+    listos.wait()
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    tiempos.sort()
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    return len(tiempos) / duracion, statistics.median(tiempos), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--bodega', type=int, default=1)
+    parser.add_argument('--concurrencia', type=int, default=0, help='cajas vendiendo a la vez (0: no medir)')
+    args = parser.parse_args()
+
+    def conectar():
+        return MySQLdb.connect(
+            host=os.environ.get('MYSQL_HOST', 'localhost'),
+            user=os.environ.get('MYSQL_USER', 'root'),
+            passwd=os.environ.get('MYSQL_PASSWORD', 'admin'),
+            db=os.environ.get('MYSQL_DB', 'proyecto'),
+            cursorclass=MySQLdb.cursors.DictCursor,
+        )
+
+    conn = conectar()
+    necesarios = max(max(TAMANOS_CARRITO), args.concurrencia * LINEAS_POR_CAJA)
+    cur = conn.cursor()
+    cur.execute("SELECT ID_Producto, Precio_Venta FROM Productos WHERE Estado = 1 ORDER BY ID_Producto LIMIT %s",
+                (necesarios,))
+    productos = cur.fetchall()
+    cur.execute("SELECT ID_MetodoPago FROM Metodos_Pago ORDER BY ID_MetodoPago LIMIT 1")
+    metodo_pago = cur.fetchone()
+    cur.close()
+    if len(productos) < necesarios:
+        print(f'Se necesitan al menos {necesarios} productos activos, hay {len(productos)}')
+        return 1
+
+    print(f"{'líneas':>7} | {'viajes ant.':>11} {'p50 ant.':>9} {'p99 ant.':>9} | "
+          f"{'viajes lote':>11} {'p50 lote':>9} {'p99 lote':>9}")
+    for tamano in TAMANOS_CARRITO:
+        items = carrito(productos[:tamano])
+        v_ant, p50_ant, p99_ant = medir(conn, checkout_por_linea, args.bodega, items, args.repeticiones)
+        v_lote, p50_lote, p99_lote = medir(conn, checkout_por_lotes, args.bodega, items, args.repeticiones)
+        print(f"{tamano:>7} | {v_ant:>11} {p50_ant:>8.2f}ms {p99_ant:>8.2f}ms | "
+              f"{v_lote:>11} {p50_lote:>8.2f}ms {p99_lote:>8.2f}ms")
+    conn.close()
+
+    if args.concurrencia:
+        if metodo_pago is None:
+            print('Se necesita al menos un método de pago para medir el resumen de ventas')
+            return 1
+        carritos = [carrito(productos[i * LINEAS_POR_CAJA:(i + 1) * LINEAS_POR_CAJA])
+                    for i in range(args.concurrencia)]
+        print(f"\n{args.concurrencia} cajas concurrentes, {LINEAS_POR_CAJA} líneas por venta")
+        print(f"{'resumen':>10} | {'ventas/s':>9} {'p50':>9} {'p99':>9}")
+        for nombre, al_final in (('al inicio', False), ('al final', True)):
+            por_segundo, p50, p99 = cajas_concurrentes(conectar, args.bodega, carritos, metodo_pago['ID_MetodoPago'],
+                                                       args.repeticiones, al_final)
+            print(f"{nombre:>10} | {por_segundo:>9.1f} {p50:>7.2f}ms {p99:>7.2f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Benchmark de entradas de inventario: flujo por línea (anterior) vs. por lotes.
+
+Arma recepciones de hasta ``--lineas`` líneas (1k por defecto) con los
+productos activos de la base; si hay menos productos que líneas se repiten,
+lo que además ejercita la consolidación de líneas duplicadas. Cada
+recepción corre en una transacción que se revierte al final. Reporta
+viajes a la base y latencias p50/p99.
+
+Uso:
+    python scripts/benchmark_entrada.py [--lineas 1000] [--repeticiones 10] [--bodega 1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, mysql
+from benchmark_checkout import CursorContador
+from utils.movimientos import consolidar_lineas, registrar_entrada
+
+
+def entrada_por_linea(cur, bodega_id, items):
+    """Réplica del flujo anterior de inventario_entrada (tres sentencias por línea)"""
+    cur.execute("INSERT INTO Movimientos_Inventario (Observacion, ID_Bodega) VALUES ('benchmark', %s)",
+                (bodega_id,))
+    movimiento_id = cur.lastrowid
+    for item in items:
+        cur.execute("""
+            UPDATE Productos
+            SET Costo_Promedio = CASE
+                    WHEN Existencias <= 0 THEN %s
+                    ELSE ((Existencias * COALESCE(Costo_Promedio, 0)) + (%s * %s)) / (Existencias + %s)
+                END
+            WHERE ID_Producto = %s
+        """, (item['costo'], item['cantidad'], item['costo'], item['cantidad'], item['producto_id']))
+        cur.execute("UPDATE Productos SET Existencias = Existencias + %s WHERE ID_Producto = %s",
+                    (item['cantidad'], item['producto_id']))
+        cur.execute("""
+            INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE Existencias = Existencias + VALUES(Existencias)
+        """, (bodega_id, item['producto_id'], item['cantidad']))
+        cur.execute("""
+            INSERT INTO Detalle_Movimiento_Inventario
+            (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (movimiento_id, item['producto_id'], item['cantidad'], item['costo'], item['costo_total']))
+
+
+def entrada_por_lotes(cur, bodega_id, items):
+    """Flujo actual de inventario_entrada usando utils.movimientos"""
+    lineas = consolidar_lineas(items)
+    cur.execute("INSERT INTO Movimientos_Inventario (Observacion, ID_Bodega) VALUES ('benchmark', %s)",
+                (bodega_id,))
+    registrar_entrada(cur, cur.lastrowid, bodega_id, lineas)
+
+
+def medir(conn, funcion, bodega_id, items, repeticiones):
+    tiempos = []
+    viajes = 0
+    for _ in range(repeticiones):
+        cur = CursorContador(conn.cursor())
+        inicio = time.perf_counter()
+        funcion(cur, bodega_id, items)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        viajes = cur.viajes
+        cur.close()
+        conn.rollback()
+    tiempos.sort()
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    return viajes, statistics.median(tiempos), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lineas', type=int, default=1000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--bodega', type=int, default=1)
+    args = parser.parse_args()
+
+    with app.app_context():
+        # Solo el modo aplicación actualiza el stock desde la vista; se mide ese camino
+        app.config['STOCK_MODO'] = 'aplicacion'
+        conn = mysql.connection
+        cur = conn.cursor()
+        cur.execute("SELECT ID_Producto FROM Productos WHERE Estado = 1 ORDER BY ID_Producto LIMIT %s",
+                    (args.lineas,))
+        productos = [fila['ID_Producto'] for fila in cur.fetchall()]
+        cur.close()
+        if not productos:
+            print('No hay productos activos')
+            return 1
+
+        print(f"{'líneas':>7} {'productos':>9} | {'viajes ant.':>11} {'p50 ant.':>10} {'p99 ant.':>10} | "
+              f"{'viajes lote':>11} {'p50 lote':>10} {'p99 lote':>10}")
+        tamano = 10
+        while True:
+            tamano = min(tamano, args.lineas)
+            items = [{
+                'producto_id': productos[i % len(productos)],
+                'cantidad': 3,
+                'costo': 1.5 + (i % 7),
+                'costo_total': 3 * (1.5 + (i % 7)),
+            } for i in range(tamano)]
+            distintos = len({item['producto_id'] for item in items})
+            v_ant, p50_ant, p99_ant = medir(conn, entrada_por_linea, args.bodega, items, args.repeticiones)
+            v_lote, p50_lote, p99_lote = medir(conn, entrada_por_lotes, args.bodega, items, args.repeticiones)
+            print(f"{tamano:>7} {distintos:>9} | {v_ant:>11} {p50_ant:>8.1f}ms {p99_ant:>8.1f}ms | "
+                  f"{v_lote:>11} {p50_lote:>8.1f}ms {p99_lote:>8.1f}ms")
+            if tamano >= args.lineas:
+                break
+            tamano *= 10
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Benchmark de una ola de logins (utils/auth.py).
+
+Mide el costo de un hash con cada método y, para cada uno, simula una ola
+de logins concurrentes mientras otro hilo atiende "ventas" livianas:
+verificando en el hilo de cada request (anterior) vs. en el pool acotado
+de ``VerificadorPasswords``. Reporta latencia p50/p99 de logins y ventas y
+los logins rechazados por saturación. No necesita base de datos.
+
+Uso:
+    python scripts/benchmark_login.py [--logins 200] [--clientes 50] [--hilos 2]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.auth import VerificadorPasswords, VerificacionSaturada, hash_password, verify_password
+
+METODOS = [
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+    'scrypt:16384:8:1',
+    'scrypt:32768:8:1',
+]
+
+
+def percentil(tiempos, p):
+    if not tiempos:
+        return 0.0
+    ordenados = sorted(tiempos)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def venta_liviana():
+    """Trabajo de CPU comparable a armar la respuesta de una venta"""
+    return sum(i * i for i in range(5000))
+
+
+def medir_ventas(tiempos, detener):
+    while not detener.is_set():
+        inicio = time.perf_counter()
+        venta_liviana()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        time.sleep(0.005)
+
+
+def ola(password_hash, logins, clientes, verificar):
+    """Lanza ``logins`` verificaciones desde ``clientes`` hilos midiendo también las ventas"""
+    tiempos_login = []
+    tiempos_venta = []
+    rechazados = [0]
+    lock = threading.Lock()
+
+    def login(_):
+        inicio = time.perf_counter()
+        try:
+            verificar(password_hash, 'secreto123')
+        except VerificacionSaturada:
+            with lock:
+                rechazados[0] += 1
+            return
+        with lock:
+            tiempos_login.append((time.perf_counter() - inicio) * 1000)
+
+    detener = threading.Event()
+    ventas = threading.Thread(target=medir_ventas, args=(tiempos_venta, detener))
+    ventas.start()
+    time.sleep(0.2)  # línea base de las ventas antes de la ola
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as requests:
+        list(requests.map(login, range(logins)))
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    ventas.join()
+    return tiempos_login, tiempos_venta, rechazados[0], duracion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clientes', type=int, default=50, help='requests de login concurrentes')
+    parser.add_argument('--hilos', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='hilos del pool acotado (PASSWORD_HILOS)')
+    parser.add_argument('--cola', type=int, default=32, help='logins en espera (PASSWORD_COLA)')
+    parser.add_argument('--espera', type=float, default=10, help='segundos (PASSWORD_ESPERA)')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} núcleos, {args.logins} logins desde {args.clientes} clientes, '
+          f'pool de {args.hilos} hilos y cola de {args.cola}')
+    print(f"{'método':>22} {'modo':>8} | {'hash':>7} | {'login p50':>9} {'p99':>8} {'logins/s':>8} "
+          f"{'rechaz.':>7} | {'venta p50':>9} {'p99':>8}")
+    for metodo in METODOS:
+        inicio = time.perf_counter()
+        password_hash = hash_password('secreto123', metodo)
+        costo_ms = (time.perf_counter() - inicio) * 1000
+
+        pool = VerificadorPasswords(hilos=args.hilos, cola=args.cola, espera=args.espera)
+        for modo, verificar in (('directo', verify_password), ('pool', pool.verificar)):
+            logins, ventas, rechazados, duracion = ola(password_hash, args.logins, args.clientes, verificar)
+            print(f'{metodo:>22} {modo:>8} | {costo_ms:6.0f}ms | '
+                  f'{percentil(logins, 50):7.0f}ms {percentil(logins, 99):6.0f}ms '
+                  f'{len(logins) / duracion:8.1f} {rechazados:7d} | '
+                  f'{percentil(ventas, 50):7.2f}ms {percentil(ventas, 99):6.2f}ms')
+        pool.cerrar()
+
+    # Caché de logins recientes: el mismo usuario reintentando o abriendo varias pestañas
+    password_hash = hash_password('secreto123', METODOS[1])
+    pool = VerificadorPasswords(hilos=args.hilos, cache_ttl=300)
+    tiempos = []
+    for _ in range(20):
+        inicio = time.perf_counter()
+        pool.verificar(password_hash, 'secreto123')
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    print(f'Con PASSWORD_CACHE_TTL: primer login {tiempos[0]:.0f}ms, '
+          f'siguientes {statistics.median(tiempos[1:]):.3f}ms')
+    pool.cerrar()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
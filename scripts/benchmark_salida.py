@@ -0,0 +1,117 @@
+"""
+Benchmark de salidas de inventario: flujo por línea (anterior) vs. por lotes.
+
+Arma salidas de 10 hasta ``--lineas`` productos distintos de la bodega.
+Antes de cada medición (fuera del tiempo medido) suma stock suficiente a
+esos productos; todo corre en una transacción que se revierte al final.
+Reporta viajes a la base y latencias p50/p99.
+
+Uso:
+    python scripts/benchmark_salida.py [--lineas 500] [--repeticiones 10] [--bodega 1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, mysql
+from benchmark_checkout import CursorContador
+from utils.movimientos import consolidar_lineas, verificar_salida, registrar_salida, sumar_bodega
+
+
+def salida_por_linea(cur, bodega_id, items):
+    """Réplica del flujo anterior de inventario_salida (sin locks, 4 sentencias por línea)"""
+    for item in items:
+        cur.execute("""
+            SELECT COALESCE(ib.Existencias, 0) as Existencias_Bodega,
+                   p.Descripcion as Nombre_Producto
+            FROM Productos p
+            LEFT JOIN Inventario_Bodega ib ON p.ID_Producto = ib.ID_Producto AND ib.ID_Bodega = %s
+            WHERE p.ID_Producto = %s
+        """, (bodega_id, item['producto_id']))
+        cur.fetchone()
+
+    cur.execute("INSERT INTO Movimientos_Inventario (Observacion, ID_Bodega) VALUES ('benchmark', %s)",
+                (bodega_id,))
+    movimiento_id = cur.lastrowid
+    for item in items:
+        cur.execute("""
+            INSERT INTO Detalle_Movimiento_Inventario
+            (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (movimiento_id, item['producto_id'], item['cantidad'], 0, 0))
+        cur.execute("""
+            UPDATE Inventario_Bodega SET Existencias = Existencias - %s
+            WHERE ID_Bodega = %s AND ID_Producto = %s
+        """, (item['cantidad'], bodega_id, item['producto_id']))
+        cur.execute("UPDATE Productos SET Existencias = Existencias - %s WHERE ID_Producto = %s",
+                    (item['cantidad'], item['producto_id']))
+
+
+def salida_por_lotes(cur, bodega_id, items):
+    """Flujo actual de inventario_salida usando utils.movimientos"""
+    lineas = consolidar_lineas(items)
+    faltantes = verificar_salida(cur, bodega_id, lineas)
+    if faltantes:
+        raise RuntimeError(f'Faltantes inesperados: {faltantes[:3]}')
+    cur.execute("INSERT INTO Movimientos_Inventario (Observacion, ID_Bodega) VALUES ('benchmark', %s)",
+                (bodega_id,))
+    registrar_salida(cur, cur.lastrowid, bodega_id, lineas)
+
+
+def medir(conn, funcion, bodega_id, items, repeticiones):
+    tiempos = []
+    viajes = 0
+    for _ in range(repeticiones):
+        preparar = conn.cursor()
+        sumar_bodega(preparar, bodega_id, [(item['producto_id'], 1000) for item in items])
+        preparar.close()
+
+        cur = CursorContador(conn.cursor())
+        inicio = time.perf_counter()
+        funcion(cur, bodega_id, items)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        viajes = cur.viajes
+        cur.close()
+        conn.rollback()
+    tiempos.sort()
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    return viajes, statistics.median(tiempos), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lineas', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--bodega', type=int, default=1)
+    args = parser.parse_args()
+
+    with app.app_context():
+        app.config['STOCK_MODO'] = 'aplicacion'
+        conn = mysql.connection
+        cur = conn.cursor()
+        cur.execute("SELECT ID_Producto FROM Productos WHERE Estado = 1 ORDER BY ID_Producto LIMIT %s",
+                    (args.lineas,))
+        productos = [fila['ID_Producto'] for fila in cur.fetchall()]
+        cur.close()
+        if len(productos) < args.lineas:
+            print(f'Se necesitan al menos {args.lineas} productos activos, hay {len(productos)}')
+            return 1
+
+        print(f"{'líneas':>7} | {'viajes ant.':>11} {'p50 ant.':>10} {'p99 ant.':>10} | "
+              f"{'viajes lote':>11} {'p50 lote':>10} {'p99 lote':>10} | {'mejora':>6}")
+        for tamano in sorted({t for t in (10, 50, 100, 250, args.lineas) if t <= args.lineas}):
+            items = [{'producto_id': producto_id, 'cantidad': 2} for producto_id in productos[:tamano]]
+            v_ant, p50_ant, p99_ant = medir(conn, salida_por_linea, args.bodega, items, args.repeticiones)
+            v_lote, p50_lote, p99_lote = medir(conn, salida_por_lotes, args.bodega, items, args.repeticiones)
+            print(f"{tamano:>7} | {v_ant:>11} {p50_ant:>8.1f}ms {p99_ant:>8.1f}ms | "
+                  f"{v_lote:>11} {p50_lote:>8.1f}ms {p99_lote:>8.1f}ms | {p50_ant / p50_lote:>5.1f}x")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Prueba de carga concurrente de ventas contra una base MySQL local.
+
+Crea un producto de prueba con ``--stock`` unidades en la bodega, lanza
+``--hilos`` cajas que venden 1 unidad a la vez por /ventas/procesar hasta
+agotarlo y verifica que no se vendió más de lo que había (sin sobreventa)
+y que las existencias quedan en cero.
+
+Usar una base de pruebas: las facturas generadas no se eliminan.
+
+Uso:
+    MYSQL_POOL_MAX_SIZE=40 python scripts/prueba_carga_stock.py [--hilos 32] [--stock 200]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, mysql
+from utils import reservas
+
+
+def preparar(bodega_id, stock):
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT ID_Usuario FROM Usuarios WHERE Estado = 1 ORDER BY Rol_ID, ID_Usuario LIMIT 1")
+    usuario_id = cur.fetchone()['ID_Usuario']
+    cur.execute("SELECT ID_MetodoPago FROM Metodos_Pago ORDER BY ID_MetodoPago LIMIT 1")
+    metodo_pago_id = cur.fetchone()['ID_MetodoPago']
+    cur.execute("""
+        INSERT INTO Productos (Descripcion, Existencias, Estado, Precio_Venta, Costo_Promedio, Stock_Minimo)
+        VALUES (%s, %s, 1, 1, 1, 0)
+    """, (f'PRUEBA CARGA {int(time.time())}', stock))
+    producto_id = cur.lastrowid
+    cur.execute("INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias) VALUES (%s, %s, %s)",
+                (bodega_id, producto_id, stock))
+    mysql.connection.commit()
+    cur.close()
+    return usuario_id, metodo_pago_id, producto_id
+
+
+def caja(usuario_id, metodo_pago_id, producto_id, bodega_id, resultados, latencias):
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = usuario_id
+        sesion['rol_id'] = 2
+    venta = {
+        'items': [{'producto_id': producto_id, 'cantidad': 1, 'precio_venta': 1, 'subtotal': 1}],
+        'metodo_pago_id': metodo_pago_id,
+        'efectivo': 1,
+        'bodega_id': bodega_id,
+    }
+    while True:
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/ventas/procesar', json=venta)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        if respuesta.status_code == 200:
+            resultados['vendidas'] += 1
+        elif respuesta.status_code == 400:
+            resultados['sin_stock'] += 1
+            return
+        else:
+            resultados['errores'] += 1
+            print(f"Error: {respuesta.get_json().get('message')}")
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hilos', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=200)
+    parser.add_argument('--bodega', type=int, default=1)
+    args = parser.parse_args()
+
+    with app.app_context():
+        usuario_id, metodo_pago_id, producto_id = preparar(args.bodega, args.stock)
+
+    resultados = Counter()
+    latencias = []
+    hilos = [threading.Thread(target=caja, args=(usuario_id, metodo_pago_id, producto_id, args.bodega,
+                                                 resultados, latencias))
+             for _ in range(args.hilos)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT Existencias FROM Inventario_Bodega WHERE ID_Bodega = %s AND ID_Producto = %s",
+                    (args.bodega, producto_id))
+        final_bodega = float(cur.fetchone()['Existencias'])
+        cur.execute("SELECT Existencias FROM Productos WHERE ID_Producto = %s", (producto_id,))
+        final_global = float(cur.fetchone()['Existencias'])
+        cur.execute("SELECT COALESCE(SUM(Cantidad), 0) as Vendido FROM Detalle_Facturacion WHERE ID_Producto = %s",
+                    (producto_id,))
+        facturado = float(cur.fetchone()['Vendido'])
+        cur.close()
+
+    latencias.sort()
+    print(f"Producto #{producto_id}: {args.hilos} cajas, stock inicial {args.stock}, {duracion:.2f}s")
+    print(f"Ventas OK: {resultados['vendidas']} - rechazadas por stock: {resultados['sin_stock']} - "
+          f"errores: {resultados['errores']}")
+    print(f"Latencia p50 {latencias[len(latencias) // 2]:.1f}ms - "
+          f"p99 {latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]:.1f}ms")
+    print(f"Existencias finales: bodega {final_bodega}, global {final_global} - facturado {facturado}")
+    print(f"Contención: {reservas.metricas()}")
+
+    correcto = (resultados['vendidas'] == args.stock and facturado == args.stock
+                and final_bodega == 0 and final_global == 0)
+    print('OK: sin sobreventa' if correcto else 'FALLA: las existencias no cuadran')
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
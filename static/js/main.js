@@ -96,3 +96,24 @@ function mostrarToast(mensaje, tipo = "info") {
   const toast = new bootstrap.Toast(toastElement.firstElementChild)
   toast.show()
 }
+
+// Encola un trabajo en segundo plano (utils/trabajos.py) y lleva a la página de trabajos
+async function encolarTrabajo(datos) {
+  const cuerpo = datos instanceof FormData ? datos : new URLSearchParams(datos)
+  try {
+    const respuesta = await fetch("/api/trabajos", { method: "POST", body: cuerpo })
+    const resultado = await respuesta.json()
+    if (!resultado.success) {
+      mostrarToast(resultado.message || "No se pudo encolar el trabajo", "danger")
+      return false
+    }
+    mostrarToast(`Trabajo #${resultado.trabajo_id} encolado`, "success")
+    setTimeout(() => {
+      window.location.href = "/trabajos"
+    }, 800)
+    return true
+  } catch (error) {
+    mostrarToast("Error de conexión", "danger")
+    return false
+  }
+}
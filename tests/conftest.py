@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos de utils/ se importan como ``from utils import x``, igual que en app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip('flask')
+
+from utils.busqueda import IndiceTrigramas, normalizar, trigramas
+
+
+def test_normalizar_quita_tildes_y_separadores():
+    assert normalizar('  Café-Molido/500g ÑANDÚ ') == 'cafe molido 500g nandu'
+    assert normalizar(None) == ''
+
+
+def test_trigramas_palabra_completa_y_prefijo():
+    assert trigramas('sal') == {'  s', ' sa', 'sal', 'al '}
+    # Sin relleno final: los trigramas de 'ar' son prefijo de los de 'arroz'
+    assert trigramas('ar', completa=False) == {'  a', ' ar'}
+    assert trigramas('ar', completa=False) <= trigramas('arroz')
+
+
+@pytest.fixture
+def indice():
+    indice = IndiceTrigramas()
+    indice.reconstruir([
+        (1, 'Arroz blanco 1kg'),
+        (2, 'Arroz integral'),
+        (3, 'Harina de arroz'),
+        (4, 'Azúcar morena'),
+        (5, 'Aceite de oliva'),
+    ])
+    return indice
+
+
+def test_buscar_prefijo_mientras_se_escribe(indice):
+    ids = [doc_id for doc_id, _ in indice.buscar('arr')]
+    assert set(ids) == {1, 2, 3}
+
+
+def test_buscar_prioriza_coincidencia_al_inicio(indice):
+    resultados = indice.buscar('arroz')
+    assert resultados[0][0] in (1, 2)
+    assert resultados[-1][0] == 3
+    assert [puntaje for _, puntaje in resultados] == sorted((p for _, p in resultados), reverse=True)
+
+
+def test_buscar_tolera_tildes_y_errores_de_tipeo(indice):
+    assert indice.buscar('azucar')[0][0] == 4
+    assert indice.buscar('aceite olvia')[0][0] == 5
+
+
+def test_buscar_respeta_limite_y_consulta_vacia(indice):
+    assert len(indice.buscar('arroz', limite=2)) == 2
+    assert indice.buscar('  ') == []
+    assert indice.buscar('zzzz') == []
+
+
+def test_agregar_y_eliminar(indice):
+    indice.agregar(6, 'Arroz con leche')
+    assert 6 in [doc_id for doc_id, _ in indice.buscar('leche')]
+    indice.agregar(6, 'Leche entera')
+    assert 6 not in [doc_id for doc_id, _ in indice.buscar('arroz')]
+    indice.eliminar(6)
+    assert indice.buscar('leche') == []
+    assert len(indice) == 5
@@ -0,0 +1,65 @@
+import pytest
+
+from utils import cache
+from utils.cache import TTLCache
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj controlado para el TTL"""
+    actual = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: actual[0])
+    return actual
+
+
+def test_get_devuelve_lo_guardado(reloj):
+    c = TTLCache(ttl=10)
+    c.set('a', 1)
+    assert c.get('a') == (True, 1)
+    assert c.get('b') == (False, None)
+
+
+def test_entrada_expira_tras_el_ttl(reloj):
+    c = TTLCache(ttl=10)
+    c.set('a', 1)
+    reloj[0] += 9.9
+    assert c.get('a') == (True, 1)
+    reloj[0] += 0.2
+    assert c.get('a') == (False, None)
+    assert c.metricas()['entradas'] == 0
+
+
+def test_descarta_la_menos_usada_al_llenarse(reloj):
+    c = TTLCache(ttl=10, maxsize=2)
+    c.set('a', 1)
+    c.set('b', 2)
+    c.get('a')  # 'a' pasa a ser la más reciente
+    c.set('c', 3)
+    assert c.get('b') == (False, None)
+    assert c.get('a') == (True, 1)
+    assert c.get('c') == (True, 3)
+
+
+def test_get_or_load_solo_carga_si_falta(reloj):
+    c = TTLCache(ttl=10)
+    cargas = []
+
+    def cargar():
+        cargas.append(1)
+        return len(cargas)
+
+    assert c.get_or_load('a', cargar) == 1
+    assert c.get_or_load('a', cargar) == 1
+    reloj[0] += 11
+    assert c.get_or_load('a', cargar) == 2
+
+
+def test_invalidar_y_metricas(reloj):
+    c = TTLCache(ttl=10, maxsize=5)
+    c.set('a', 1)
+    c.set('b', 2)
+    c.get('a')
+    c.get('x')
+    c.invalidar('a', 'x')
+    c.limpiar()
+    assert c.metricas() == {'hits': 1, 'misses': 1, 'invalidaciones': 2, 'entradas': 0, 'maxsize': 5, 'ttl': 10}
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip('MySQLdb')
+pytest.importorskip('flask')
+
+from utils.checkout import consolidar_items
+
+
+def item(producto_id, cantidad, precio):
+    return {'producto_id': producto_id, 'cantidad': cantidad, 'precio_venta': precio,
+            'subtotal': cantidad * precio}
+
+
+def test_consolidar_items_suma_lineas_repetidas():
+    lineas = consolidar_items([item(7, 2, 10.0), item(3, 1, 4.5), item(7, 1, 10.0)])
+    assert lineas == [
+        {'producto_id': 3, 'cantidad': 1.0, 'precio_venta': 4.5, 'subtotal': 4.5},
+        {'producto_id': 7, 'cantidad': 3.0, 'precio_venta': 10.0, 'subtotal': 30.0},
+    ]
+
+
+def test_consolidar_items_ordena_por_id_y_convierte_tipos():
+    lineas = consolidar_items([
+        {'producto_id': '12', 'cantidad': '2', 'precio_venta': '1.5', 'subtotal': '3'},
+        {'producto_id': 5, 'cantidad': 1, 'precio_venta': 2, 'subtotal': 2},
+    ])
+    assert [linea['producto_id'] for linea in lineas] == [5, 12]
+    assert lineas[1] == {'producto_id': 12, 'cantidad': 2.0, 'precio_venta': 1.5, 'subtotal': 3.0}
+
+
+def test_consolidar_items_rechaza_precios_distintos_del_mismo_producto():
+    with pytest.raises(ValueError, match='precios distintos'):
+        consolidar_items([item(7, 1, 10.0), item(7, 1, 9.0)])
+
+
+def test_consolidar_items_vacio():
+    assert consolidar_items([]) == []
@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+pytest.importorskip('flask')
+
+from utils import catalogos, importacion
+
+CATEGORIAS = [{'ID_Categoria': 1, 'Descripcion': 'Abarrotes'}]
+UNIDADES = [{'ID_Unidad': 3, 'Descripcion': 'Kilogramo', 'Abreviatura': 'kg'}]
+
+
+@pytest.fixture(autouse=True)
+def catalogos_fijos(monkeypatch):
+    tablas = {'categorias': CATEGORIAS, 'unidades': UNIDADES}
+    monkeypatch.setattr(catalogos, 'obtener', lambda nombre: tablas[nombre])
+
+
+@pytest.fixture
+def lotes(monkeypatch):
+    """Reemplaza la escritura en la base: guarda cada lote y lo cuenta como altas"""
+    escritos = []
+
+    def escribir(conn, filas, usuario_id):
+        escritos.append(filas)
+        return len(filas), 0
+
+    monkeypatch.setattr(importacion, '_escribir_lote', escribir)
+    return escritos
+
+
+def test_validador_acepta_nombre_id_o_abreviatura():
+    validador = importacion._Validador()
+    fila = validador.fila({'descripcion': ' Arroz ', 'codigo_barras': '', 'categoria': 'ABARROTES',
+                           'unidad': 'kg', 'precio_venta': '1,50'})
+    assert fila == ('Arroz', None, 3, 1.5, 0, 1, 5)
+    fila = validador.fila({'descripcion': 'Frijol', 'codigo_barras': '770', 'categoria': '1', 'unidad': '3',
+                           'precio_venta': '2', 'costo_promedio': '1.2', 'stock_minimo': '10'})
+    assert fila == ('Frijol', '770', 3, 2.0, 1.2, 1, 10.0)
+
+
+@pytest.mark.parametrize('cambios, mensaje', [
+    ({'descripcion': ''}, 'descripcion es obligatoria'),
+    ({'descripcion': 'x' * 201}, '200 caracteres'),
+    ({'codigo_barras': '7' * 51}, '50 caracteres'),
+    ({'categoria': 'Bebidas'}, 'categoría desconocida'),
+    ({'unidad': 'litro'}, 'unidad desconocida'),
+    ({'precio_venta': ''}, 'precio_venta es obligatorio'),
+    ({'precio_venta': 'gratis'}, 'no es un número'),
+    ({'stock_minimo': '-1'}, 'no puede ser negativo'),
+])
+def test_validador_rechaza_filas_invalidas(cambios, mensaje):
+    datos = dict({'descripcion': 'Arroz', 'categoria': 'abarrotes', 'unidad': 'kg', 'precio_venta': '1'}, **cambios)
+    with pytest.raises(ValueError, match=mensaje):
+        importacion._Validador().fila(datos)
+
+
+def test_faltan_columnas():
+    with pytest.raises(importacion.ArchivoInvalido, match='precio_venta'):
+        list(importacion.importar_productos(None, io.StringIO('descripcion,categoria,unidad\n')))
+
+
+def test_importar_informa_errores_y_progreso_por_lote(lotes):
+    archivo = io.StringIO(
+        'Descripcion,Categoria,Unidad,Precio_Venta\n'
+        'Arroz,abarrotes,kg,1\n'
+        'Frijol,abarrotes,kg,2\n'
+        'Malo,bebidas,kg,3\n'
+        'Azucar,abarrotes,kg,4\n'
+    )
+    progreso = list(importacion.importar_productos(None, archivo, lote=2))
+    assert [len(lote) for lote in lotes] == [2, 1]
+    # Un avance por lote, incluido el último incompleto, y el resumen final
+    assert [p.get('terminado', False) for p in progreso] == [False, False, True]
+    assert progreso[1]['insertados'] == 3
+    final = progreso[-1]
+    assert (final['procesadas'], final['insertados'], final['con_error']) == (4, 3, 1)
+    assert final['errores'] == [{'linea': 4, 'error': 'categoría desconocida: bebidas'}]
@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip('MySQLdb')
+pytest.importorskip('flask')
+
+from utils.movimientos import consolidar_lineas
+
+
+def test_consolidar_lineas_costo_promedio_ponderado():
+    lineas = consolidar_lineas([
+        {'producto_id': 4, 'cantidad': 10, 'costo': 2.0},
+        {'producto_id': 4, 'cantidad': 30, 'costo': 4.0},
+    ])
+    assert lineas == [{'producto_id': 4, 'cantidad': 40.0, 'costo_total': 140.0, 'costo': 3.5}]
+
+
+def test_consolidar_lineas_ordena_por_producto_y_costo_opcional():
+    lineas = consolidar_lineas([
+        {'producto_id': '9', 'cantidad': '2', 'costo': '1.5'},
+        {'producto_id': 2, 'cantidad': 1},
+        {'producto_id': 9, 'cantidad': 2, 'costo': None},
+    ])
+    assert [linea['producto_id'] for linea in lineas] == [2, 9]
+    assert lineas[0]['costo'] == 0
+    assert lineas[1] == {'producto_id': 9, 'cantidad': 4.0, 'costo_total': 3.0, 'costo': 0.75}
+
+
+@pytest.mark.parametrize('cantidad', [0, -1, '-2.5'])
+def test_consolidar_lineas_rechaza_cantidades_no_positivas(cantidad):
+    with pytest.raises(ValueError, match='producto ID 3'):
+        consolidar_lineas([{'producto_id': 3, 'cantidad': cantidad, 'costo': 1}])
@@ -0,0 +1,34 @@
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+import pytest
+
+from utils.paginacion import codificar_cursor, decodificar_cursor, limite_pagina
+
+
+def test_cursor_ida_y_vuelta():
+    token = codificar_cursor(['Arroz', 42])
+    assert '=' not in token
+    assert decodificar_cursor(token, 2) == ['Arroz', 42]
+
+
+def test_cursor_convierte_tipos_de_mysql():
+    token = codificar_cursor([date(2024, 3, 1), timedelta(hours=1, minutes=2), Decimal('10.50'), time(8, 30)])
+    assert decodificar_cursor(token, 4) == ['2024-03-01', 3720, '10.50', '08:30:00']
+
+
+def test_cursor_vacio():
+    assert decodificar_cursor('', 2) is None
+    assert decodificar_cursor(None, 2) is None
+
+
+@pytest.mark.parametrize('token', ['no-es-base64!', codificar_cursor(['a']), 'e30'])
+def test_cursor_invalido(token):
+    # 'e30' es '{}': JSON válido pero no una lista
+    with pytest.raises(ValueError):
+        decodificar_cursor(token, 2)
+
+
+@pytest.mark.parametrize('valor, esperado', [(None, 50), ('abc', 50), ('20', 20), ('0', 1), ('999', 200)])
+def test_limite_pagina(valor, esperado):
+    assert limite_pagina(valor) == esperado
@@ -0,0 +1,62 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip('flask')
+
+from utils import serializacion
+from utils.serializacion import Proyeccion, numero
+
+FILAS = [
+    {'ID_Producto': 1, 'Descripcion': 'Arroz', 'Precio_Venta': Decimal('1.50'), 'Costo': Decimal('1.00')},
+    {'ID_Producto': 2, 'Descripcion': 'Sal', 'Precio_Venta': None, 'Costo': Decimal('0.30')},
+]
+
+
+def test_proyeccion_solo_campos_declarados_y_convertidos():
+    proyeccion = Proyeccion(ID_Producto=None, Precio_Venta=numero)
+    assert proyeccion.objetos(FILAS) == [
+        {'ID_Producto': 1, 'Precio_Venta': 1.5},
+        {'ID_Producto': 2, 'Precio_Venta': None},
+    ]
+
+
+def test_proyeccion_de_un_solo_campo():
+    assert Proyeccion(Descripcion=None).objeto(FILAS[0]) == {'Descripcion': 'Arroz'}
+
+
+def test_con_agrega_campos_al_final():
+    base = Proyeccion(ID_Producto=None)
+    extendida = base.con(Costo=numero)
+    assert extendida.campos == ('ID_Producto', 'Costo')
+    assert extendida.valores(FILAS[1]) == [2, 0.3]
+    assert base.campos == ('ID_Producto',)
+
+
+def test_formato_columnar():
+    proyeccion = Proyeccion(ID_Producto=None, Descripcion=None)
+    assert proyeccion.lista(FILAS, serializacion.FORMATO_COLUMNAS) == {
+        'campos': ['ID_Producto', 'Descripcion'],
+        'filas': [[1, 'Arroz'], [2, 'Sal']],
+    }
+    assert proyeccion.lista(FILAS) == proyeccion.objetos(FILAS)
+
+
+@pytest.mark.parametrize('valor, esperado', [(None, 'objetos'), ('', 'objetos'), ('objetos', 'objetos'),
+                                             ('columnas', 'columnas')])
+def test_formato(valor, esperado):
+    assert serializacion.formato(valor) == esperado
+
+
+def test_formato_invalido():
+    with pytest.raises(ValueError, match='xml'):
+        serializacion.formato('xml')
+
+
+def test_dumps_compacto_con_y_sin_orjson(monkeypatch):
+    datos = {'descripcion': 'Café', 'precio': 1.5, 'fecha': None}
+    esperado = {'descripcion': 'Café', 'precio': 1.5, 'fecha': None}
+    assert json.loads(serializacion.dumps(datos)) == esperado
+    monkeypatch.setattr(serializacion, 'orjson', None)
+    assert serializacion.dumps(datos) == '{"descripcion":"Café","precio":1.5,"fecha":null}'
@@ -0,0 +1,86 @@
+import pytest
+
+flask = pytest.importorskip('flask')
+
+from utils.sesiones import AlmacenMemoria, InterfazSesiones
+
+
+@pytest.fixture
+def almacen():
+    return AlmacenMemoria()
+
+
+@pytest.fixture
+def cliente(almacen):
+    app = flask.Flask(__name__)
+    app.secret_key = 'pruebas'
+    app.session_interface = InterfazSesiones(almacen)
+
+    @app.route('/carrito/<producto>')
+    def carrito(producto):
+        flask.session['carrito'] = producto
+        return ''
+
+    @app.route('/login/<int:usuario>')
+    def login(usuario):
+        flask.session['user_id'] = usuario
+        return ''
+
+    @app.route('/logout')
+    def logout():
+        flask.session.clear()
+        return ''
+
+    @app.route('/ver')
+    def ver():
+        return flask.jsonify(dict(flask.session))
+
+    return app.test_client()
+
+
+def sid(cliente):
+    cookie = cliente.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_cookie_solo_lleva_el_identificador(cliente, almacen):
+    cliente.get('/carrito/7')
+    assert 'carrito' not in sid(cliente)
+    assert almacen.leer(sid(cliente)) is not None
+    assert cliente.get('/ver').get_json() == {'carrito': '7'}
+
+
+def test_login_rota_el_identificador(cliente, almacen):
+    cliente.get('/carrito/7')
+    anonimo = sid(cliente)
+    cliente.get('/login/5')
+    autenticado = sid(cliente)
+    assert autenticado != anonimo
+    # La sesión anterior ya no sirve (fijación de sesión) y los datos pasan a la nueva
+    assert almacen.leer(anonimo) is None
+    assert cliente.get('/ver').get_json() == {'carrito': '7', 'user_id': 5}
+    assert almacen.usuarios() == {5}
+
+
+def test_cambio_de_usuario_tambien_rota(cliente):
+    cliente.get('/login/5')
+    primero = sid(cliente)
+    cliente.get('/login/6')
+    assert sid(cliente) != primero
+
+
+def test_modificar_sin_cambiar_usuario_conserva_el_identificador(cliente):
+    cliente.get('/login/5')
+    actual = sid(cliente)
+    cliente.get('/carrito/9')
+    assert sid(cliente) == actual
+    assert cliente.get('/ver').get_json() == {'user_id': 5, 'carrito': '9'}
+
+
+def test_logout_borra_la_sesion(cliente, almacen):
+    cliente.get('/login/5')
+    actual = sid(cliente)
+    cliente.get('/logout')
+    assert sid(cliente) is None
+    assert almacen.leer(actual) is None
+    assert almacen.contar() == 0
@@ -1,15 +1,203 @@
+"""
+Autenticación: hash de contraseñas y decoradores de acceso.
+
+El algoritmo y su costo se eligen con ``PASSWORD_METODO`` (``pbkdf2`` o
+``scrypt``) y sus parámetros. Los hashes creados con otros parámetros se
+siguen aceptando y ``login`` los regenera con la contraseña ya verificada
+(``necesita_rehash``), así subir el costo no obliga a nadie a cambiarla.
+
+La verificación del login corre en un pool acotado de ``PASSWORD_HILOS``
+hilos (hashlib libera el GIL mientras calcula): una ola de logins al abrir
+el turno ocupa como mucho esos núcleos y deja el resto a las ventas. Con
+más de ``PASSWORD_COLA`` logins esperando se rechaza de inmediato con
+``VerificacionSaturada`` en lugar de encolar sin límite. Los logins
+correctos se recuerdan ``PASSWORD_CACHE_TTL`` segundos con una clave HMAC
+de secreto aleatorio por proceso (nunca la contraseña).
+"""
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as EsperaAgotada
+
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, current_app, has_app_context
+
+from utils.cache import TTLCache
+
+
+class VerificacionSaturada(Exception):
+    """Hay demasiados logins esperando verificación; reintentar en unos segundos"""
+
+
+def metodo_hash(config):
+    """Método de Werkzeug (``pbkdf2:sha256:N`` o ``scrypt:n:r:p``) según la configuración"""
+    metodo = config.get('PASSWORD_METODO', 'pbkdf2')
+    if metodo == 'pbkdf2':
+        return f"pbkdf2:sha256:{int(config.get('PASSWORD_PBKDF2_ITERACIONES', 600000))}"
+    if metodo == 'scrypt':
+        return (f"scrypt:{int(config.get('PASSWORD_SCRYPT_N', 32768))}:"
+                f"{int(config.get('PASSWORD_SCRYPT_R', 8))}:{int(config.get('PASSWORD_SCRYPT_P', 1))}")
+    raise ValueError(f"PASSWORD_METODO desconocido: {metodo!r} (usar 'pbkdf2' o 'scrypt')")
+
 
-def hash_password(password):
-    """Genera un hash seguro de la contraseña"""
-    return generate_password_hash(password, method='pbkdf2:sha256')
+def _metodo_actual():
+    return metodo_hash(current_app.config if has_app_context() else {})
+
+
+def hash_password(password, metodo=None):
+    """Genera un hash seguro de la contraseña con el método configurado"""
+    return generate_password_hash(password, method=metodo or _metodo_actual())
 
 def verify_password(password_hash, password):
     """Verifica si la contraseña coincide con el hash"""
     return check_password_hash(password_hash, password)
 
+
+def necesita_rehash(password_hash, metodo=None):
+    """True si el hash se creó con otro algoritmo o costo que el configurado"""
+    return password_hash.split('$', 1)[0] != (metodo or _metodo_actual())
+
+
+class VerificadorPasswords:
+    """
+    Pool acotado para verificar y generar hashes de contraseñas.
+
+    ``hilos`` cálculos en paralelo como máximo, ``cola`` esperando turno y
+    ``espera`` segundos de tope para obtener el resultado; lo que excede
+    cualquiera de los tres lanza ``VerificacionSaturada``.
+    """
+
+    def __init__(self, hilos=2, cola=32, espera=10.0, cache_ttl=0, cache_maxsize=1024):
+        self.hilos = hilos
+        self.espera = espera
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='password')
+        self._cupos = threading.BoundedSemaphore(hilos + cola)
+        self._cache = TTLCache(ttl=cache_ttl, maxsize=cache_maxsize) if cache_ttl > 0 else None
+        self._secreto = os.urandom(32)
+        self._lock = threading.Lock()
+        self._stats = {
+            'verificaciones': 0,
+            'desde_cache': 0,
+            'rechazadas': 0,
+            'rehash': 0,
+            'espera_total_ms': 0.0,
+            'espera_max_ms': 0.0,
+            'calculo_total_ms': 0.0,
+        }
+
+    def _contar(self, clave, cantidad=1):
+        with self._lock:
+            self._stats[clave] += cantidad
+
+    def _calcular(self, encolado, funcion, *args):
+        inicio = time.perf_counter()
+        espera_ms = (inicio - encolado) * 1000
+        resultado = funcion(*args)
+        with self._lock:
+            self._stats['espera_total_ms'] += espera_ms
+            self._stats['espera_max_ms'] = max(self._stats['espera_max_ms'], espera_ms)
+            self._stats['calculo_total_ms'] += (time.perf_counter() - inicio) * 1000
+        return resultado
+
+    def _ejecutar(self, funcion, *args):
+        if not self._cupos.acquire(blocking=False):
+            self._contar('rechazadas')
+            raise VerificacionSaturada('Demasiados inicios de sesión simultáneos')
+        try:
+            futuro = self._pool.submit(self._calcular, time.perf_counter(), funcion, *args)
+        except BaseException:
+            self._cupos.release()
+            raise
+        # El cupo se libera cuando el cálculo termina (o se cancela antes de
+        # empezar), no al vencer la espera: un hash en curso no se puede cortar
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        try:
+            return futuro.result(timeout=self.espera)
+        except EsperaAgotada:
+            futuro.cancel()
+            self._contar('rechazadas')
+            raise VerificacionSaturada('La verificación de la contraseña tardó demasiado')
+
+    def _clave(self, password_hash, password):
+        return hmac.new(self._secreto, f'{password_hash}\0{password}'.encode('utf-8'),
+                        hashlib.sha256).digest()
+
+    def verificar(self, password_hash, password):
+        """Verifica la contraseña en el pool (o desde la caché de logins recientes)"""
+        clave = None
+        if self._cache is not None:
+            clave = self._clave(password_hash, password)
+            encontrado, _ = self._cache.get(clave)
+            if encontrado:
+                self._contar('desde_cache')
+                return True
+        valido = self._ejecutar(verify_password, password_hash, password)
+        self._contar('verificaciones')
+        if valido and clave is not None:
+            self._cache.set(clave, True)
+        return valido
+
+    def generar(self, password, metodo):
+        """Genera un hash nuevo en el pool (rehash del login)"""
+        nuevo = self._ejecutar(hash_password, password, metodo)
+        self._contar('rehash')
+        return nuevo
+
+    def metricas(self):
+        with self._lock:
+            datos = dict(self._stats)
+        datos['hilos'] = self.hilos
+        datos['cache'] = self._cache.metricas() if self._cache is not None else None
+        return datos
+
+    def cerrar(self):
+        self._pool.shutdown(wait=False)
+
+
+_verificador = None
+_verificador_pid = None
+_verificador_lock = threading.Lock()
+
+
+def verificador():
+    """Pool del proceso actual, creado con la configuración de la app (se recrea tras un fork)"""
+    global _verificador, _verificador_pid
+    pid = os.getpid()
+    if _verificador is None or _verificador_pid != pid:
+        with _verificador_lock:
+            if _verificador is None or _verificador_pid != pid:
+                config = current_app.config
+                _verificador = VerificadorPasswords(
+                    hilos=config.get('PASSWORD_HILOS') or max(1, (os.cpu_count() or 2) // 2),
+                    cola=config.get('PASSWORD_COLA', 32),
+                    espera=config.get('PASSWORD_ESPERA', 10.0),
+                    cache_ttl=config.get('PASSWORD_CACHE_TTL', 0),
+                )
+                _verificador_pid = pid
+    return _verificador
+
+
+def verificar_login(password_hash, password):
+    """
+    Verifica la contraseña de un login y devuelve ``(valida, nuevo_hash)``;
+    ``nuevo_hash`` viene solo si la contraseña es válida y el hash guardado
+    usa otros parámetros que los configurados. Lanza ``VerificacionSaturada``.
+    """
+    pool = verificador()
+    if not pool.verificar(password_hash, password):
+        return False, None
+    metodo = _metodo_actual()
+    if necesita_rehash(password_hash, metodo):
+        return True, pool.generar(password, metodo)
+    return True, None
+
+
+def metricas():
+    return verificador().metricas()
+
 def login_required(f):
     """Decorador para requerir autenticación"""
     @wraps(f)
@@ -0,0 +1,187 @@
+"""
+Índice de búsqueda de productos por trigramas, en memoria.
+
+Reemplaza el ``LIKE '%q%'`` (que no puede usar índices) por un índice
+invertido de trigramas sobre las descripciones normalizadas. Permite
+coincidencias por prefijo, tolera errores de tipeo y ordena por relevancia.
+
+Cada worker mantiene su propia copia: se actualiza al instante con las
+escrituras que atiende y se reconstruye completa cada
+``BUSQUEDA_REFRESCO`` segundos para recoger las de los demás procesos; la
+reconstrucción corre en segundo plano (utils/recarga.py) sin frenar las
+búsquedas.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+from flask import current_app
+
+from utils.db_helpers import execute_query
+from utils.recarga import RecargaPeriodica
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con cualquier separador convertido en espacio"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(' ', texto.lower()).strip()
+
+
+def trigramas(palabra, completa=True):
+    """
+    Trigramas de una palabra con relleno al inicio. Si la palabra no está
+    completa (el usuario la está escribiendo) no se rellena el final, así
+    sus trigramas son prefijo de los de cualquier palabra que empiece igual.
+    """
+    relleno = '  ' + palabra + (' ' if completa else '')
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+def _trigramas_texto(palabras, ultima_completa=True):
+    resultado = set()
+    for i, palabra in enumerate(palabras):
+        completa = ultima_completa or i < len(palabras) - 1
+        resultado |= trigramas(palabra, completa)
+    return resultado
+
+
+class IndiceTrigramas:
+    """Índice invertido trigrama -> IDs de documento, thread-safe"""
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._docs = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _quitar(self, doc_id):
+        anterior = self._docs.pop(doc_id, None)
+        if anterior is None:
+            return
+        for trigrama in anterior[1]:
+            ids = self._postings.get(trigrama)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self._postings[trigrama]
+
+    def agregar(self, doc_id, texto):
+        """Indexa (o reindexa) un documento"""
+        normalizado = normalizar(texto)
+        grams = _trigramas_texto(normalizado.split())
+        with self._lock:
+            self._quitar(doc_id)
+            self._docs[doc_id] = (normalizado, grams)
+            for trigrama in grams:
+                self._postings[trigrama].add(doc_id)
+
+    def eliminar(self, doc_id):
+        with self._lock:
+            self._quitar(doc_id)
+
+    def reconstruir(self, documentos):
+        """Reemplaza todo el contenido con ``documentos`` (pares id, texto)"""
+        postings = defaultdict(set)
+        docs = {}
+        for doc_id, texto in documentos:
+            normalizado = normalizar(texto)
+            grams = _trigramas_texto(normalizado.split())
+            docs[doc_id] = (normalizado, grams)
+            for trigrama in grams:
+                postings[trigrama].add(doc_id)
+        with self._lock:
+            self._postings = postings
+            self._docs = docs
+
+    def buscar(self, consulta, limite=50, similitud_minima=0.3):
+        """
+        Devuelve hasta ``limite`` pares ``(doc_id, puntaje)`` ordenados por
+        relevancia. Un documento es candidato si comparte al menos
+        ``similitud_minima`` de los trigramas de la consulta.
+        """
+        normalizado = normalizar(consulta)
+        palabras = normalizado.split()
+        if not palabras:
+            return []
+        grams = _trigramas_texto(palabras, ultima_completa=False)
+        minimo = max(1, math.ceil(len(grams) * similitud_minima))
+
+        with self._lock:
+            conteo = Counter()
+            for trigrama in grams:
+                ids = self._postings.get(trigrama)
+                if ids:
+                    conteo.update(ids)
+
+            if not conteo:
+                return []
+            # Solo se puntúan los documentos cercanos a la mejor coincidencia;
+            # el resto nunca llegaría a los primeros ``limite`` resultados
+            corte = max(minimo, math.ceil(max(conteo.values()) * 0.6))
+            candidatos = []
+            for doc_id, comunes in conteo.items():
+                if comunes < corte:
+                    continue
+                texto, doc_grams = self._docs[doc_id]
+                # Cobertura de la consulta + precisión sobre el documento
+                puntaje = comunes / len(grams) + 0.5 * comunes / len(doc_grams)
+                if normalizado in texto:
+                    puntaje += 1.0
+                    if texto.startswith(normalizado):
+                        puntaje += 0.5
+                candidatos.append((puntaje, -len(texto), doc_id))
+
+        mejores = heapq.nlargest(limite, candidatos)
+        return [(doc_id, round(puntaje, 4)) for puntaje, _, doc_id in mejores]
+
+
+_indice = IndiceTrigramas()
+
+
+def _documentos_activos():
+    filas = execute_query("SELECT ID_Producto, Descripcion FROM Productos WHERE Estado = 1", fetch_all=True)
+    return ((fila['ID_Producto'], fila['Descripcion']) for fila in filas)
+
+
+_recarga = RecargaPeriodica('busqueda', lambda: _indice.reconstruir(_documentos_activos()))
+
+
+def obtener_indice():
+    """
+    Índice de productos del proceso. Solo la primera carga espera a la base;
+    si venció, se reconstruye en segundo plano y mientras tanto se sigue
+    buscando sobre el contenido anterior.
+    """
+    _recarga.asegurar(current_app.config.get('BUSQUEDA_REFRESCO', 300))
+    return _indice
+
+
+def buscar(consulta, limite=50):
+    return obtener_indice().buscar(consulta, limite)
+
+
+def actualizar_producto(producto_id, descripcion):
+    """Refleja en el índice un producto creado o editado"""
+    if _recarga.cargado:
+        _indice.agregar(producto_id, descripcion)
+        _recarga.anotar(lambda: _indice.agregar(producto_id, descripcion))
+
+
+def quitar_producto(producto_id):
+    """Saca del índice un producto dado de baja"""
+    if _recarga.cargado:
+        _indice.eliminar(producto_id)
+        _recarga.anotar(lambda: _indice.eliminar(producto_id))
+
+
+def invalidar():
+    """Fuerza la reconstrucción completa en el próximo uso (p. ej. tras una importación masiva)"""
+    _recarga.vencer()
@@ -0,0 +1,73 @@
+"""
+Caché en memoria con expiración (TTL) y tamaño máximo.
+
+Es local a cada proceso: las invalidaciones explícitas solo alcanzan al
+worker que atendió la escritura y el TTL acota lo que tardan los demás.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Caché LRU thread-safe cuyas entradas expiran tras ``ttl`` segundos"""
+
+    def __init__(self, ttl=300, maxsize=128):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidaciones = 0
+
+    def get(self, clave):
+        """Devuelve ``(encontrado, valor)`` para la clave"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                expira, valor = entrada
+                if expira > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self._hits += 1
+                    return True, valor
+                del self._datos[clave]
+            self._misses += 1
+            return False, None
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def get_or_load(self, clave, cargar):
+        """Lee la clave o la carga con ``cargar()`` si no está o expiró"""
+        encontrado, valor = self.get(clave)
+        if not encontrado:
+            valor = cargar()
+            self.set(clave, valor)
+        return valor
+
+    def invalidar(self, *claves):
+        with self._lock:
+            for clave in claves:
+                if self._datos.pop(clave, None) is not None:
+                    self._invalidaciones += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._invalidaciones += len(self._datos)
+            self._datos.clear()
+
+    def metricas(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidaciones': self._invalidaciones,
+                'entradas': len(self._datos),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+            }
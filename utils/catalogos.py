@@ -0,0 +1,89 @@
+"""
+Lecturas cacheadas de las tablas de referencia (categorías, unidades,
+métodos de pago, bodegas, tipos de movimiento y proveedores).
+
+Las vistas que modifican estas tablas deben llamar a ``invalidar``.
+"""
+import threading
+
+from flask import current_app
+
+from utils.cache import TTLCache
+from utils.db_helpers import execute_query
+
+CONSULTAS = {
+    'categorias': "SELECT * FROM Categorias ORDER BY Descripcion",
+    'unidades': "SELECT * FROM Unidades_Medida ORDER BY Descripcion",
+    'metodos_pago': "SELECT * FROM Metodos_Pago ORDER BY Nombre",
+    'bodegas': "SELECT * FROM Bodegas ORDER BY Nombre",
+    'tipos_movimiento': "SELECT * FROM Catalogo_Movimientos ORDER BY Descripcion",
+    'proveedores': "SELECT * FROM Proveedores ORDER BY Nombre",
+}
+
+_cache = None
+_lock = threading.Lock()
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = TTLCache(ttl=current_app.config.get('CATALOGO_CACHE_TTL', 300),
+                                  maxsize=current_app.config.get('CATALOGO_CACHE_MAXSIZE', 64))
+    return _cache
+
+
+def obtener(nombre):
+    """Filas completas de una tabla de referencia, leídas a través de la caché"""
+    return _get_cache().get_or_load(nombre, lambda: execute_query(CONSULTAS[nombre], fetch_all=True))
+
+
+def invalidar(*nombres):
+    """Descarta las tablas indicadas para que la siguiente lectura vaya a la base"""
+    _get_cache().invalidar(*nombres)
+
+
+def metricas():
+    return _get_cache().metricas()
+
+
+def bodega(bodega_id):
+    """Bodega por ID o None"""
+    if not bodega_id:
+        return None
+    for fila in obtener('bodegas'):
+        if fila['ID_Bodega'] == int(bodega_id):
+            return fila
+    return None
+
+
+def tipo_movimiento(tipo_id):
+    """Tipo de movimiento por ID o None"""
+    if not tipo_id:
+        return None
+    for fila in obtener('tipos_movimiento'):
+        if fila['ID_TipoMovimiento'] == int(tipo_id):
+            return fila
+    return None
+
+
+def tipos_movimiento(adicion):
+    """Tipos de movimiento con el valor de Adicion indicado ('ENTRADA' o 'SALIDA')"""
+    return [fila for fila in obtener('tipos_movimiento') if fila['Adicion'] == adicion]
+
+
+def tipo_movimiento_venta():
+    """Tipo de movimiento de salida usado para registrar las ventas"""
+    for fila in tipos_movimiento('SALIDA'):
+        if 'VENTA' in (fila['Descripcion'] or '').upper():
+            return fila
+    return None
+
+
+def tipo_movimiento_traslado(adicion):
+    """Tipo de movimiento de traslado entre bodegas ('ENTRADA' o 'SALIDA')"""
+    for fila in tipos_movimiento(adicion):
+        if 'TRASLADO' in (fila['Descripcion'] or '').upper():
+            return fila
+    return None
@@ -0,0 +1,115 @@
+"""
+Motor de checkout por lotes para el POS.
+
+Todas las operaciones trabajan sobre el carrito completo con un número
+constante de sentencias, sin importar cuántas líneas tenga la venta.
+"""
+from utils.reservas import bloquear_stock
+
+
+def consolidar_items(items):
+    """
+    Agrupa líneas repetidas del mismo producto en una sola. Las repetidas
+    deben tener el mismo precio; si no, lanza ``ValueError`` (la venta
+    mezclaría precios en una sola línea de detalle).
+    """
+    consolidados = {}
+    for item in items:
+        producto_id = int(item['producto_id'])
+        cantidad = float(item['cantidad'])
+        subtotal = float(item['subtotal'])
+        if producto_id in consolidados:
+            linea = consolidados[producto_id]
+            if float(item['precio_venta']) != linea['precio_venta']:
+                raise ValueError(f'El producto ID {producto_id} aparece con precios distintos en el carrito')
+            linea['cantidad'] += cantidad
+            linea['subtotal'] += subtotal
+        else:
+            consolidados[producto_id] = {
+                'producto_id': producto_id,
+                'cantidad': cantidad,
+                'precio_venta': float(item['precio_venta']),
+                'subtotal': subtotal
+            }
+    # Orden determinista por ID para que todas las transacciones bloqueen igual
+    return [consolidados[pid] for pid in sorted(consolidados)]
+
+
+def _placeholders(n):
+    return ', '.join(['%s'] * n)
+
+
+def verificar_stock(cur, bodega_id, items):
+    """
+    Bloquea (FOR UPDATE, en orden de ID) el stock de todos los productos del
+    carrito en la bodega y lo compara con lo pedido. Devuelve la lista de
+    faltantes en el formato que ya muestra el POS.
+    """
+    ids = [item['producto_id'] for item in items]
+    existencias = bloquear_stock(cur, bodega_id, ids)
+
+    cur.execute(f"""
+        SELECT ID_Producto, Descripcion
+        FROM Productos
+        WHERE ID_Producto IN ({_placeholders(len(ids))}) AND Estado = 1
+    """, ids)
+    descripciones = {row['ID_Producto']: row['Descripcion'] for row in cur.fetchall()}
+
+    productos_sin_stock = []
+    for item in items:
+        if item['producto_id'] not in descripciones:
+            productos_sin_stock.append(f"Producto ID {item['producto_id']} no encontrado")
+            continue
+        stock_disponible = existencias[item['producto_id']]
+        if stock_disponible < item['cantidad']:
+            productos_sin_stock.append(
+                f"{descripciones[item['producto_id']]} (disp: {stock_disponible}, neces: {item['cantidad']})"
+            )
+    return productos_sin_stock
+
+
+def registrar_detalles(cur, factura_id, movimiento_id, items):
+    """Inserta el detalle de factura y de movimiento con inserts multi-fila"""
+    registrar_detalles_lote(cur, [(factura_id, movimiento_id, items)])
+
+
+def registrar_detalles_lote(cur, ventas):
+    """
+    Igual que ``registrar_detalles`` para varias ventas a la vez
+    (``ventas`` es una lista de ``(factura_id, movimiento_id, items)``): dos
+    inserts multi-fila para todo el lote
+    """
+    cur.executemany("""
+        INSERT INTO Detalle_Facturacion (ID_Factura, ID_Producto, Cantidad, Precio_Venta, Subtotal)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(factura_id, item['producto_id'], item['cantidad'], item['precio_venta'], item['subtotal'])
+          for factura_id, _, items in ventas for item in items])
+
+    cur.executemany("""
+        INSERT INTO Detalle_Movimiento_Inventario
+        (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(movimiento_id, item['producto_id'], item['cantidad'], 0, 0)
+          for _, movimiento_id, items in ventas for item in items])
+
+
+def descontar_stock(cur, bodega_id, items):
+    """Descuenta el stock de productos y bodega con dos sentencias por lote"""
+    casos = ' '.join(['WHEN %s THEN %s'] * len(items))
+    params = []
+    for item in items:
+        params.extend([item['producto_id'], item['cantidad']])
+    ids = [item['producto_id'] for item in items]
+    cur.execute(f"""
+        UPDATE Productos
+        SET Existencias = Existencias - (CASE ID_Producto {casos} END)
+        WHERE ID_Producto IN ({_placeholders(len(ids))})
+    """, params + ids)
+
+    # Si el producto no existe en la bodega se crea con existencia negativa,
+    # igual que el flujo anterior
+    cur.executemany("""
+        INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE Existencias = Existencias + VALUES(Existencias)
+    """, [(bodega_id, item['producto_id'], -item['cantidad']) for item in items])
@@ -0,0 +1,172 @@
+"""
+Índice en memoria de códigos de barras / SKU para el escaneo en el POS.
+
+Guarda por código solo los campos que necesita la caja (precio, unidad y
+existencias globales y por bodega), de modo que una lectura se resuelve
+con un acceso a diccionario sin tocar MySQL. Se mantiene al día con las
+ediciones de productos y los movimientos de stock del worker, y se recarga
+completo cada ``CODIGOS_REFRESCO`` segundos para recoger los de los demás;
+la recarga corre en segundo plano (utils/recarga.py) sin frenar el escaneo.
+
+Las existencias son informativas: la venta vuelve a validar y bloquear el
+stock real al procesarse.
+"""
+import threading
+
+from flask import current_app
+
+from utils.db_helpers import execute_query
+from utils.recarga import RecargaPeriodica
+
+_CONSULTA_PRODUCTOS = """
+    SELECT p.ID_Producto, p.Codigo_Barras, p.Descripcion, p.Precio_Venta,
+           p.Existencias, p.Categoria_ID, u.Abreviatura
+    FROM Productos p
+    LEFT JOIN Unidades_Medida u ON p.Unidad_Medida = u.ID_Unidad
+    WHERE p.Estado = 1 AND p.Codigo_Barras IS NOT NULL
+"""
+
+
+def _entrada(fila):
+    return {
+        'ID_Producto': fila['ID_Producto'],
+        'Codigo_Barras': fila['Codigo_Barras'],
+        'Descripcion': fila['Descripcion'],
+        'Precio_Venta': float(fila['Precio_Venta'] or 0),
+        'Existencias': float(fila['Existencias'] or 0),
+        'Categoria_ID': fila['Categoria_ID'],
+        'Abreviatura': fila['Abreviatura'],
+        'bodegas': {},
+    }
+
+
+class IndiceCodigos:
+    """Código -> datos de caja, con acceso secundario por ID de producto"""
+
+    def __init__(self):
+        self._por_codigo = {}
+        self._por_id = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._por_codigo)
+
+    def reconstruir(self, productos, existencias_bodega):
+        por_codigo = {}
+        por_id = {}
+        for fila in productos:
+            entrada = _entrada(fila)
+            por_codigo[entrada['Codigo_Barras']] = entrada
+            por_id[entrada['ID_Producto']] = entrada
+        for fila in existencias_bodega:
+            entrada = por_id.get(fila['ID_Producto'])
+            if entrada is not None:
+                entrada['bodegas'][fila['ID_Bodega']] = float(fila['Existencias'] or 0)
+        with self._lock:
+            self._por_codigo = por_codigo
+            self._por_id = por_id
+
+    def buscar(self, codigo, bodega_id=None):
+        """Datos del producto con ese código (copia) o None"""
+        entrada = self._por_codigo.get(codigo)
+        if entrada is None:
+            return None
+        resultado = {k: v for k, v in entrada.items() if k != 'bodegas'}
+        if bodega_id is not None:
+            resultado['Stock_Bodega'] = entrada['bodegas'].get(int(bodega_id), 0.0)
+        return resultado
+
+    def poner(self, fila, existencias_bodega=()):
+        """Agrega o reemplaza un producto; ``fila`` con las columnas de la consulta"""
+        entrada = _entrada(fila)
+        for existencia in existencias_bodega:
+            entrada['bodegas'][existencia['ID_Bodega']] = float(existencia['Existencias'] or 0)
+        with self._lock:
+            anterior = self._por_id.pop(entrada['ID_Producto'], None)
+            if anterior is not None:
+                self._por_codigo.pop(anterior['Codigo_Barras'], None)
+            self._por_codigo[entrada['Codigo_Barras']] = entrada
+            self._por_id[entrada['ID_Producto']] = entrada
+
+    def quitar(self, producto_id):
+        with self._lock:
+            anterior = self._por_id.pop(producto_id, None)
+            if anterior is not None:
+                self._por_codigo.pop(anterior['Codigo_Barras'], None)
+
+    def ajustar_stock(self, bodega_id, cambios):
+        """Aplica ``(producto_id, delta)`` a las existencias globales y de la bodega"""
+        bodega_id = int(bodega_id)
+        with self._lock:
+            for producto_id, delta in cambios:
+                entrada = self._por_id.get(int(producto_id))
+                if entrada is None:
+                    continue
+                entrada['Existencias'] += float(delta)
+                entrada['bodegas'][bodega_id] = entrada['bodegas'].get(bodega_id, 0.0) + float(delta)
+
+
+_indice = IndiceCodigos()
+
+
+def _cargar():
+    productos = execute_query(_CONSULTA_PRODUCTOS, fetch_all=True)
+    existencias = execute_query("""
+        SELECT ib.ID_Bodega, ib.ID_Producto, ib.Existencias
+        FROM Inventario_Bodega ib
+        INNER JOIN Productos p ON ib.ID_Producto = p.ID_Producto
+        WHERE p.Estado = 1 AND p.Codigo_Barras IS NOT NULL
+    """, fetch_all=True)
+    _indice.reconstruir(productos, existencias)
+
+
+_recarga = RecargaPeriodica('codigos', _cargar)
+
+
+def obtener_indice():
+    """
+    Índice del proceso. Solo la primera carga espera a la base; si venció,
+    se recarga en segundo plano y el escaneo sigue respondiendo con el
+    contenido anterior.
+    """
+    _recarga.asegurar(current_app.config.get('CODIGOS_REFRESCO', 60))
+    return _indice
+
+
+def buscar(codigo, bodega_id=None):
+    return obtener_indice().buscar(codigo, bodega_id)
+
+
+def _leer_producto(producto_id):
+    fila = execute_query(_CONSULTA_PRODUCTOS + " AND p.ID_Producto = %s", (producto_id,), fetch_one=True)
+    if fila is None:
+        _indice.quitar(producto_id)
+        return
+    existencias = execute_query(
+        "SELECT ID_Bodega, ID_Producto, Existencias FROM Inventario_Bodega WHERE ID_Producto = %s",
+        (producto_id,), fetch_all=True)
+    _indice.poner(fila, existencias)
+
+
+def recargar_producto(producto_id):
+    """Vuelve a leer un producto tras crearlo, editarlo o darlo de baja"""
+    if not _recarga.cargado:
+        return
+    _leer_producto(producto_id)
+    _recarga.anotar(lambda: _leer_producto(producto_id))
+
+
+def ajustar_stock(bodega_id, cambios):
+    """Refleja un movimiento de stock ya confirmado en la base"""
+    if not _recarga.cargado:
+        return
+    _indice.ajustar_stock(bodega_id, cambios)
+    # Si hay una recarga en curso no se sabe si su lectura ya incluye el
+    # movimiento: en lugar de reaplicar el delta se releen esos productos
+    productos = [int(producto_id) for producto_id, _ in cambios]
+    _recarga.anotar(lambda: [_leer_producto(producto_id) for producto_id in productos])
+
+
+def invalidar():
+    """Fuerza la reconstrucción completa en el próximo uso (p. ej. tras una importación masiva)"""
+    _recarga.vencer()
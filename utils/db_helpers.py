@@ -1,12 +1,15 @@
 from flask import current_app
 
+def get_connection():
+    """Conexión del request actual, tomada del pool de la aplicación"""
+    return current_app.extensions['mysql_pool'].connection
+
 def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=False):
     """
     Función helper para ejecutar queries de manera segura
     """
-    from app import mysql
-    
-    cur = mysql.connection.cursor()
+    conn = get_connection()
+    cur = conn.cursor()
     try:
         if params:
             cur.execute(query, params)
@@ -14,7 +17,7 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=F
             cur.execute(query)
         
         if commit:
-            mysql.connection.commit()
+            conn.commit()
             return cur.lastrowid
         
         if fetch_one:
@@ -25,7 +28,7 @@ def execute_query(query, params=None, fetch_one=False, fetch_all=False, commit=F
         
         return None
     except Exception as e:
-        mysql.connection.rollback()
+        conn.rollback()
         raise e
     finally:
         cur.close()
@@ -0,0 +1,262 @@
+"""
+Pool de conexiones MySQL por proceso (worker).
+
+Reemplaza a Flask-MySQLdb manteniendo la misma interfaz: las vistas siguen
+usando ``mysql.connection.cursor()``, pero la conexión se toma de un pool
+al primer uso dentro del request y se devuelve al terminar el contexto.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import MySQLdb
+import MySQLdb.cursors
+from flask import current_app, g
+
+from utils.perfil_sql import ConexionInstrumentada
+
+
+class PoolAgotado(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera"""
+
+
+class _ConexionPool:
+    """Conexión física más los datos que el pool necesita para reciclarla"""
+
+    __slots__ = ('conn', 'creada', 'ultimo_uso')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+
+
+class ConnectionPool:
+    """Pool thread-safe con tamaño mínimo/máximo, health check y reciclaje"""
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, recycle=3600,
+                 timeout=10, ping_interval=30, conectar=MySQLdb.connect):
+        self.connect_kwargs = connect_kwargs
+        self.conectar = conectar
+        self.min_size = min_size
+        self.max_size = max_size
+        self.recycle = recycle
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._libres = deque()
+        self._total = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'creadas': 0,
+            'recicladas': 0,
+            'descartadas': 0,
+            'esperas': 0,
+            'timeouts': 0,
+            'espera_total_ms': 0.0,
+            'espera_max_ms': 0.0,
+        }
+
+    def _conectar(self):
+        conn = self.conectar(**self.connect_kwargs)
+        with self._cond:
+            self._stats['creadas'] += 1
+        return _ConexionPool(conn)
+
+    def llenar(self):
+        """Abre conexiones hasta alcanzar el tamaño mínimo"""
+        while True:
+            with self._cond:
+                if self._total >= self.min_size:
+                    return
+                self._total += 1
+            try:
+                entrada = self._conectar()
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                raise
+            with self._cond:
+                self._libres.append(entrada)
+                self._cond.notify()
+
+    def _cerrar(self, entrada):
+        try:
+            entrada.conn.close()
+        except Exception:
+            pass
+
+    def _validar(self, entrada):
+        """Recicla conexiones viejas y hace ping a las que llevan tiempo inactivas"""
+        ahora = time.monotonic()
+        if self.recycle and ahora - entrada.creada > self.recycle:
+            self._cerrar(entrada)
+            with self._cond:
+                self._stats['recicladas'] += 1
+            return self._conectar()
+        if self.ping_interval is not None and ahora - entrada.ultimo_uso >= self.ping_interval:
+            try:
+                entrada.conn.ping()
+            except MySQLdb.Error:
+                self._cerrar(entrada)
+                with self._cond:
+                    self._stats['descartadas'] += 1
+                return self._conectar()
+        return entrada
+
+    def obtener(self):
+        """Toma una conexión del pool, esperando como máximo ``timeout`` segundos"""
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        entrada = None
+        espero = False
+        with self._cond:
+            while True:
+                if self._libres:
+                    entrada = self._libres.pop()
+                    break
+                if self._total < self.max_size:
+                    self._total += 1
+                    break
+                if not espero:
+                    espero = True
+                    self._stats['esperas'] += 1
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolAgotado(
+                        f'No hay conexiones libres ({self.max_size} en uso) tras {self.timeout}s'
+                    )
+                self._cond.wait(restante)
+
+            espera_ms = (time.monotonic() - inicio) * 1000
+            self._stats['checkouts'] += 1
+            self._stats['espera_total_ms'] += espera_ms
+            self._stats['espera_max_ms'] = max(self._stats['espera_max_ms'], espera_ms)
+
+        try:
+            entrada = self._conectar() if entrada is None else self._validar(entrada)
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        return entrada
+
+    def devolver(self, entrada, descartar=False):
+        """Devuelve la conexión al pool; las transacciones abiertas se revierten"""
+        if not descartar:
+            try:
+                entrada.conn.rollback()
+            except MySQLdb.Error:
+                descartar = True
+        with self._cond:
+            if descartar:
+                self._total -= 1
+                self._stats['descartadas'] += 1
+            else:
+                entrada.ultimo_uso = time.monotonic()
+                self._libres.append(entrada)
+            self._cond.notify()
+        if descartar:
+            self._cerrar(entrada)
+
+    def cerrar_todas(self):
+        with self._cond:
+            libres = list(self._libres)
+            self._libres.clear()
+            self._total -= len(libres)
+        for entrada in libres:
+            self._cerrar(entrada)
+
+    def metricas(self):
+        """Instantánea de uso del pool para monitoreo"""
+        with self._cond:
+            datos = dict(self._stats)
+            datos['tamano'] = self._total
+            datos['libres'] = len(self._libres)
+            datos['en_uso'] = self._total - len(self._libres)
+            datos['max'] = self.max_size
+        return datos
+
+
+class MySQLPool:
+    """Extensión de Flask compatible con ``flask_mysqldb.MySQL`` respaldada por un pool"""
+
+    def __init__(self, app=None):
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_USER', None)
+        app.config.setdefault('MYSQL_PASSWORD', None)
+        app.config.setdefault('MYSQL_DB', None)
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8mb4')
+        app.config.setdefault('MYSQL_CURSORCLASS', None)
+        app.config.setdefault('MYSQL_POOL_MIN_SIZE', 1)
+        app.config.setdefault('MYSQL_POOL_MAX_SIZE', 10)
+        app.config.setdefault('MYSQL_POOL_RECYCLE', 3600)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 10)
+        app.config.setdefault('MYSQL_POOL_PING_INTERVAL', 30)
+
+        app.extensions['mysql_pool'] = self
+        app.teardown_appcontext(self.teardown)
+
+    def _crear_pool(self, config):
+        connect_kwargs = {
+            'host': config['MYSQL_HOST'],
+            'port': int(config['MYSQL_PORT']),
+            'charset': config['MYSQL_CHARSET'],
+            'autocommit': False,
+        }
+        if config['MYSQL_USER']:
+            connect_kwargs['user'] = config['MYSQL_USER']
+        if config['MYSQL_PASSWORD']:
+            connect_kwargs['passwd'] = config['MYSQL_PASSWORD']
+        if config['MYSQL_DB']:
+            connect_kwargs['db'] = config['MYSQL_DB']
+        if config['MYSQL_CURSORCLASS']:
+            connect_kwargs['cursorclass'] = getattr(MySQLdb.cursors, config['MYSQL_CURSORCLASS'])
+
+        pool = ConnectionPool(
+            connect_kwargs,
+            min_size=int(config['MYSQL_POOL_MIN_SIZE']),
+            max_size=int(config['MYSQL_POOL_MAX_SIZE']),
+            recycle=int(config['MYSQL_POOL_RECYCLE']),
+            timeout=float(config['MYSQL_POOL_TIMEOUT']),
+            ping_interval=config['MYSQL_POOL_PING_INTERVAL'],
+            # Con el perfilado activo los cursores registran cada consulta (utils/perfil_sql.py)
+            conectar=ConexionInstrumentada if config.get('SQL_PERFIL') else MySQLdb.connect,
+        )
+        pool.llenar()
+        return pool
+
+    @property
+    def pool(self):
+        """Pool del proceso actual; se recrea tras un fork (workers de gunicorn)"""
+        pid = os.getpid()
+        if self._pool is None or self._pid != pid:
+            with self._lock:
+                if self._pool is None or self._pid != pid:
+                    self._pool = self._crear_pool(current_app.config)
+                    self._pid = pid
+        return self._pool
+
+    @property
+    def connection(self):
+        """Conexión asignada al contexto actual, tomada del pool en el primer uso"""
+        if 'mysql_conexion' not in g:
+            g.mysql_conexion = self.pool.obtener()
+        return g.mysql_conexion.conn
+
+    def teardown(self, exception):
+        entrada = g.pop('mysql_conexion', None)
+        if entrada is not None:
+            self._pool.devolver(entrada)
@@ -0,0 +1,312 @@
+"""
+Diario local de ventas para que el POS no dependa de la latencia (ni de la
+disponibilidad) de MySQL.
+
+Con ``VENTAS_MODO=diario`` cada venta se anota en un SQLite del equipo de
+caja (``VENTAS_DIARIO``) y se confirma al cajero de inmediato; con
+``VENTAS_MODO=respaldo`` se registra en MySQL como siempre y solo se anota
+en el diario si no hay conexión con el servidor. El proceso
+``flask --app app sincronizar-ventas`` las aplica después en
+``Facturacion`` por lotes: cada lote es una transacción que bloquea una
+sola vez el stock de todas sus ventas, las revisa en el orden en que se
+hicieron y registra las que alcanzan. Las demás quedan en el diario como
+conflicto, con el detalle de faltantes, para reintentarlas o descartarlas
+desde ``/ventas/pendientes``.
+
+Cada venta lleva una clave de idempotencia (la genera el POS) que se guarda
+en ``Facturacion.Clave_Idempotencia`` (scripts/12_diario_ventas.sql): si el
+proceso se cae entre el commit en MySQL y la marca en el diario, la
+siguiente pasada reconoce la venta como ya aplicada.
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import MySQLdb
+from flask import current_app
+
+from utils import catalogos, stock, resumen_ventas, resumen_inventario, versiones
+from utils.checkout import registrar_detalles_lote, descontar_stock
+from utils.db_pool import PoolAgotado
+from utils.reservas import bloquear_stock, ejecutar_transaccion
+
+PENDIENTE = 'PENDIENTE'
+SINCRONIZADA = 'SINCRONIZADA'
+CONFLICTO = 'CONFLICTO'
+DESCARTADA = 'DESCARTADA'
+
+MODO_DIRECTO = 'directo'
+MODO_DIARIO = 'diario'
+MODO_RESPALDO = 'respaldo'
+
+# Errores del cliente MySQL que indican que no se llega al servidor
+ERRORES_SIN_CONEXION = (2002, 2003, 2005, 2006, 2013, 2055)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ventas (
+    clave TEXT PRIMARY KEY,
+    datos TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'PENDIENTE',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    factura_id INTEGER,
+    creada TEXT NOT NULL,
+    sincronizada TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ventas_estado ON ventas(estado);
+"""
+
+_inicializados = set()
+
+
+def modo():
+    valor = current_app.config.get('VENTAS_MODO', MODO_DIRECTO)
+    if valor not in (MODO_DIRECTO, MODO_DIARIO, MODO_RESPALDO):
+        raise ValueError(f'VENTAS_MODO inválido: {valor}')
+    return valor
+
+
+def sin_conexion(error):
+    """True si ``error`` indica que MySQL no está disponible (y la venta puede ir al diario)"""
+    if isinstance(error, PoolAgotado):
+        return True
+    return (isinstance(error, MySQLdb.OperationalError) and bool(error.args)
+            and error.args[0] in ERRORES_SIN_CONEXION)
+
+
+def _conectar():
+    ruta = current_app.config.get('VENTAS_DIARIO') or os.path.join(current_app.instance_path,
+                                                                  'ventas_diario.sqlite3')
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    conn = sqlite3.connect(ruta, timeout=10, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # WAL con synchronous=FULL: la venta está en disco antes de confirmarla al cajero
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=FULL')
+    if ruta not in _inicializados:
+        conn.executescript(_ESQUEMA)
+        _inicializados.add(ruta)
+    return conn
+
+
+def anotar(venta):
+    """
+    Guarda la venta en el diario. Es idempotente por ``venta['clave']``:
+    devuelve False si esa venta ya estaba anotada.
+    """
+    with closing(_conectar()) as conn:
+        cur = conn.execute("""
+            INSERT OR IGNORE INTO ventas (clave, datos, estado, creada)
+            VALUES (?, ?, 'PENDIENTE', ?)
+        """, (venta['clave'], json.dumps(venta), datetime.now().isoformat(timespec='seconds')))
+        return cur.rowcount == 1
+
+
+def pendientes(limite):
+    """Las ventas pendientes más antiguas, en el orden en que se anotaron"""
+    with closing(_conectar()) as conn:
+        filas = conn.execute("""
+            SELECT datos FROM ventas
+            WHERE estado = 'PENDIENTE'
+            ORDER BY rowid
+            LIMIT ?
+        """, (limite,)).fetchall()
+    return [json.loads(fila['datos']) for fila in filas]
+
+
+def listar(estados=(PENDIENTE, CONFLICTO), limite=200):
+    with closing(_conectar()) as conn:
+        filas = conn.execute(f"""
+            SELECT clave, datos, estado, intentos, error, factura_id, creada, sincronizada
+            FROM ventas
+            WHERE estado IN ({', '.join('?' * len(estados))})
+            ORDER BY rowid
+            LIMIT ?
+        """, (*estados, limite)).fetchall()
+    resultado = []
+    for fila in filas:
+        venta = dict(fila)
+        venta['venta'] = json.loads(venta.pop('datos'))
+        resultado.append(venta)
+    return resultado
+
+
+def contar():
+    """Ventas del diario por estado"""
+    with closing(_conectar()) as conn:
+        filas = conn.execute("SELECT estado, COUNT(*) as total FROM ventas GROUP BY estado").fetchall()
+    return {fila['estado']: fila['total'] for fila in filas}
+
+
+def reintentar(clave):
+    """Devuelve una venta en conflicto a la cola de pendientes"""
+    with closing(_conectar()) as conn:
+        cur = conn.execute("UPDATE ventas SET estado = 'PENDIENTE', error = NULL "
+                           "WHERE clave = ? AND estado = 'CONFLICTO'", (clave,))
+        return cur.rowcount == 1
+
+
+def descartar(clave):
+    """Descarta una venta en conflicto (no se registrará en MySQL)"""
+    with closing(_conectar()) as conn:
+        cur = conn.execute("UPDATE ventas SET estado = 'DESCARTADA' "
+                           "WHERE clave = ? AND estado = 'CONFLICTO'", (clave,))
+        return cur.rowcount == 1
+
+
+def _marcar(resultados):
+    """``resultados``: lista de ``(clave, estado, factura_id, error)``, en una transacción"""
+    ahora = datetime.now().isoformat(timespec='seconds')
+    with closing(_conectar()) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany("""
+                UPDATE ventas
+                SET estado = ?, factura_id = ?, error = ?, intentos = intentos + 1,
+                    sincronizada = CASE WHEN ? = 'SINCRONIZADA' THEN ? ELSE sincronizada END
+                WHERE clave = ?
+            """, [(estado, factura_id, error, estado, ahora, clave)
+                  for clave, estado, factura_id, error in resultados])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+# --- Sincronización con MySQL ---------------------------------------------
+
+def _placeholders(n):
+    return ', '.join(['%s'] * n)
+
+
+def aplicar_lote(cur, ventas, tipo_movimiento):
+    """
+    Registra un lote de ventas del diario dentro de la transacción de
+    ``cur``. Devuelve ``(aplicadas, conflictos)``: ``{clave: factura_id}``
+    (incluidas las que ya estaban en MySQL) y ``{clave: [faltantes]}``.
+    """
+    claves = [venta['clave'] for venta in ventas]
+    cur.execute(f"""
+        SELECT ID_Factura, Clave_Idempotencia
+        FROM Facturacion
+        WHERE Clave_Idempotencia IN ({_placeholders(len(claves))})
+    """, claves)
+    aplicadas = {fila['Clave_Idempotencia']: fila['ID_Factura'] for fila in cur.fetchall()}
+    nuevas = [venta for venta in ventas if venta['clave'] not in aplicadas]
+    if not nuevas:
+        return aplicadas, {}
+
+    # Stock de todo el lote bloqueado una sola vez, bodega por bodega en orden de ID
+    productos_por_bodega = {}
+    for venta in nuevas:
+        productos_por_bodega.setdefault(int(venta['bodega_id']), set()).update(
+            linea['producto_id'] for linea in venta['lineas'])
+    disponible = {}
+    for bodega_id in sorted(productos_por_bodega):
+        for producto_id, existencias in bloquear_stock(cur, bodega_id, productos_por_bodega[bodega_id]).items():
+            disponible[(bodega_id, producto_id)] = existencias
+
+    ids = sorted(set().union(*productos_por_bodega.values()))
+    cur.execute(f"""
+        SELECT ID_Producto, Descripcion
+        FROM Productos
+        WHERE ID_Producto IN ({_placeholders(len(ids))}) AND Estado = 1
+    """, ids)
+    descripciones = {fila['ID_Producto']: fila['Descripcion'] for fila in cur.fetchall()}
+
+    # En el orden en que se vendieron: las primeras tienen prioridad sobre el stock
+    aceptadas = []
+    conflictos = {}
+    for venta in nuevas:
+        bodega_id = int(venta['bodega_id'])
+        faltantes = []
+        for linea in venta['lineas']:
+            producto_id = linea['producto_id']
+            if producto_id not in descripciones:
+                faltantes.append(f'Producto ID {producto_id} no encontrado')
+            elif disponible[(bodega_id, producto_id)] < linea['cantidad']:
+                faltantes.append(f"{descripciones[producto_id]} (disp: {disponible[(bodega_id, producto_id)]}, "
+                                 f"neces: {linea['cantidad']})")
+        if faltantes:
+            conflictos[venta['clave']] = faltantes
+            continue
+        for linea in venta['lineas']:
+            disponible[(bodega_id, linea['producto_id'])] -= linea['cantidad']
+        aceptadas.append(venta)
+
+    if not aceptadas:
+        return aplicadas, conflictos
+
+    cur.executemany("""
+        INSERT INTO Facturacion
+        (Fecha, Hora, Total, Efectivo, Cambio, ID_MetodoPago, Observacion, ID_Usuario, Clave_Idempotencia)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [(venta['fecha'], venta['hora'], venta['total'], venta['efectivo'], venta['cambio'],
+           venta['metodo_pago_id'], venta['observacion'], venta['usuario_id'], venta['clave'])
+          for venta in aceptadas])
+    cur.execute(f"""
+        SELECT ID_Factura, Clave_Idempotencia
+        FROM Facturacion
+        WHERE Clave_Idempotencia IN ({_placeholders(len(aceptadas))})
+    """, [venta['clave'] for venta in aceptadas])
+    facturas = {fila['Clave_Idempotencia']: fila['ID_Factura'] for fila in cur.fetchall()}
+
+    detalles = []
+    descuentos = {}
+    for venta in aceptadas:
+        factura_id = facturas[venta['clave']]
+        cur.execute("""
+            INSERT INTO Movimientos_Inventario (ID_TipoMovimiento, Fecha, Observacion, ID_Bodega)
+            VALUES (%s, %s, %s, %s)
+        """, (tipo_movimiento['ID_TipoMovimiento'], venta['fecha'], f"Venta - Factura #{factura_id}",
+              venta['bodega_id']))
+        detalles.append((factura_id, cur.lastrowid, venta['lineas']))
+        for linea in venta['lineas']:
+            clave_stock = (int(venta['bodega_id']), linea['producto_id'])
+            descuentos[clave_stock] = descuentos.get(clave_stock, 0.0) + linea['cantidad']
+        aplicadas[venta['clave']] = factura_id
+
+    registrar_detalles_lote(cur, detalles)
+    if stock.por_aplicacion():
+        # Un descuento por bodega con las cantidades de todo el lote sumadas
+        for bodega_id in sorted({bodega for bodega, _ in descuentos}):
+            descontar_stock(cur, bodega_id, [
+                {'producto_id': producto_id, 'cantidad': cantidad}
+                for (bodega, producto_id), cantidad in sorted(descuentos.items()) if bodega == bodega_id
+            ])
+
+    # Resúmenes al final, justo antes del commit: sus filas del día las
+    # comparten todas las ventas y así quedan bloqueadas el menor tiempo
+    for venta in aceptadas:
+        resumen_ventas.registrar_venta(cur, venta['metodo_pago_id'], venta['total'], venta['lineas'],
+                                       fecha=venta['fecha'])
+        resumen_inventario.registrar_movimiento(cur, tipo_movimiento, venta['lineas'], fecha=venta['fecha'])
+    return aplicadas, conflictos
+
+
+def sincronizar(conn, lote=50, max_lotes=None):
+    """
+    Aplica las ventas pendientes del diario en lotes de ``lote`` (una
+    transacción por lote, reintentada ante deadlocks). Devuelve los totales
+    ``{'lotes', 'sincronizadas', 'conflictos'}``.
+    """
+    tipo_movimiento = catalogos.tipo_movimiento_venta()
+    if not tipo_movimiento:
+        raise RuntimeError('Tipo de movimiento para venta no configurado')
+
+    totales = {'lotes': 0, 'sincronizadas': 0, 'conflictos': 0}
+    while max_lotes is None or totales['lotes'] < max_lotes:
+        ventas = pendientes(lote)
+        if not ventas:
+            break
+        aplicadas, conflictos = ejecutar_transaccion(conn, lambda cur: aplicar_lote(cur, ventas, tipo_movimiento))
+        if aplicadas:
+            versiones.incrementar(conn, versiones.MOVIMIENTOS)
+        _marcar([(clave, SINCRONIZADA, factura_id, None) for clave, factura_id in aplicadas.items()] +
+                [(clave, CONFLICTO, None, '; '.join(faltantes)) for clave, faltantes in conflictos.items()])
+        totales['lotes'] += 1
+        totales['sincronizadas'] += len(aplicadas)
+        totales['conflictos'] += len(conflictos)
+    return totales
@@ -0,0 +1,87 @@
+"""
+Exportación en streaming (CSV / XLSX) a partir de un cursor sin buffer.
+
+Las funciones reciben un cursor ``SSDictCursor`` ya ejecutado y generan el
+archivo por bloques, de modo que la memoria del worker no crece con la
+cantidad de filas.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+FILAS_POR_BLOQUE = 1000
+BYTES_POR_BLOQUE = 64 * 1024
+
+
+def _valor(valor):
+    if isinstance(valor, timedelta):
+        # MySQLdb devuelve las columnas TIME como timedelta
+        segundos = int(valor.total_seconds())
+        return f'{segundos // 3600:02d}:{segundos % 3600 // 60:02d}:{segundos % 60:02d}'
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+
+def csv_por_bloques(cursor, columnas):
+    """
+    Genera el CSV en bloques de texto. ``columnas`` es una lista de pares
+    ``(clave_en_fila, encabezado)``.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+    buffer.write('\ufeff')
+    escritor.writerow([encabezado for _, encabezado in columnas])
+
+    while True:
+        filas = cursor.fetchmany(FILAS_POR_BLOQUE)
+        if not filas:
+            break
+        for fila in filas:
+            escritor.writerow([_valor(fila[clave]) for clave, _ in columnas])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+    resto = buffer.getvalue()
+    if resto:
+        yield resto
+
+
+def xlsx_por_bloques(cursor, columnas, titulo='Datos'):
+    """
+    Genera un XLSX con openpyxl en modo ``write_only`` (las filas se vuelcan
+    a disco a medida que llegan) y lo entrega en bloques de bytes.
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=titulo)
+    hoja.append([encabezado for _, encabezado in columnas])
+
+    while True:
+        filas = cursor.fetchmany(FILAS_POR_BLOQUE)
+        if not filas:
+            break
+        for fila in filas:
+            hoja.append([
+                float(v) if isinstance(v, Decimal) else _valor(v)
+                for v in (fila[clave] for clave, _ in columnas)
+            ])
+
+    descriptor, ruta = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descriptor)
+    try:
+        libro.save(ruta)
+        with open(ruta, 'rb') as archivo:
+            while True:
+                bloque = archivo.read(BYTES_POR_BLOQUE)
+                if not bloque:
+                    break
+                yield bloque
+    finally:
+        os.remove(ruta)
@@ -0,0 +1,113 @@
+"""
+Caché de fragmentos HTML y respuestas condicionales (ETag / 304).
+
+``renderizar`` guarda el HTML de una plantilla parcial identificado por las
+versiones de los datos de los que depende (utils/versiones.py): mientras
+no cambien, la vista no consulta la base ni vuelve a renderizar la tabla.
+La caché es local a cada worker; como la clave lleva la versión, un cambio
+hecho en otro worker se nota en la siguiente lectura de versiones.
+
+``condicional`` marca la página con un ETag calculado a partir de esas
+mismas versiones, el usuario de la sesión y la revisión de las plantillas,
+y responde 304 sin generarla si el navegador ya la tiene;
+``condicional_datos`` hace lo mismo para las APIs JSON, con Last-Modified.
+"""
+import hashlib
+import os
+import threading
+
+from flask import current_app, make_response, render_template, request, session
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from utils import versiones
+from utils.cache import TTLCache
+
+_cache = None
+_revision = None
+_lock = threading.Lock()
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = TTLCache(ttl=current_app.config.get('FRAGMENTOS_TTL', 600),
+                                  maxsize=current_app.config.get('FRAGMENTOS_MAXSIZE', 32))
+    return _cache
+
+
+def version(*dependencias):
+    """Tupla con la versión actual de cada dependencia"""
+    actuales = versiones.obtener()
+    return tuple(actuales[nombre]['version'] for nombre in dependencias)
+
+
+def renderizar(plantilla, dependencias, cargar, clave=()):
+    """
+    HTML de ``plantilla`` renderizada con el contexto que devuelve
+    ``cargar()``; solo se llama a ``cargar`` si cambió alguna dependencia
+    (o el fragmento salió de la caché)
+    """
+    llave = (plantilla, tuple(clave), version(*dependencias))
+    return _get_cache().get_or_load(llave, lambda: Markup(render_template(plantilla, **cargar())))
+
+
+def revision_plantillas():
+    """Última modificación de las plantillas (cambia con cada despliegue que las toca)"""
+    global _revision
+    if _revision is None:
+        carpeta = os.path.join(current_app.root_path, current_app.template_folder)
+        _revision = max((os.path.getmtime(os.path.join(raiz, nombre))
+                         for raiz, _, archivos in os.walk(carpeta) for nombre in archivos), default=0)
+    return _revision
+
+
+def condicional(partes, generar):
+    """
+    Respuesta con ETag para la página identificada por ``partes``: 304 si
+    el navegador la tiene, si no ``generar()``. Las páginas con mensajes
+    flash pendientes son únicas y se generan sin ETag.
+    """
+    if session.get('_flashes'):
+        return generar()
+
+    datos = (revision_plantillas(), session.get('user_id'), session.get('username'),
+             session.get('rol_id'), session.get('rol_nombre'), request.full_path) + tuple(partes)
+    etag = hashlib.sha1(repr(datos).encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        respuesta = make_response('', 304)
+    else:
+        respuesta = make_response(generar())
+    respuesta.set_etag(etag)
+    # El navegador guarda la página pero la revalida siempre; nunca un proxy compartido
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+def condicional_datos(dependencias, generar):
+    """
+    Respuesta de una API con ETag y Last-Modified según las versiones de
+    ``dependencias`` y los parámetros del request: 304 sin llamar a
+    ``generar()`` (ni consultar la base) si el cliente ya la tiene. Solo
+    para respuestas que no dependen del usuario.
+    """
+    actuales = versiones.obtener()
+    datos = (request.full_path,) + tuple(actuales[nombre]['version'] for nombre in dependencias)
+    etag = hashlib.sha1(repr(datos).encode('utf-8')).hexdigest()
+    modificada = max(actuales[nombre]['modificada'] for nombre in dependencias)
+    if not is_resource_modified(request.environ, etag=etag, last_modified=modificada):
+        respuesta = make_response('', 304)
+    else:
+        respuesta = make_response(generar())
+        if respuesta.status_code != 200:
+            return respuesta
+    respuesta.set_etag(etag)
+    respuesta.last_modified = modificada
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+
+def metricas():
+    return _get_cache().metricas()
@@ -0,0 +1,217 @@
+"""
+Importación masiva de productos desde CSV.
+
+El archivo se recorre fila a fila con ``csv.DictReader`` (nunca se carga
+completo en memoria). Cada fila se valida contra las categorías y unidades
+de la caché de catálogos y las válidas se acumulan en lotes; cada lote se
+escribe con un único ``INSERT ... ON DUPLICATE KEY UPDATE`` multi-fila en
+su propia transacción. La clave natural es ``Codigo_Barras``: si ya existe
+se actualiza el producto, si no se crea. Las filas sin código se buscan por
+``descripcion`` entre los productos sin código.
+
+Columnas: ``codigo_barras``, ``descripcion``, ``categoria``, ``unidad``,
+``precio_venta`` y opcionalmente ``costo_promedio`` y ``stock_minimo``.
+Categoría y unidad aceptan el ID o el nombre (la unidad también la
+abreviatura).
+"""
+import csv
+
+from utils import catalogos, versiones
+
+COLUMNAS_REQUERIDAS = ('descripcion', 'categoria', 'unidad', 'precio_venta')
+# Errores por fila que se devuelven en detalle; los demás solo se cuentan
+MAX_ERRORES_DETALLE = 1000
+
+
+class ArchivoInvalido(Exception):
+    """El CSV no tiene las columnas necesarias"""
+
+
+def _indice_por_nombre(filas, id_campo, *campos):
+    indice = {}
+    for fila in filas:
+        indice[str(fila[id_campo])] = fila[id_campo]
+        for campo in campos:
+            if fila.get(campo):
+                indice[str(fila[campo]).strip().lower()] = fila[id_campo]
+    return indice
+
+
+def _numero(valor, campo, por_defecto=None):
+    valor = (valor or '').strip().replace(',', '.')
+    if not valor:
+        if por_defecto is None:
+            raise ValueError(f'{campo} es obligatorio')
+        return por_defecto
+    try:
+        numero = float(valor)
+    except ValueError:
+        raise ValueError(f'{campo} no es un número: {valor}') from None
+    if numero < 0:
+        raise ValueError(f'{campo} no puede ser negativo')
+    return numero
+
+
+class _Validador:
+    """Convierte una fila del CSV en la tupla a insertar o lanza ValueError"""
+
+    def __init__(self):
+        self.categorias = _indice_por_nombre(catalogos.obtener('categorias'), 'ID_Categoria', 'Descripcion')
+        self.unidades = _indice_por_nombre(catalogos.obtener('unidades'), 'ID_Unidad',
+                                           'Descripcion', 'Abreviatura')
+
+    def fila(self, datos):
+        descripcion = (datos.get('descripcion') or '').strip()
+        if not descripcion:
+            raise ValueError('descripcion es obligatoria')
+        if len(descripcion) > 200:
+            raise ValueError('descripcion supera los 200 caracteres')
+
+        codigo = (datos.get('codigo_barras') or '').strip() or None
+        if codigo and len(codigo) > 50:
+            raise ValueError('codigo_barras supera los 50 caracteres')
+
+        categoria = (datos.get('categoria') or '').strip().lower()
+        categoria_id = self.categorias.get(categoria)
+        if categoria_id is None:
+            raise ValueError(f"categoría desconocida: {datos.get('categoria')}")
+
+        unidad = (datos.get('unidad') or '').strip().lower()
+        unidad_id = self.unidades.get(unidad)
+        if unidad_id is None:
+            raise ValueError(f"unidad desconocida: {datos.get('unidad')}")
+
+        return (
+            descripcion,
+            codigo,
+            unidad_id,
+            _numero(datos.get('precio_venta'), 'precio_venta'),
+            _numero(datos.get('costo_promedio'), 'costo_promedio', 0),
+            categoria_id,
+            _numero(datos.get('stock_minimo'), 'stock_minimo', 5),
+        )
+
+
+def _escribir_lote(conn, filas, usuario_id):
+    """
+    Upsert de un lote en una transacción; devuelve (insertados, actualizados).
+    Las filas sin código se identifican por la descripción entre los
+    productos que tampoco tienen código, así reimportar el mismo archivo no
+    las duplica.
+    """
+    # Filas repetidas por código (o por descripción si no lo tienen) dentro del lote: gana la última
+    por_codigo = {}
+    por_descripcion = {}
+    for fila in filas:
+        if fila[1] is None:
+            por_descripcion[fila[0].lower()] = fila
+        else:
+            por_codigo[fila[1]] = fila
+
+    cur = conn.cursor()
+    try:
+        existentes = set()
+        if por_codigo:
+            codigos = list(por_codigo)
+            cur.execute(f"""
+                SELECT Codigo_Barras FROM Productos
+                WHERE Codigo_Barras IN ({', '.join(['%s'] * len(codigos))})
+            """, codigos)
+            existentes = {fila['Codigo_Barras'] for fila in cur.fetchall()}
+
+        sin_codigo_existentes = {}
+        if por_descripcion:
+            descripciones = [fila[0] for fila in por_descripcion.values()]
+            cur.execute(f"""
+                SELECT MIN(ID_Producto) AS ID_Producto, Descripcion FROM Productos
+                WHERE Codigo_Barras IS NULL AND Descripcion IN ({', '.join(['%s'] * len(descripciones))})
+                GROUP BY Descripcion
+            """, descripciones)
+            sin_codigo_existentes = {fila['Descripcion'].lower(): fila['ID_Producto'] for fila in cur.fetchall()}
+
+        nuevas = list(por_codigo.values()) + [fila for clave, fila in por_descripcion.items()
+                                              if clave not in sin_codigo_existentes]
+        # El costo promedio solo se toma en altas: en productos existentes lo
+        # mantienen las entradas de inventario
+        if nuevas:
+            cur.executemany("""
+                INSERT INTO Productos (Descripcion, Codigo_Barras, Unidad_Medida, Precio_Venta, Costo_Promedio,
+                                       Categoria_ID, Stock_Minimo, Usuario_Creador)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    Descripcion = VALUES(Descripcion),
+                    Unidad_Medida = VALUES(Unidad_Medida),
+                    Precio_Venta = VALUES(Precio_Venta),
+                    Categoria_ID = VALUES(Categoria_ID),
+                    Stock_Minimo = VALUES(Stock_Minimo),
+                    Estado = 1
+            """, [fila + (usuario_id,) for fila in nuevas])
+        if sin_codigo_existentes:
+            cur.executemany("""
+                UPDATE Productos
+                SET Unidad_Medida = %s, Precio_Venta = %s, Categoria_ID = %s, Stock_Minimo = %s, Estado = 1
+                WHERE ID_Producto = %s
+            """, [(fila[2], fila[3], fila[5], fila[6], sin_codigo_existentes[clave])
+                  for clave, fila in por_descripcion.items() if clave in sin_codigo_existentes])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    versiones.incrementar(conn, versiones.PRODUCTOS)
+
+    actualizados = len(existentes) + len(sin_codigo_existentes)
+    return len(por_codigo) + len(por_descripcion) - actualizados, actualizados
+
+
+def importar_productos(conn, archivo, usuario_id=None, lote=500):
+    """
+    Importa productos desde ``archivo`` (texto CSV). Es un generador: cada
+    lote escrito produce un dict de progreso y el último tiene
+    ``terminado=True`` con el resumen completo, incluidos los errores por
+    fila (número de línea del CSV y mensaje).
+    """
+    lector = csv.DictReader(archivo)
+    columnas = [c.strip().lower() for c in (lector.fieldnames or [])]
+    faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in columnas]
+    if faltantes:
+        raise ArchivoInvalido('Faltan columnas: ' + ', '.join(faltantes))
+    lector.fieldnames = columnas
+
+    validador = _Validador()
+    resumen = {'procesadas': 0, 'insertados': 0, 'actualizados': 0, 'con_error': 0, 'errores': []}
+    pendientes = []
+
+    def error(linea, mensaje):
+        resumen['con_error'] += 1
+        if len(resumen['errores']) < MAX_ERRORES_DETALLE:
+            resumen['errores'].append({'linea': linea, 'error': mensaje})
+
+    def escribir():
+        lineas = [linea for linea, _ in pendientes]
+        try:
+            insertados, actualizados = _escribir_lote(conn, [fila for _, fila in pendientes], usuario_id)
+        except Exception as e:
+            # El lote completo se revirtió: se informa en todas sus filas
+            for linea in lineas:
+                error(linea, f'lote rechazado por la base: {e}')
+        else:
+            resumen['insertados'] += insertados
+            resumen['actualizados'] += actualizados
+        pendientes.clear()
+
+    for datos in lector:
+        resumen['procesadas'] += 1
+        try:
+            pendientes.append((lector.line_num, validador.fila(datos)))
+        except ValueError as e:
+            error(lector.line_num, str(e))
+        if len(pendientes) >= lote:
+            escribir()
+            yield {k: v for k, v in resumen.items() if k != 'errores'}
+
+    if pendientes:
+        escribir()
+        yield {k: v for k, v in resumen.items() if k != 'errores'}
+    yield dict(resumen, terminado=True)
@@ -0,0 +1,285 @@
+"""
+Métricas de la aplicación en formato Prometheus, seguras con varios workers.
+
+Cada proceso acumula sus series en memoria (contadores, gauges e
+histogramas con etiquetas). Si ``METRICAS_DIR`` está configurado, el
+worker vuelca periódicamente una instantánea a ``<dir>/<pid>-<id>.json``
+(el id aleatorio se genera al arrancar el worker, así un PID reutilizado no
+pisa la instantánea de un worker anterior) y
+``/metrics`` suma las instantáneas de todos los workers, igual que el modo
+multiproceso de prometheus_client:
+
+- contadores e histogramas se suman, incluidos los de workers ya
+  terminados (así no retroceden cuando gunicorn recicla un worker);
+- los gauges solo se toman de los workers vivos y se agregan con suma o
+  máximo según la definición.
+
+El directorio debe vaciarse al arrancar el servidor (no entre reinicios de
+workers). Sin ``METRICAS_DIR`` se exporta solo el proceso actual.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app, g, request
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_ITEMS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+_definiciones = {}
+_series = {}
+_lock = threading.Lock()
+_recolectores = []
+_estado = {'dir': None, 'intervalo': 1.0, 'ultimo_volcado': 0.0, 'instancia': None}
+
+
+def definir(nombre, tipo, ayuda, buckets=None, agregacion='suma'):
+    """Declara una métrica: ``tipo`` es counter, gauge o histogram"""
+    _definiciones[nombre] = {
+        'tipo': tipo,
+        'ayuda': ayuda,
+        'buckets': tuple(buckets) if buckets else None,
+        'agregacion': agregacion,
+    }
+
+
+def _clave(etiquetas):
+    return tuple(sorted(etiquetas.items()))
+
+
+def incrementar(nombre, valor=1, **etiquetas):
+    clave = _clave(etiquetas)
+    with _lock:
+        serie = _series.setdefault(nombre, {})
+        serie[clave] = serie.get(clave, 0) + valor
+
+
+def fijar(nombre, valor, **etiquetas):
+    with _lock:
+        _series.setdefault(nombre, {})[_clave(etiquetas)] = valor
+
+
+def fijar_max(nombre, valor, **etiquetas):
+    clave = _clave(etiquetas)
+    with _lock:
+        serie = _series.setdefault(nombre, {})
+        serie[clave] = max(serie.get(clave, valor), valor)
+
+
+def observar(nombre, valor, **etiquetas):
+    """Agrega una observación al histograma"""
+    buckets = _definiciones[nombre]['buckets']
+    clave = _clave(etiquetas)
+    with _lock:
+        serie = _series.setdefault(nombre, {})
+        datos = serie.get(clave)
+        if datos is None:
+            datos = serie[clave] = {'buckets': [0] * len(buckets), 'suma': 0.0, 'cuenta': 0}
+        for i, limite in enumerate(buckets):
+            if valor <= limite:
+                datos['buckets'][i] += 1
+                break
+        datos['suma'] += valor
+        datos['cuenta'] += 1
+
+
+def registrar_recolector(funcion):
+    """``funcion()`` se llama antes de cada volcado para actualizar gauges"""
+    _recolectores.append(funcion)
+
+
+def _instantanea():
+    for funcion in _recolectores:
+        try:
+            funcion()
+        except Exception:
+            pass
+    with _lock:
+        return {
+            nombre: [[list(clave), valor if not isinstance(valor, dict) else
+                      {'buckets': list(valor['buckets']), 'suma': valor['suma'], 'cuenta': valor['cuenta']}]
+                     for clave, valor in serie.items()]
+            for nombre, serie in _series.items()
+        }
+
+
+def _instancia():
+    """Identificador del proceso actual; se regenera en cada fork"""
+    pid, instancia = _estado['instancia'] or (None, None)
+    if pid != os.getpid():
+        pid = os.getpid()
+        instancia = f'{pid}-{uuid.uuid4().hex[:12]}'
+        _estado['instancia'] = (pid, instancia)
+    return instancia
+
+
+def volcar(forzar=False):
+    """Escribe la instantánea del worker (a lo sumo una vez por intervalo)"""
+    directorio = _estado['dir']
+    if not directorio:
+        return
+    ahora = time.monotonic()
+    if not forzar and ahora - _estado['ultimo_volcado'] < _estado['intervalo']:
+        return
+    _estado['ultimo_volcado'] = ahora
+    instancia = _instancia()
+    datos = json.dumps({'pid': os.getpid(), 'instancia': instancia, 'series': _instantanea()},
+                       separators=(',', ':'))
+    ruta = os.path.join(directorio, f'{instancia}.json')
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        archivo.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _leer_workers():
+    directorio = _estado['dir']
+    if not directorio:
+        return [{'pid': os.getpid(), 'instancia': _instancia(), 'series': _instantanea()}]
+    volcar(forzar=True)
+    workers = []
+    for nombre in os.listdir(directorio):
+        if not nombre.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directorio, nombre), encoding='utf-8') as archivo:
+                workers.append(json.load(archivo))
+        except (OSError, ValueError):
+            continue
+    return workers
+
+
+def agregar():
+    """Suma las series de todos los workers: ``{nombre: {clave: valor}}``"""
+    total = {}
+    for worker in _leer_workers():
+        if worker['pid'] == os.getpid():
+            # Mismo PID que un worker anterior: solo cuenta como vivo la instantánea propia
+            vivo = worker.get('instancia') == _instancia()
+        else:
+            vivo = _vivo(worker['pid'])
+        for nombre, filas in worker['series'].items():
+            definicion = _definiciones.get(nombre)
+            if definicion is None:
+                continue
+            if definicion['tipo'] == 'gauge' and not vivo:
+                continue
+            serie = total.setdefault(nombre, {})
+            for clave, valor in filas:
+                clave = tuple(tuple(par) for par in clave)
+                if definicion['tipo'] == 'histogram':
+                    actual = serie.get(clave)
+                    if actual is None:
+                        serie[clave] = {'buckets': list(valor['buckets']), 'suma': valor['suma'],
+                                        'cuenta': valor['cuenta']}
+                    else:
+                        actual['buckets'] = [a + b for a, b in zip(actual['buckets'], valor['buckets'])]
+                        actual['suma'] += valor['suma']
+                        actual['cuenta'] += valor['cuenta']
+                elif definicion['agregacion'] == 'max':
+                    serie[clave] = max(serie.get(clave, valor), valor)
+                else:
+                    serie[clave] = serie.get(clave, 0) + valor
+    return total
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _etiquetas(clave, extra=()):
+    pares = list(clave) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def prometheus():
+    """Texto de exposición de Prometheus con las series de todos los workers"""
+    total = agregar()
+    lineas = []
+    for nombre in sorted(_definiciones):
+        definicion = _definiciones[nombre]
+        lineas.append(f'# HELP {nombre} {definicion["ayuda"]}')
+        lineas.append(f'# TYPE {nombre} {definicion["tipo"]}')
+        for clave, valor in sorted(total.get(nombre, {}).items()):
+            if definicion['tipo'] == 'histogram':
+                acumulado = 0
+                for limite, cuenta in zip(definicion['buckets'], valor['buckets']):
+                    acumulado += cuenta
+                    lineas.append(f'{nombre}_bucket{_etiquetas(clave, [("le", limite)])} {acumulado}')
+                lineas.append(f'{nombre}_bucket{_etiquetas(clave, [("le", "+Inf")])} {valor["cuenta"]}')
+                lineas.append(f'{nombre}_sum{_etiquetas(clave)} {_numero(valor["suma"])}')
+                lineas.append(f'{nombre}_count{_etiquetas(clave)} {valor["cuenta"]}')
+            else:
+                lineas.append(f'{nombre}{_etiquetas(clave)} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+# --- Métricas HTTP ------------------------------------------------------
+
+definir('pos_http_duracion_segundos', 'histogram', 'Latencia de los requests por endpoint',
+        buckets=BUCKETS_LATENCIA)
+definir('pos_http_respuestas_total', 'counter', 'Respuestas por endpoint y clase de código')
+definir('pos_http_en_curso', 'gauge', 'Requests en curso por endpoint')
+
+
+def _endpoint():
+    # Las URLs sin ruta se agrupan para no crear una serie por cada 404
+    return request.endpoint or 'sin_ruta'
+
+
+def _antes():
+    g.metricas_inicio = time.perf_counter()
+    incrementar('pos_http_en_curso', 1, endpoint=_endpoint())
+
+
+def _despues(respuesta):
+    g.metricas_codigo = respuesta.status_code
+    return respuesta
+
+
+def _final(exception):
+    inicio = g.pop('metricas_inicio', None)
+    if inicio is None:
+        return
+    endpoint = _endpoint()
+    codigo = 500 if exception is not None else g.pop('metricas_codigo', 500)
+    observar('pos_http_duracion_segundos', time.perf_counter() - inicio, endpoint=endpoint)
+    incrementar('pos_http_respuestas_total', 1, endpoint=endpoint, codigo=f'{codigo // 100}xx')
+    incrementar('pos_http_en_curso', -1, endpoint=endpoint)
+    try:
+        volcar()
+    except OSError as e:
+        current_app.logger.warning('No se pudieron volcar las métricas: %s', e)
+
+
+def init_app(app):
+    app.config.setdefault('METRICAS_DIR', None)
+    app.config.setdefault('METRICAS_VOLCADO', 1.0)
+    directorio = app.config['METRICAS_DIR']
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+        atexit.register(volcar, True)
+    _estado['dir'] = directorio
+    _estado['intervalo'] = float(app.config['METRICAS_VOLCADO'])
+    app.before_request(_antes)
+    app.after_request(_despues)
+    app.teardown_request(_final)
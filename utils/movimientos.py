@@ -0,0 +1,205 @@
+"""
+Motor por lotes de movimientos de inventario (entradas, salidas y
+traslados entre bodegas).
+
+Igual que ``utils/checkout.py`` para las ventas, cada operación trabaja
+sobre el movimiento completo con un número constante de sentencias,
+sin importar cuántas líneas tenga. Las líneas repetidas del mismo
+producto se consolidan antes de tocar la base y todas las filas se
+recorren en orden de ID para que las transacciones concurrentes tomen los
+locks en el mismo orden (primero ``Inventario_Bodega``, luego
+``Productos``, como la venta).
+"""
+from utils import stock
+from utils.reservas import bloquear_stock
+
+
+def _placeholders(n):
+    return ', '.join(['%s'] * n)
+
+
+def consolidar_lineas(items):
+    """
+    Agrupa las líneas por producto sumando cantidades y valor (cantidad x
+    costo). El costo unitario de la línea consolidada es el promedio
+    ponderado. Lanza ValueError si alguna cantidad no es positiva.
+    """
+    consolidados = {}
+    for item in items:
+        producto_id = int(item['producto_id'])
+        cantidad = float(item['cantidad'])
+        costo = float(item.get('costo') or 0)
+        if cantidad <= 0:
+            raise ValueError(f'Cantidad inválida para el producto ID {producto_id}')
+        linea = consolidados.setdefault(producto_id, {'producto_id': producto_id, 'cantidad': 0.0,
+                                                      'costo_total': 0.0})
+        linea['cantidad'] += cantidad
+        linea['costo_total'] += cantidad * costo
+    lineas = [consolidados[pid] for pid in sorted(consolidados)]
+    for linea in lineas:
+        linea['costo'] = linea['costo_total'] / linea['cantidad']
+    return lineas
+
+
+def _tabla_lineas(lineas, campos):
+    """
+    Tabla derivada ``SELECT ... UNION ALL SELECT ...`` con las líneas, para
+    cruzarla con Productos en un UPDATE multi-tabla (compatible con MySQL 5.7)
+    """
+    fila = ', '.join(f'%s AS {campo}' for campo in campos)
+    sql = ' UNION ALL '.join([f'SELECT {fila}'] * len(lineas))
+    params = []
+    for linea in lineas:
+        params.extend(linea[campo] for campo in campos)
+    return sql, params
+
+
+def sumar_bodega(cur, bodega_id, cambios):
+    """
+    Suma ``cambios`` [(producto_id, cantidad con signo)] a la bodega con un
+    upsert multi-fila; los productos sin fila en la bodega se crean.
+    """
+    cur.executemany("""
+        INSERT INTO Inventario_Bodega (ID_Bodega, ID_Producto, Existencias)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE Existencias = Existencias + VALUES(Existencias)
+    """, [(bodega_id, producto_id, cantidad) for producto_id, cantidad in sorted(cambios)])
+
+
+def sumar_productos(cur, cambios):
+    """Suma ``cambios`` [(producto_id, cantidad con signo)] a las existencias globales"""
+    cambios = sorted(cambios)
+    casos = ' '.join(['WHEN %s THEN %s'] * len(cambios))
+    params = [valor for cambio in cambios for valor in cambio]
+    ids = [producto_id for producto_id, _ in cambios]
+    cur.execute(f"""
+        UPDATE Productos
+        SET Existencias = Existencias + (CASE ID_Producto {casos} END)
+        WHERE ID_Producto IN ({_placeholders(len(ids))})
+    """, params + ids)
+
+
+def actualizar_costo_promedio(cur, lineas):
+    """
+    Recalcula el costo promedio ponderado de todos los productos de la
+    entrada en una sentencia, con las existencias previas a la entrada.
+    Debe ejecutarse antes de sumar el stock a ``Productos``.
+    """
+    derivada, params = _tabla_lineas(lineas, ('producto_id', 'cantidad', 'costo_total'))
+    cur.execute(f"""
+        UPDATE Productos p
+        INNER JOIN ({derivada}) l ON p.ID_Producto = l.producto_id
+        SET p.Costo_Promedio = CASE
+                WHEN p.Existencias <= 0 THEN l.costo_total / l.cantidad
+                ELSE ((p.Existencias * COALESCE(p.Costo_Promedio, 0)) + l.costo_total)
+                     / (p.Existencias + l.cantidad)
+            END
+    """, params)
+
+
+def registrar_detalle_movimiento(cur, movimiento_id, lineas):
+    cur.executemany("""
+        INSERT INTO Detalle_Movimiento_Inventario
+        (ID_Movimiento, ID_Producto, Cantidad, Costo, Costo_Total)
+        VALUES (%s, %s, %s, %s, %s)
+    """, [(movimiento_id, linea['producto_id'], linea['cantidad'], linea.get('costo', 0),
+           linea.get('costo_total', 0)) for linea in lineas])
+
+
+def registrar_entrada(cur, movimiento_id, bodega_id, lineas):
+    """
+    Aplica una entrada ya consolidada: costo promedio, stock (en modo
+    aplicación) y detalle, con cuatro sentencias en total.
+    """
+    cambios = [(linea['producto_id'], linea['cantidad']) for linea in lineas]
+    if stock.por_aplicacion():
+        sumar_bodega(cur, bodega_id, cambios)
+    # Con las existencias previas: en modo triggers el detalle ya suma el stock
+    actualizar_costo_promedio(cur, lineas)
+    if stock.por_aplicacion():
+        sumar_productos(cur, cambios)
+    registrar_detalle_movimiento(cur, movimiento_id, lineas)
+
+
+def _reporte_faltantes(cur, existencias, lineas):
+    """
+    Compara lo pedido con ``existencias`` (ya bloqueadas) y anota en cada
+    línea el costo promedio vigente del producto
+    """
+    ids = [linea['producto_id'] for linea in lineas]
+    cur.execute(f"""
+        SELECT ID_Producto, Descripcion, COALESCE(Costo_Promedio, 0) as Costo_Promedio
+        FROM Productos
+        WHERE ID_Producto IN ({_placeholders(len(ids))})
+    """, ids)
+    productos = {fila['ID_Producto']: fila for fila in cur.fetchall()}
+
+    faltantes = []
+    for linea in lineas:
+        producto = productos.get(linea['producto_id'])
+        disponible = existencias[linea['producto_id']]
+        if producto is not None:
+            linea['costo_promedio'] = float(producto['Costo_Promedio'])
+        if producto is None or disponible < linea['cantidad']:
+            faltantes.append({
+                'producto_id': linea['producto_id'],
+                'producto': producto['Descripcion'] if producto else f"ID {linea['producto_id']}",
+                'disponible': disponible,
+                'solicitado': linea['cantidad'],
+                'faltante': linea['cantidad'] - disponible,
+            })
+    return faltantes
+
+
+def verificar_salida(cur, bodega_id, lineas):
+    """
+    Bloquea (FOR UPDATE, en orden de ID) el stock de la bodega para todos
+    los productos con una sola lectura y devuelve el reporte de faltantes:
+    una lista de dicts con ``producto_id``, ``producto``, ``disponible``,
+    ``solicitado`` y ``faltante``. Vacía si alcanza para todo.
+    """
+    existencias = bloquear_stock(cur, bodega_id, [linea['producto_id'] for linea in lineas])
+    return _reporte_faltantes(cur, existencias, lineas)
+
+
+def registrar_salida(cur, movimiento_id, bodega_id, lineas):
+    """
+    Aplica una salida ya consolidada y verificada: detalle y descuento de
+    stock (en modo aplicación), con tres sentencias en total.
+    """
+    registrar_detalle_movimiento(cur, movimiento_id, lineas)
+    if stock.por_aplicacion():
+        cambios = [(linea['producto_id'], -linea['cantidad']) for linea in lineas]
+        sumar_bodega(cur, bodega_id, cambios)
+        sumar_productos(cur, cambios)
+
+
+def verificar_traslado(cur, origen_id, destino_id, lineas):
+    """
+    Bloquea las filas de ambas bodegas siguiendo la llave primaria
+    (bodega de menor ID primero, productos en orden) y devuelve el reporte
+    de faltantes en la bodega de origen.
+    """
+    ids = [linea['producto_id'] for linea in lineas]
+    existencias = {}
+    for bodega_id in sorted({int(origen_id), int(destino_id)}):
+        existencias[bodega_id] = bloquear_stock(cur, bodega_id, ids)
+    return _reporte_faltantes(cur, existencias[int(origen_id)], lineas)
+
+
+def registrar_traslado(cur, salida_id, entrada_id, origen_id, destino_id, lineas):
+    """
+    Aplica un traslado ya verificado: detalle de la salida y de la entrada
+    (valorados al costo promedio) y, en modo aplicación, un upsert por
+    bodega. Las existencias globales no cambian.
+    """
+    for linea in lineas:
+        linea['costo'] = linea.get('costo_promedio', 0)
+        linea['costo_total'] = linea['costo'] * linea['cantidad']
+    registrar_detalle_movimiento(cur, salida_id, lineas)
+    registrar_detalle_movimiento(cur, entrada_id, lineas)
+    if stock.por_aplicacion():
+        cambios = [(linea['producto_id'], linea['cantidad']) for linea in lineas]
+        # Mismo orden de bodegas que los locks tomados al verificar
+        for bodega_id, signo in sorted([(int(origen_id), -1), (int(destino_id), 1)]):
+            sumar_bodega(cur, bodega_id, [(pid, signo * cantidad) for pid, cantidad in cambios])
@@ -0,0 +1,54 @@
+"""
+Helpers para paginación por keyset (cursor).
+
+El cursor es la clave de ordenamiento de la última fila entregada,
+serializada como JSON en base64 url-safe para poder viajar en la query
+string sin exponer detalles de la consulta.
+"""
+import base64
+import json
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+
+def _a_json(valor):
+    if isinstance(valor, (date, time)):
+        return valor.isoformat()
+    if isinstance(valor, timedelta):
+        # MySQLdb devuelve las columnas TIME como timedelta
+        return int(valor.total_seconds())
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def codificar_cursor(valores):
+    """Convierte la clave de la última fila en un token opaco"""
+    datos = json.dumps([_a_json(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(token, campos):
+    """
+    Recupera la clave a partir del token. Devuelve None si el token está
+    vacío y lanza ValueError si es inválido o no tiene ``campos`` valores.
+    """
+    if not token:
+        return None
+    try:
+        relleno = '=' * (-len(token) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(token + relleno).decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if not isinstance(valores, list) or len(valores) != campos:
+        raise ValueError('Cursor inválido')
+    return valores
+
+
+def limite_pagina(valor, por_defecto=50, maximo=200):
+    """Normaliza el parámetro de tamaño de página"""
+    try:
+        limite = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return max(1, min(limite, maximo))
@@ -0,0 +1,232 @@
+"""
+Perfilado de SQL por request.
+
+``ConexionInstrumentada`` reemplaza a la conexión de MySQLdb en el pool y
+envuelve cualquier cursor que se pida con ``mysql.connection.cursor()``
+(incluidos los ``SSDictCursor`` explícitos). Cada ``execute`` /
+``executemany`` se mide y se anota en el perfil del request actual
+(``g.perfil_sql``): cantidad de consultas, tiempo total en base, las
+sentencias más lentas y las repetidas (patrón N+1).
+
+Al terminar el request el perfil se acumula por endpoint en el registro de
+``utils/metricas.py`` (``/metrics``, agregado entre workers) y en un
+resumen del proceso con el texto de las sentencias más lentas
+(``/api/sistema/metricas``).
+"""
+import re
+import threading
+import time
+
+import MySQLdb.connections
+from flask import current_app, g, has_app_context, request
+
+from utils import metricas
+
+# Sentencias distintas que se conservan en el acumulado del proceso
+MAX_SENTENCIAS = 500
+# Sentencias más lentas que se guardan por request
+MAX_LENTAS_REQUEST = 5
+
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_LISTA_IN = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+_RE_VALORES = re.compile(r'(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+', re.IGNORECASE)
+
+
+def normalizar_sql(sql):
+    """
+    Plantilla de la sentencia para agrupar ejecuciones equivalentes: espacios
+    colapsados y listas ``IN (%s, %s, ...)`` / multi-``VALUES`` reducidas.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _RE_ESPACIOS.sub(' ', sql).strip()
+    sql = _RE_LISTA_IN.sub('(%s, ...)', sql)
+    return _RE_VALORES.sub(r'\1, ...', sql)
+
+
+class PerfilRequest:
+    """Consultas ejecutadas durante un request"""
+
+    __slots__ = ('consultas', 'tiempo_ms', 'lentas', 'repeticiones')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_ms = 0.0
+        self.lentas = []
+        self.repeticiones = {}
+
+    def registrar(self, sql, duracion_ms):
+        self.consultas += 1
+        self.tiempo_ms += duracion_ms
+        self.repeticiones[sql] = self.repeticiones.get(sql, 0) + 1
+        if len(self.lentas) < MAX_LENTAS_REQUEST or duracion_ms > self.lentas[-1][1]:
+            self.lentas.append((sql, duracion_ms))
+            self.lentas.sort(key=lambda x: x[1], reverse=True)
+            del self.lentas[MAX_LENTAS_REQUEST:]
+
+    def n_mas_uno(self, umbral):
+        """Sentencias ejecutadas ``umbral`` veces o más en el mismo request"""
+        return {sql: n for sql, n in self.repeticiones.items() if n >= umbral}
+
+
+def _registrar(sql, inicio):
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    if not has_app_context():
+        return
+    perfil = g.get('perfil_sql')
+    if perfil is None:
+        return
+    perfil.registrar(normalizar_sql(sql), duracion_ms)
+
+
+class _CursorInstrumentado:
+    """Mixin que mide ``execute`` y ``executemany``"""
+
+    _en_lote = False
+
+    def execute(self, query, args=None):
+        if self._en_lote:
+            # executemany que no es INSERT llama a execute por fila: cuenta como uno
+            return super().execute(query, args)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            _registrar(query, inicio)
+
+    def executemany(self, query, args):
+        inicio = time.perf_counter()
+        self._en_lote = True
+        try:
+            return super().executemany(query, args)
+        finally:
+            self._en_lote = False
+            _registrar(query, inicio)
+
+
+_clases = {}
+_clases_lock = threading.Lock()
+
+
+def instrumentar(cursorclass):
+    """Subclase instrumentada (cacheada) de una clase de cursor de MySQLdb"""
+    clase = _clases.get(cursorclass)
+    if clase is None:
+        with _clases_lock:
+            clase = _clases.get(cursorclass)
+            if clase is None:
+                clase = type(cursorclass.__name__, (_CursorInstrumentado, cursorclass), {})
+                _clases[cursorclass] = clase
+    return clase
+
+
+class ConexionInstrumentada(MySQLdb.connections.Connection):
+    """Conexión cuyos cursores registran cada consulta en el perfil del request"""
+
+    def cursor(self, cursorclass=None):
+        return super().cursor(instrumentar(cursorclass or self.cursorclass))
+
+
+# --- Acumulado del proceso ---------------------------------------------
+
+metricas.definir('pos_sql_consultas_total', 'counter', 'Consultas SQL ejecutadas por endpoint')
+metricas.definir('pos_sql_tiempo_segundos_total', 'counter', 'Tiempo en base de datos por endpoint')
+metricas.definir('pos_sql_consultas_por_request', 'histogram', 'Consultas SQL por request',
+                 buckets=(1, 2, 5, 10, 20, 50, 100, 250))
+metricas.definir('pos_sql_n_mas_uno_total', 'counter', 'Requests con sentencias repetidas (patrón N+1)')
+metricas.definir('pos_sql_lenta_max_segundos', 'gauge',
+                 'Duración máxima de las sentencias que superaron SQL_LENTA_MS', agregacion='max')
+
+_lock = threading.Lock()
+_endpoints = {}
+_sentencias = {}
+
+
+def _acumular(endpoint, perfil, umbral, lenta_ms):
+    repetidas = perfil.n_mas_uno(umbral)
+    metricas.incrementar('pos_sql_consultas_total', perfil.consultas, endpoint=endpoint)
+    metricas.incrementar('pos_sql_tiempo_segundos_total', perfil.tiempo_ms / 1000, endpoint=endpoint)
+    metricas.observar('pos_sql_consultas_por_request', perfil.consultas, endpoint=endpoint)
+    if repetidas:
+        metricas.incrementar('pos_sql_n_mas_uno_total', 1, endpoint=endpoint)
+    for sql, duracion_ms in perfil.lentas:
+        # Solo las lentas llevan el texto como etiqueta, así la cardinalidad queda acotada
+        if duracion_ms >= lenta_ms:
+            metricas.fijar_max('pos_sql_lenta_max_segundos', duracion_ms / 1000,
+                               endpoint=endpoint, sql=sql[:120])
+
+    with _lock:
+        datos = _endpoints.get(endpoint)
+        if datos is None:
+            datos = _endpoints[endpoint] = {
+                'requests': 0, 'consultas': 0, 'tiempo_ms': 0.0,
+                'consultas_max': 0, 'n_mas_uno': 0,
+            }
+        datos['requests'] += 1
+        datos['consultas'] += perfil.consultas
+        datos['tiempo_ms'] += perfil.tiempo_ms
+        datos['consultas_max'] = max(datos['consultas_max'], perfil.consultas)
+        if repetidas:
+            datos['n_mas_uno'] += 1
+
+        for sql, duracion_ms in perfil.lentas:
+            sentencia = _sentencias.get(sql)
+            if sentencia is None:
+                if len(_sentencias) >= MAX_SENTENCIAS:
+                    continue
+                sentencia = _sentencias[sql] = {'endpoint': endpoint, 'veces': 0, 'max_ms': 0.0}
+            sentencia['veces'] += 1
+            sentencia['max_ms'] = max(sentencia['max_ms'], duracion_ms)
+    return repetidas
+
+
+def metricas(limite=10):
+    """Acumulado por endpoint y las sentencias más lentas vistas por el proceso"""
+    with _lock:
+        endpoints = {nombre: dict(datos) for nombre, datos in _endpoints.items()}
+        lentas = sorted(({'sql': sql, **datos} for sql, datos in _sentencias.items()),
+                        key=lambda x: x['max_ms'], reverse=True)[:limite]
+    return {'endpoints': endpoints, 'sentencias_lentas': lentas}
+
+
+# --- Integración con Flask ---------------------------------------------
+
+def _antes():
+    g.perfil_sql = PerfilRequest()
+
+
+def _despues(respuesta):
+    perfil = g.pop('perfil_sql', None)
+    if perfil is None:
+        return respuesta
+    config = current_app.config
+    endpoint = request.endpoint or 'desconocido'
+    repetidas = _acumular(endpoint, perfil, config['SQL_N_MAS_UNO'], config['SQL_LENTA_MS'])
+
+    if perfil.lentas and perfil.lentas[0][1] >= config['SQL_LENTA_MS']:
+        sql, duracion_ms = perfil.lentas[0]
+        current_app.logger.warning('SQL lenta en %s (%.1f ms): %s', endpoint, duracion_ms, sql[:300])
+    if repetidas:
+        current_app.logger.warning('Posible N+1 en %s: %s', endpoint,
+                                   '; '.join(f'{n}x {sql[:120]}' for sql, n in repetidas.items()))
+
+    if config['SQL_PERFIL_HEADER']:
+        respuesta.headers['X-SQL-Consultas'] = str(perfil.consultas)
+        respuesta.headers['X-SQL-Tiempo-Ms'] = f'{perfil.tiempo_ms:.1f}'
+        if repetidas:
+            respuesta.headers['X-SQL-N-Mas-Uno'] = str(sum(repetidas.values()))
+        # Visible en la pestaña Timing de las herramientas del navegador
+        respuesta.headers.add('Server-Timing',
+                              f'db;dur={perfil.tiempo_ms:.1f};desc="{perfil.consultas} consultas"')
+    return respuesta
+
+
+def init_app(app):
+    app.config.setdefault('SQL_PERFIL', True)
+    app.config.setdefault('SQL_PERFIL_HEADER', app.debug)
+    app.config.setdefault('SQL_LENTA_MS', 200)
+    app.config.setdefault('SQL_N_MAS_UNO', 5)
+    if not app.config['SQL_PERFIL']:
+        return
+    app.before_request(_antes)
+    app.after_request(_despues)
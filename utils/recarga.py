@@ -0,0 +1,93 @@
+"""
+Recarga periódica de índices en memoria sin bloquear los requests.
+
+Solo la primera carga de un worker espera a la base. Después, cuando el
+índice vence, un hilo aparte lo reconstruye en un objeto nuevo y lo
+reemplaza al terminar, mientras los requests siguen usando el anterior.
+Los cambios puntuales que llegan durante la reconstrucción se anotan con
+``anotar`` y se vuelven a aplicar sobre el índice nuevo.
+"""
+import logging
+import threading
+import time
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class RecargaPeriodica:
+    """
+    Controla cuándo se reconstruye un índice. ``recargar()`` lee la base y
+    reemplaza el contenido del índice; corre dentro de un contexto de la app.
+    """
+
+    def __init__(self, nombre, recargar):
+        self.nombre = nombre
+        self._recargar = recargar
+        self.cargado_en = None
+        self._lock = threading.Lock()
+        self._lock_cambios = threading.Lock()
+        self._cambios = None  # lista mientras hay una reconstrucción en curso
+
+    @property
+    def cargado(self):
+        return self.cargado_en is not None
+
+    def asegurar(self, refresco):
+        """Carga el índice si nunca se cargó; si venció, lanza la reconstrucción en segundo plano"""
+        if self.cargado_en is None:
+            with self._lock:
+                if self.cargado_en is None:
+                    self._recargar()
+                    self.cargado_en = time.monotonic()
+            return
+
+        if time.monotonic() - self.cargado_en <= refresco or not self._lock.acquire(blocking=False):
+            return
+        if time.monotonic() - self.cargado_en <= refresco:
+            self._lock.release()
+            return
+        with self._lock_cambios:
+            self._cambios = []
+        hilo = threading.Thread(target=self._en_segundo_plano, args=(current_app._get_current_object(),),
+                                name=f'recarga-{self.nombre}', daemon=True)
+        try:
+            hilo.start()
+        except Exception:
+            self._terminar()
+            raise
+
+    def _en_segundo_plano(self, app):
+        try:
+            with app.app_context():
+                try:
+                    self._recargar()
+                except Exception:
+                    # Se sigue con el índice anterior y se reintenta al vencer otra vez
+                    logger.exception('No se pudo reconstruir el índice %s', self.nombre)
+                for cambio in self._terminar():
+                    cambio()
+        except Exception:
+            logger.exception('No se pudieron reaplicar los cambios del índice %s', self.nombre)
+
+    def _terminar(self):
+        with self._lock_cambios:
+            cambios, self._cambios = self._cambios or [], None
+        self.cargado_en = time.monotonic()
+        self._lock.release()
+        return cambios
+
+    def anotar(self, cambio):
+        """
+        Guarda ``cambio()`` (idempotente) para reaplicarlo si hay una
+        reconstrucción en curso que podría no incluirlo
+        """
+        with self._lock_cambios:
+            if self._cambios is not None:
+                self._cambios.append(cambio)
+
+    def vencer(self):
+        """Hace que el próximo uso reconstruya el índice (en segundo plano si ya estaba cargado)"""
+        if self.cargado_en is not None:
+            self.cargado_en = float('-inf')
@@ -0,0 +1,128 @@
+"""
+Reserva de stock segura ante concurrencia.
+
+Las filas de ``Inventario_Bodega`` afectadas se bloquean con
+``SELECT ... FOR UPDATE`` recorriendo la llave primaria (ID_Bodega,
+ID_Producto) en orden ascendente, así todas las transacciones toman los
+locks en el mismo orden y no se cruzan. Si aun así InnoDB reporta un
+deadlock o vence la espera de un lock, la transacción completa se
+reintenta con backoff exponencial acotado.
+"""
+import random
+import threading
+import time
+
+import MySQLdb
+from flask import current_app
+
+# Errores de InnoDB que justifican reintentar la transacción completa
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+# Llave única repetida (p. ej. dos reintentos simultáneos de la misma venta)
+ER_DUP_ENTRY = 1062
+
+
+class StockInsuficiente(Exception):
+    """
+    La reserva no se puede cumplir; ``faltantes`` describe cada producto
+    como texto y ``detalle`` (opcional) trae el reporte estructurado
+    """
+
+    def __init__(self, faltantes, detalle=None):
+        self.faltantes = faltantes
+        self.detalle = detalle or []
+        super().__init__("Stock insuficiente: " + ", ".join(faltantes))
+
+
+_lock = threading.Lock()
+_stats = {
+    'transacciones': 0,
+    'reintentos': 0,
+    'deadlocks': 0,
+    'lock_timeouts': 0,
+    'agotadas': 0,
+    'faltantes': 0,
+    'espera_lock_total_ms': 0.0,
+    'espera_lock_max_ms': 0.0,
+}
+
+
+def _contar(clave, cantidad=1):
+    with _lock:
+        _stats[clave] += cantidad
+
+
+def metricas():
+    with _lock:
+        return dict(_stats)
+
+
+def bloquear_stock(cur, bodega_id, producto_ids):
+    """
+    Bloquea las existencias de los productos en la bodega y las devuelve
+    como ``{ID_Producto: existencias}``. Los productos sin fila en la
+    bodega quedan con 0 (el lock de hueco impide que otra transacción la
+    cree mientras tanto).
+    """
+    ids = sorted(set(int(pid) for pid in producto_ids))
+    inicio = time.perf_counter()
+    cur.execute(f"""
+        SELECT ID_Producto, Existencias
+        FROM Inventario_Bodega
+        WHERE ID_Bodega = %s AND ID_Producto IN ({', '.join(['%s'] * len(ids))})
+        ORDER BY ID_Producto
+        FOR UPDATE
+    """, [bodega_id] + ids)
+    existencias = {fila['ID_Producto']: float(fila['Existencias']) for fila in cur.fetchall()}
+    espera_ms = (time.perf_counter() - inicio) * 1000
+    with _lock:
+        _stats['espera_lock_total_ms'] += espera_ms
+        _stats['espera_lock_max_ms'] = max(_stats['espera_lock_max_ms'], espera_ms)
+    return {pid: existencias.get(pid, 0.0) for pid in ids}
+
+
+def ejecutar_transaccion(conn, funcion):
+    """
+    Ejecuta ``funcion(cur)`` dentro de una transacción y hace commit.
+    Reintenta ante deadlock o lock wait timeout hasta ``STOCK_REINTENTOS``
+    veces; cualquier otro error (incluido ``StockInsuficiente``) revierte y
+    se propaga. Devuelve lo que devuelva ``funcion``.
+    """
+    config = current_app.config
+    reintentos = config.get('STOCK_REINTENTOS', 3)
+    base = config.get('STOCK_BACKOFF_BASE', 0.05)
+    maximo = config.get('STOCK_BACKOFF_MAX', 0.5)
+    lock_timeout = config.get('STOCK_LOCK_TIMEOUT')
+
+    intento = 0
+    while True:
+        cur = conn.cursor()
+        try:
+            if lock_timeout:
+                cur.execute("SET SESSION innodb_lock_wait_timeout = %s", (int(lock_timeout),))
+            resultado = funcion(cur)
+            conn.commit()
+            _contar('transacciones')
+            return resultado
+        except MySQLdb.OperationalError as e:
+            conn.rollback()
+            codigo = e.args[0] if e.args else None
+            if codigo not in (ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT):
+                raise
+            _contar('deadlocks' if codigo == ER_LOCK_DEADLOCK else 'lock_timeouts')
+            if intento >= reintentos:
+                _contar('agotadas')
+                raise
+            intento += 1
+            _contar('reintentos')
+            # Backoff exponencial con jitter para que los reintentos no choquen de nuevo
+            time.sleep(random.uniform(0, min(maximo, base * (2 ** intento))))
+        except StockInsuficiente:
+            conn.rollback()
+            _contar('faltantes')
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
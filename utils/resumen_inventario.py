@@ -0,0 +1,223 @@
+"""
+Resumen diario de movimientos de inventario (por día y producto, y por día
+y tipo de movimiento) y los reportes que se leen de él.
+
+Se mantiene de forma incremental dentro de la transacción de cada venta,
+entrada y salida, de modo que ``/inventario/reportes`` lee filas
+pre-agregadas en lugar de recorrer los detalles de movimiento. Igual que
+``resumen_ventas.registrar_venta``, ``registrar_movimiento`` se llama al
+final de la transacción para que las filas del día, que comparten todos los
+movimientos, queden bloqueadas solo hasta el commit.
+
+El valor de las entradas es el costo registrado en el movimiento; el de las
+salidas se valora al costo promedio del producto en el momento de la salida.
+"""
+
+# Participación acumulada en el valor de salidas que delimita las clases A y B
+LIMITE_CLASE_A = 0.80
+LIMITE_CLASE_B = 0.95
+
+
+def _placeholders(n):
+    return ', '.join(['%s'] * n)
+
+
+def registrar_movimiento(cur, tipo_movimiento, items, fecha=None):
+    """
+    Suma un movimiento recién insertado a los resúmenes de ``fecha`` (por
+    defecto el día actual). ``tipo_movimiento`` es la fila de
+    Catalogo_Movimientos e ``items`` la lista de líneas con ``producto_id``,
+    ``cantidad`` y opcionalmente ``costo_total``; sin ``items`` solo se
+    cuenta el movimiento (traslados, que no mueven stock global).
+    """
+    cur.execute("""
+        INSERT INTO Resumen_Inventario_Tipo (Fecha, ID_TipoMovimiento, Num_Movimientos)
+        VALUES (COALESCE(%s, CURDATE()), %s, 1)
+        ON DUPLICATE KEY UPDATE Num_Movimientos = Num_Movimientos + 1
+    """, (fecha, tipo_movimiento['ID_TipoMovimiento']))
+
+    if not items:
+        return
+
+    if tipo_movimiento['Adicion'] == 'ENTRADA':
+        filas = [(fecha, item['producto_id'], item['cantidad'], 0, item.get('costo_total') or 0, 0)
+                 for item in items]
+    elif tipo_movimiento['Adicion'] == 'SALIDA':
+        # Las salidas se valoran al costo promedio vigente (una sola consulta por lote)
+        ids = sorted(set(int(item['producto_id']) for item in items))
+        cur.execute(f"""
+            SELECT ID_Producto, COALESCE(Costo_Promedio, 0) as Costo_Promedio
+            FROM Productos
+            WHERE ID_Producto IN ({_placeholders(len(ids))})
+        """, ids)
+        costos = {fila['ID_Producto']: float(fila['Costo_Promedio']) for fila in cur.fetchall()}
+        filas = [(fecha, item['producto_id'], 0, item['cantidad'], 0,
+                  float(item['cantidad']) * costos.get(int(item['producto_id']), 0.0))
+                 for item in items]
+    else:
+        return
+
+    cur.executemany("""
+        INSERT INTO Resumen_Inventario_Producto
+        (Fecha, ID_Producto, Entradas, Salidas, Valor_Entradas, Valor_Salidas, Num_Movimientos)
+        VALUES (COALESCE(%s, CURDATE()), %s, %s, %s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE
+            Entradas = Entradas + VALUES(Entradas),
+            Salidas = Salidas + VALUES(Salidas),
+            Valor_Entradas = Valor_Entradas + VALUES(Valor_Entradas),
+            Valor_Salidas = Valor_Salidas + VALUES(Valor_Salidas),
+            Num_Movimientos = Num_Movimientos + 1
+    """, filas)
+
+
+def reconstruir(conn):
+    """
+    Recalcula los resúmenes a partir del historial de movimientos. Las
+    salidas históricas se valoran al costo promedio actual.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM Resumen_Inventario_Producto")
+        cur.execute("DELETE FROM Resumen_Inventario_Tipo")
+
+        cur.execute("""
+            INSERT INTO Resumen_Inventario_Tipo (Fecha, ID_TipoMovimiento, Num_Movimientos)
+            SELECT Fecha, ID_TipoMovimiento, COUNT(*)
+            FROM Movimientos_Inventario
+            GROUP BY Fecha, ID_TipoMovimiento
+        """)
+
+        cur.execute("""
+            INSERT INTO Resumen_Inventario_Producto
+            (Fecha, ID_Producto, Entradas, Salidas, Valor_Entradas, Valor_Salidas, Num_Movimientos)
+            SELECT mi.Fecha, dmi.ID_Producto,
+                   SUM(CASE WHEN cm.Adicion = 'ENTRADA' THEN dmi.Cantidad ELSE 0 END),
+                   SUM(CASE WHEN cm.Adicion = 'SALIDA' THEN dmi.Cantidad ELSE 0 END),
+                   SUM(CASE WHEN cm.Adicion = 'ENTRADA' THEN COALESCE(dmi.Costo_Total, 0) ELSE 0 END),
+                   SUM(CASE WHEN cm.Adicion = 'SALIDA' THEN dmi.Cantidad * COALESCE(p.Costo_Promedio, 0) ELSE 0 END),
+                   COUNT(DISTINCT dmi.ID_Movimiento)
+            FROM Detalle_Movimiento_Inventario dmi
+            INNER JOIN Movimientos_Inventario mi ON dmi.ID_Movimiento = mi.ID_Movimiento
+            INNER JOIN Catalogo_Movimientos cm ON mi.ID_TipoMovimiento = cm.ID_TipoMovimiento
+            INNER JOIN Productos p ON dmi.ID_Producto = p.ID_Producto
+            -- Los traslados entre bodegas no mueven stock global (ver registrar_movimiento)
+            WHERE UPPER(cm.Descripcion) NOT LIKE '%TRASLADO%'
+            GROUP BY mi.Fecha, dmi.ID_Producto
+        """)
+        filas = cur.rowcount
+
+        conn.commit()
+        return filas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# --- Reportes -----------------------------------------------------------
+
+def productos_con_movimiento(cur, dias=30, limite=10):
+    """Productos con más unidades movidas en los últimos ``dias``"""
+    cur.execute("""
+        SELECT p.Descripcion, r.Entradas, r.Salidas, p.Existencias
+        FROM (
+            SELECT ID_Producto, SUM(Entradas) as Entradas, SUM(Salidas) as Salidas
+            FROM Resumen_Inventario_Producto
+            WHERE Fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            GROUP BY ID_Producto
+        ) r
+        INNER JOIN Productos p ON r.ID_Producto = p.ID_Producto
+        ORDER BY (r.Entradas + r.Salidas) DESC
+        LIMIT %s
+    """, (dias, limite))
+    return cur.fetchall()
+
+
+def movimientos_por_tipo(cur, dias=30):
+    cur.execute("""
+        SELECT cm.Descripcion, SUM(r.Num_Movimientos) as Total, cm.Letra, cm.Adicion
+        FROM Resumen_Inventario_Tipo r
+        INNER JOIN Catalogo_Movimientos cm ON r.ID_TipoMovimiento = cm.ID_TipoMovimiento
+        WHERE r.Fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        GROUP BY cm.ID_TipoMovimiento, cm.Descripcion, cm.Letra, cm.Adicion
+        ORDER BY Total DESC
+    """, (dias,))
+    return cur.fetchall()
+
+
+def productos_sin_movimiento(cur, dias=90, limite=10):
+    """Productos activos sin ninguna fila de resumen en los últimos ``dias``"""
+    cur.execute("""
+        SELECT p.Descripcion, p.Existencias, p.Fecha_Creacion
+        FROM Productos p
+        WHERE p.Estado = 1
+        AND NOT EXISTS (
+            SELECT 1 FROM Resumen_Inventario_Producto r
+            WHERE r.ID_Producto = p.ID_Producto
+            AND r.Fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        )
+        ORDER BY p.Fecha_Creacion DESC
+        LIMIT %s
+    """, (dias, limite))
+    return cur.fetchall()
+
+
+def analisis_abc(cur, dias=90):
+    """
+    Clasifica los productos por su participación acumulada en el valor de
+    salidas del período: A hasta 80%, B hasta 95%, C el resto. Devuelve la
+    lista ordenada por valor con ``Clase`` y ``Participacion_Acumulada``.
+    """
+    cur.execute("""
+        SELECT p.ID_Producto, p.Descripcion, r.Salidas, r.Valor_Salidas
+        FROM (
+            SELECT ID_Producto, SUM(Salidas) as Salidas, SUM(Valor_Salidas) as Valor_Salidas
+            FROM Resumen_Inventario_Producto
+            WHERE Fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            GROUP BY ID_Producto
+            HAVING SUM(Valor_Salidas) > 0
+        ) r
+        INNER JOIN Productos p ON r.ID_Producto = p.ID_Producto
+        ORDER BY r.Valor_Salidas DESC
+    """, (dias,))
+    filas = list(cur.fetchall())
+
+    total = sum(float(fila['Valor_Salidas']) for fila in filas)
+    acumulado = 0.0
+    for fila in filas:
+        acumulado += float(fila['Valor_Salidas'])
+        participacion = acumulado / total
+        fila['Participacion_Acumulada'] = participacion
+        if participacion <= LIMITE_CLASE_A or fila is filas[0]:
+            fila['Clase'] = 'A'
+        elif participacion <= LIMITE_CLASE_B:
+            fila['Clase'] = 'B'
+        else:
+            fila['Clase'] = 'C'
+    return filas
+
+
+def rotacion(cur, dias=30, limite=10):
+    """
+    Rotación por producto en el período: costo de lo que salió dividido por
+    el valor actual del inventario, y días de cobertura al ritmo de salida.
+    """
+    cur.execute("""
+        SELECT p.Descripcion, p.Existencias, r.Salidas, r.Valor_Salidas,
+               p.Existencias * COALESCE(p.Costo_Promedio, 0) as Valor_Inventario,
+               r.Valor_Salidas / NULLIF(p.Existencias * COALESCE(p.Costo_Promedio, 0), 0) as Rotacion,
+               p.Existencias / NULLIF(r.Salidas / %s, 0) as Dias_Cobertura
+        FROM (
+            SELECT ID_Producto, SUM(Salidas) as Salidas, SUM(Valor_Salidas) as Valor_Salidas
+            FROM Resumen_Inventario_Producto
+            WHERE Fecha >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+            GROUP BY ID_Producto
+            HAVING SUM(Salidas) > 0
+        ) r
+        INNER JOIN Productos p ON r.ID_Producto = p.ID_Producto
+        WHERE p.Estado = 1
+        ORDER BY Rotacion DESC
+        LIMIT %s
+    """, (dias, dias, limite))
+    return cur.fetchall()
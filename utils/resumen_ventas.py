@@ -0,0 +1,81 @@
+"""
+Resumen diario de ventas (por día, por producto y por método de pago).
+
+Se mantiene de forma incremental dentro de la transacción de cada venta, de
+modo que el dashboard lee O(días) filas en lugar de recorrer las facturas.
+
+Todas las ventas del día actualizan la misma fila de ``Resumen_Ventas_Diario``
+(y de su método de pago), que queda bloqueada hasta el commit: por eso
+``registrar_venta`` debe ser lo último que se ejecuta en la transacción,
+después de verificar y descontar el stock. Así las ventas concurrentes solo
+se esperan durante el commit y no durante todo el checkout
+(``scripts/benchmark_checkout.py --concurrencia`` mide la diferencia).
+"""
+
+
+def registrar_venta(cur, metodo_pago_id, total, items, fecha=None):
+    """
+    Suma una venta recién insertada a los resúmenes de ``fecha`` (por
+    defecto el día actual; las ventas sincronizadas desde el diario local
+    conservan el día en que se hicieron)
+    """
+    cur.execute("""
+        INSERT INTO Resumen_Ventas_Diario (Fecha, Total, Num_Facturas)
+        VALUES (COALESCE(%s, CURDATE()), %s, 1)
+        ON DUPLICATE KEY UPDATE Total = Total + VALUES(Total), Num_Facturas = Num_Facturas + 1
+    """, (fecha, total))
+
+    cur.execute("""
+        INSERT INTO Resumen_Ventas_MetodoPago (Fecha, ID_MetodoPago, Total, Num_Facturas)
+        VALUES (COALESCE(%s, CURDATE()), %s, %s, 1)
+        ON DUPLICATE KEY UPDATE Total = Total + VALUES(Total), Num_Facturas = Num_Facturas + 1
+    """, (fecha, metodo_pago_id, total))
+
+    cur.executemany("""
+        INSERT INTO Resumen_Ventas_Producto (Fecha, ID_Producto, Cantidad, Monto)
+        VALUES (COALESCE(%s, CURDATE()), %s, %s, %s)
+        ON DUPLICATE KEY UPDATE Cantidad = Cantidad + VALUES(Cantidad), Monto = Monto + VALUES(Monto)
+    """, [(fecha, item['producto_id'], item['cantidad'], item['subtotal']) for item in items])
+
+
+def reconstruir(conn):
+    """Recalcula todos los resúmenes a partir del historial de facturas activas"""
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM Resumen_Ventas_Producto")
+        cur.execute("DELETE FROM Resumen_Ventas_MetodoPago")
+        cur.execute("DELETE FROM Resumen_Ventas_Diario")
+
+        cur.execute("""
+            INSERT INTO Resumen_Ventas_Diario (Fecha, Total, Num_Facturas)
+            SELECT Fecha, SUM(Total), COUNT(*)
+            FROM Facturacion
+            WHERE Estado = 1
+            GROUP BY Fecha
+        """)
+        dias = cur.rowcount
+
+        cur.execute("""
+            INSERT INTO Resumen_Ventas_MetodoPago (Fecha, ID_MetodoPago, Total, Num_Facturas)
+            SELECT Fecha, ID_MetodoPago, SUM(Total), COUNT(*)
+            FROM Facturacion
+            WHERE Estado = 1 AND ID_MetodoPago IS NOT NULL
+            GROUP BY Fecha, ID_MetodoPago
+        """)
+
+        cur.execute("""
+            INSERT INTO Resumen_Ventas_Producto (Fecha, ID_Producto, Cantidad, Monto)
+            SELECT f.Fecha, df.ID_Producto, SUM(df.Cantidad), SUM(df.Subtotal)
+            FROM Detalle_Facturacion df
+            INNER JOIN Facturacion f ON df.ID_Factura = f.ID_Factura
+            WHERE f.Estado = 1
+            GROUP BY f.Fecha, df.ID_Producto
+        """)
+
+        conn.commit()
+        return dias
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,92 @@
+"""
+Serialización JSON compacta para las APIs de productos.
+
+Cada API declara con una ``Proyeccion`` los campos que entrega y cómo se
+convierte cada uno; la conversión se arma una sola vez (extractor de
+columnas y conversores solo donde hacen falta) en lugar de pasar cada
+valor por el ``default`` genérico del encoder. Los ``Decimal`` de precios y
+existencias salen como números, igual que en ``/api/producto/codigo``.
+
+Si está instalado ``orjson`` se usa para codificar; si no, el ``json`` de la
+biblioteca estándar sin espacios. Los listados grandes pueden pedirse en
+formato columnar (``{'campos': [...], 'filas': [[...], ...]}``), que no
+repite los nombres de los campos en cada fila.
+"""
+import json
+from operator import itemgetter
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FORMATO_OBJETOS = 'objetos'
+FORMATO_COLUMNAS = 'columnas'
+
+
+def numero(valor):
+    """Decimal (o None) de MySQL como número JSON"""
+    return None if valor is None else float(valor)
+
+
+class Proyeccion:
+    """
+    Campos de una respuesta en orden, con su conversor (``None``: el valor
+    tal cual sale de MySQLdb, que ya es serializable)
+    """
+
+    def __init__(self, **campos):
+        self.campos = tuple(campos)
+        self._conversores = tuple(campos.values())
+        extraer = itemgetter(*self.campos)
+        # itemgetter con un solo campo devuelve el valor, no una tupla
+        self._extraer = extraer if len(self.campos) > 1 else (lambda fila: (extraer(fila),))
+        self._convertir = [(i, conversor) for i, conversor in enumerate(self._conversores) if conversor]
+
+    def con(self, **campos):
+        """Nueva proyección con estos campos agregados al final"""
+        return Proyeccion(**dict(zip(self.campos, self._conversores)), **campos)
+
+    def valores(self, fila):
+        """Valores de la fila en el orden de ``campos``, ya convertidos"""
+        valores = list(self._extraer(fila))
+        for i, conversor in self._convertir:
+            valores[i] = conversor(valores[i])
+        return valores
+
+    def objeto(self, fila):
+        return dict(zip(self.campos, self.valores(fila)))
+
+    def objetos(self, filas):
+        return [self.objeto(fila) for fila in filas]
+
+    def columnas(self, filas):
+        return {'campos': list(self.campos), 'filas': [self.valores(fila) for fila in filas]}
+
+    def lista(self, filas, formato=FORMATO_OBJETOS):
+        """Filas como lista de objetos o, con ``formato='columnas'``, en formato columnar"""
+        if formato == FORMATO_COLUMNAS:
+            return self.columnas(filas)
+        return self.objetos(filas)
+
+
+def formato(valor):
+    """Formato pedido en la query string; por defecto objetos"""
+    if valor in (None, '', FORMATO_OBJETOS):
+        return FORMATO_OBJETOS
+    if valor == FORMATO_COLUMNAS:
+        return FORMATO_COLUMNAS
+    raise ValueError(f"Formato no válido: {valor} (usar '{FORMATO_OBJETOS}' o '{FORMATO_COLUMNAS}')")
+
+
+def dumps(datos):
+    if orjson is not None:
+        return orjson.dumps(datos)
+    return json.dumps(datos, ensure_ascii=False, separators=(',', ':'))
+
+
+def respuesta(datos, status=200):
+    """Respuesta JSON compacta (los datos ya deben venir proyectados)"""
+    return Response(dumps(datos), status=status, mimetype='application/json')
@@ -0,0 +1,383 @@
+"""
+Sesiones del lado del servidor con caché de permisos por usuario.
+
+La cookie lleva solo un identificador aleatorio; los datos de la sesión
+quedan en el almacén elegido con ``SESIONES_BACKEND``:
+
+- ``sqlite``: archivo compartido por todos los workers del equipo
+  (``SESIONES_ARCHIVO``, por defecto ``instance/sesiones.sqlite3``). Borrar
+  una sesión allí la revoca de inmediato en todos los workers.
+- ``memoria``: diccionario del proceso, para ``python app.py`` con un solo
+  proceso.
+- ``cookie``: la cookie firmada de Flask, como antes.
+
+En cada request con usuario se consulta su rol en un diccionario del proceso
+(sin ir a MySQL); un usuario que no está allí (creado, reactivado o con
+login en otro worker después de la última recarga) se consulta una sola vez
+por ID, y la sesión se descarta solo si la base confirma que no está activo.
+El diccionario se recarga completo, con una sola consulta, cada
+``SESIONES_PERMISOS_TTL`` segundos; en esa recarga se revocan en bloque las
+sesiones de los usuarios desactivados (``Usuarios.Estado = 0``) y se
+purgan las vencidas. Un cambio de rol se aplica en la siguiente recarga.
+"""
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+BACKEND_SQLITE = 'sqlite'
+BACKEND_MEMORIA = 'memoria'
+BACKEND_COOKIE = 'cookie'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    sid TEXT PRIMARY KEY,
+    usuario INTEGER,
+    datos TEXT NOT NULL,
+    expira REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sesiones_usuario ON sesiones(usuario);
+CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones(expira);
+"""
+
+
+class AlmacenMemoria:
+    """Sesiones en un diccionario del proceso"""
+
+    def __init__(self):
+        self._datos = {}  # sid -> (usuario, datos, expira)
+        self._lock = threading.Lock()
+
+    def leer(self, sid):
+        """Devuelve ``(datos, expira)`` o None si no existe o venció"""
+        entrada = self._datos.get(sid)
+        if entrada is None or entrada[2] <= time.time():
+            return None
+        return entrada[1], entrada[2]
+
+    def guardar(self, sid, usuario, datos, expira):
+        with self._lock:
+            self._datos[sid] = (usuario, datos, expira)
+
+    def borrar(self, sid):
+        with self._lock:
+            self._datos.pop(sid, None)
+
+    def usuarios(self):
+        """IDs de usuario con al menos una sesión guardada"""
+        with self._lock:
+            return {usuario for usuario, _, _ in self._datos.values() if usuario is not None}
+
+    def revocar_usuarios(self, usuario_ids):
+        ids = set(usuario_ids)
+        with self._lock:
+            revocadas = [sid for sid, (usuario, _, _) in self._datos.items() if usuario in ids]
+            for sid in revocadas:
+                del self._datos[sid]
+        return len(revocadas)
+
+    def purgar(self):
+        ahora = time.time()
+        with self._lock:
+            vencidas = [sid for sid, (_, _, expira) in self._datos.items() if expira <= ahora]
+            for sid in vencidas:
+                del self._datos[sid]
+        return len(vencidas)
+
+    def contar(self):
+        return len(self._datos)
+
+
+class AlmacenSQLite:
+    """Sesiones en un archivo SQLite compartido por los workers del equipo"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+
+    def _conexion(self):
+        # Una conexión por hilo (y por proceso, por si hubo fork después de abrirla)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+            conn = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            # Perder las últimas sesiones ante un corte de luz solo obliga a volver a entrar
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_ESQUEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def leer(self, sid):
+        fila = self._conexion().execute(
+            "SELECT datos, expira FROM sesiones WHERE sid = ? AND expira > ?", (sid, time.time())
+        ).fetchone()
+        return (fila[0], fila[1]) if fila else None
+
+    def guardar(self, sid, usuario, datos, expira):
+        self._conexion().execute(
+            "INSERT OR REPLACE INTO sesiones (sid, usuario, datos, expira) VALUES (?, ?, ?, ?)",
+            (sid, usuario, datos, expira))
+
+    def borrar(self, sid):
+        self._conexion().execute("DELETE FROM sesiones WHERE sid = ?", (sid,))
+
+    def usuarios(self):
+        filas = self._conexion().execute(
+            "SELECT DISTINCT usuario FROM sesiones WHERE usuario IS NOT NULL").fetchall()
+        return {fila[0] for fila in filas}
+
+    def revocar_usuarios(self, usuario_ids):
+        ids = list(usuario_ids)
+        if not ids:
+            return 0
+        return self._conexion().execute(
+            f"DELETE FROM sesiones WHERE usuario IN ({', '.join(['?'] * len(ids))})", ids).rowcount
+
+    def purgar(self):
+        return self._conexion().execute("DELETE FROM sesiones WHERE expira <= ?", (time.time(),)).rowcount
+
+    def contar(self):
+        return self._conexion().execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    """Sesión cuyos datos viven en el almacén; la cookie solo lleva ``sid``"""
+
+    def __init__(self, datos=None, sid=None, expira=None):
+        def al_modificar(sesion):
+            sesion.modified = True
+
+        super().__init__(datos, al_modificar)
+        self.sid = sid
+        self.expira = expira
+        self.usuario_inicial = self.get('user_id')
+        self.modified = False
+
+
+class InterfazSesiones(SessionInterface):
+    """
+    ``SessionInterface`` de Flask sobre un almacén. El identificador cambia
+    al iniciar o cerrar sesión (fijación de sesión) y el vencimiento se
+    renueva cuando pasó la mitad de ``PERMANENT_SESSION_LIFETIME``, para no
+    escribir en el almacén en cada request.
+    """
+
+    serializador = TaggedJSONSerializer()
+
+    def __init__(self, almacen):
+        self.almacen = almacen
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            encontrada = self.almacen.leer(sid)
+            if encontrada is not None:
+                datos, expira = encontrada
+                return SesionServidor(self.serializador.loads(datos), sid, expira)
+        return SesionServidor()
+
+    def save_session(self, app, session, response):
+        nombre = self.get_cookie_name(app)
+        dominio = self.get_cookie_domain(app)
+        ruta = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None:
+                self.almacen.borrar(session.sid)
+                response.delete_cookie(nombre, domain=dominio, path=ruta,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        ahora = time.time()
+        duracion = app.permanent_session_lifetime.total_seconds()
+        rotar = session.sid is None or session.get('user_id') != session.usuario_inicial
+        renovar = session.expira is None or session.expira - ahora < duracion / 2
+        if not (rotar or renovar or session.modified):
+            return
+
+        if rotar:
+            if session.sid is not None:
+                self.almacen.borrar(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+        self.almacen.guardar(session.sid, session.get('user_id'),
+                             self.serializador.dumps(dict(session)), ahora + duracion)
+        if rotar or (renovar and session.permanent):
+            response.set_cookie(nombre, session.sid,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=dominio, path=ruta,
+                                secure=self.get_cookie_secure(app),
+                                samesite=self.get_cookie_samesite(app))
+
+
+_estado = {
+    'mysql': None,
+    'almacen': None,
+    'ttl': 60,
+    'cargado': None,  # time.monotonic() de la última recarga de permisos
+}
+# ID_Usuario -> {'rol_id', 'rol_nombre'} de los usuarios activos; se reemplaza completo en cada recarga
+_permisos = {}
+_recarga_lock = threading.Lock()
+_lock = threading.Lock()
+_stats = {
+    'recargas': 0,
+    'fallos_recarga': 0,
+    'revocadas': 0,
+    'purgadas': 0,
+}
+
+
+def _contar(clave, cantidad=1):
+    with _lock:
+        _stats[clave] += cantidad
+
+
+def recordar_permisos(usuario_id, rol_id, rol_nombre):
+    """Agrega al caché un usuario que acaba de iniciar sesión (puede ser posterior a la última recarga)"""
+    _permisos[usuario_id] = {'rol_id': rol_id, 'rol_nombre': rol_nombre}
+
+
+def recargar_permisos():
+    """Recarga los roles de los usuarios activos y revoca las sesiones de los demás"""
+    global _permisos
+    cur = _estado['mysql'].connection.cursor()
+    cur.execute("""
+        SELECT u.ID_Usuario, u.Rol_ID, r.Nombre_Rol
+        FROM Usuarios u
+        INNER JOIN Roles r ON u.Rol_ID = r.ID_Rol
+        WHERE u.Estado = 1
+    """)
+    _permisos = {fila['ID_Usuario']: {'rol_id': fila['Rol_ID'], 'rol_nombre': fila['Nombre_Rol']}
+                 for fila in cur.fetchall()}
+    cur.close()
+    _estado['cargado'] = time.monotonic()
+    _contar('recargas')
+
+    almacen = _estado['almacen']
+    if almacen is not None:
+        inactivos = almacen.usuarios() - _permisos.keys()
+        if inactivos:
+            _contar('revocadas', almacen.revocar_usuarios(inactivos))
+        _contar('purgadas', almacen.purgar())
+
+
+def _consultar_usuario(usuario_id):
+    """
+    Permisos de un usuario que no está en el caché de este worker (creado o
+    reactivado después de la última recarga, o con login en otro worker).
+    Devuelve None si no está activo; lanza la excepción si no hay MySQL.
+    """
+    cur = _estado['mysql'].connection.cursor()
+    try:
+        cur.execute("""
+            SELECT u.Rol_ID, r.Nombre_Rol
+            FROM Usuarios u
+            INNER JOIN Roles r ON u.Rol_ID = r.ID_Rol
+            WHERE u.ID_Usuario = %s AND u.Estado = 1
+        """, (usuario_id,))
+        fila = cur.fetchone()
+    finally:
+        cur.close()
+    if fila is None:
+        return None
+    permisos = {'rol_id': fila['Rol_ID'], 'rol_nombre': fila['Nombre_Rol']}
+    _permisos[usuario_id] = permisos
+    return permisos
+
+
+def _recargar_si_vencio():
+    cargado = _estado['cargado']
+    if cargado is not None and time.monotonic() - cargado < _estado['ttl']:
+        return
+    # Un solo hilo recarga; los demás siguen con el caché anterior
+    if not _recarga_lock.acquire(blocking=False):
+        return
+    try:
+        recargar_permisos()
+    except Exception as e:
+        # Sin MySQL (p. ej. VENTAS_MODO=diario) el POS sigue con el caché anterior
+        _estado['cargado'] = time.monotonic()
+        _contar('fallos_recarga')
+        current_app.logger.warning('No se pudieron recargar los permisos de sesión: %s', e)
+    finally:
+        _recarga_lock.release()
+
+
+def _validar():
+    usuario_id = session.get('user_id')
+    if usuario_id is None:
+        return
+    _recargar_si_vencio()
+    if _stats['recargas'] == 0:
+        # Nunca se pudo cargar el caché: no hay con qué validar
+        return
+    permisos = _permisos.get(usuario_id)
+    if permisos is None:
+        # Ausente del caché no significa inactivo: se confirma en la base antes de revocar
+        try:
+            permisos = _consultar_usuario(usuario_id)
+        except Exception as e:
+            current_app.logger.warning('No se pudo verificar el usuario %s de la sesión: %s', usuario_id, e)
+            return
+        if permisos is None:
+            session.clear()
+            return
+    if session.get('rol_id') != permisos['rol_id']:
+        session['rol_id'] = permisos['rol_id']
+        session['rol_nombre'] = permisos['rol_nombre']
+
+
+def revocar_usuarios(usuario_ids):
+    """Cierra todas las sesiones de los usuarios indicados y los quita del caché de permisos"""
+    for usuario_id in usuario_ids:
+        _permisos.pop(usuario_id, None)
+    almacen = _estado['almacen']
+    revocadas = almacen.revocar_usuarios(usuario_ids) if almacen is not None else 0
+    _contar('revocadas', revocadas)
+    return revocadas
+
+
+def backend(app=None):
+    valor = (app or current_app).config.get('SESIONES_BACKEND', BACKEND_SQLITE)
+    if valor not in (BACKEND_SQLITE, BACKEND_MEMORIA, BACKEND_COOKIE):
+        raise ValueError(f'SESIONES_BACKEND inválido: {valor}')
+    return valor
+
+
+def metricas():
+    almacen = _estado['almacen']
+    with _lock:
+        datos = dict(_stats)
+    datos['backend'] = backend()
+    datos['usuarios_en_cache'] = len(_permisos)
+    datos['sesiones'] = almacen.contar() if almacen is not None else None
+    return datos
+
+
+def init_app(app, mysql):
+    app.config.setdefault('SESIONES_BACKEND', BACKEND_SQLITE)
+    app.config.setdefault('SESIONES_ARCHIVO', None)
+    app.config.setdefault('SESIONES_PERMISOS_TTL', 60)
+    tipo = backend(app)
+    if tipo == BACKEND_SQLITE:
+        _estado['almacen'] = AlmacenSQLite(app.config['SESIONES_ARCHIVO'] or
+                                           os.path.join(app.instance_path, 'sesiones.sqlite3'))
+    elif tipo == BACKEND_MEMORIA:
+        _estado['almacen'] = AlmacenMemoria()
+    if _estado['almacen'] is not None:
+        app.session_interface = InterfazSesiones(_estado['almacen'])
+    _estado['mysql'] = mysql
+    _estado['ttl'] = app.config['SESIONES_PERMISOS_TTL']
+    app.before_request(_validar)
@@ -0,0 +1,116 @@
+"""
+Ruta única de mutación de existencias.
+
+``STOCK_MODO`` decide quién actualiza ``Productos.Existencias`` e
+``Inventario_Bodega`` al registrar ventas y movimientos:
+
+- ``aplicacion`` (por defecto): las vistas aplican las actualizaciones por
+  lotes y la base NO debe tener los triggers de stock
+  (``scripts/07_stock_modo_aplicacion.sql`` los elimina).
+- ``triggers``: lo hace el trigger de ``scripts/03_triggers.sql`` y las
+  vistas solo insertan los detalles.
+
+``reconciliar`` detecta (y opcionalmente corrige) diferencias entre las
+existencias globales y la suma por bodega.
+"""
+from flask import current_app
+
+from utils import versiones
+
+MODO_APLICACION = 'aplicacion'
+MODO_TRIGGERS = 'triggers'
+
+TRIGGERS_STOCK = (
+    'after_detalle_factura_insert',
+    'after_detalle_movimiento_insert',
+    'after_movimiento_update_bodega',
+)
+
+
+def modo():
+    valor = current_app.config.get('STOCK_MODO', MODO_APLICACION)
+    if valor not in (MODO_APLICACION, MODO_TRIGGERS):
+        raise ValueError(f'STOCK_MODO inválido: {valor}')
+    return valor
+
+
+def por_aplicacion():
+    """True si las vistas deben aplicar ellas mismas los cambios de stock"""
+    return modo() == MODO_APLICACION
+
+
+def triggers_instalados(cur):
+    cur.execute(f"""
+        SELECT TRIGGER_NAME
+        FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE()
+        AND TRIGGER_NAME IN ({', '.join(['%s'] * len(TRIGGERS_STOCK))})
+    """, TRIGGERS_STOCK)
+    return sorted(fila['TRIGGER_NAME'] for fila in cur.fetchall())
+
+
+def reconciliar(conn, reparar=False):
+    """
+    Compara ``Productos.Existencias`` con la suma de ``Inventario_Bodega``.
+    Con ``reparar`` toma el detalle por bodega como fuente de verdad y ajusta
+    las existencias globales. Devuelve un dict con el reporte.
+    """
+    cur = conn.cursor()
+    try:
+        instalados = triggers_instalados(cur)
+
+        cur.execute("""
+            SELECT p.ID_Producto, p.Descripcion, p.Existencias,
+                   COALESCE(b.Suma_Bodegas, 0) as Suma_Bodegas,
+                   p.Existencias - COALESCE(b.Suma_Bodegas, 0) as Diferencia
+            FROM Productos p
+            LEFT JOIN (
+                SELECT ID_Producto, SUM(Existencias) as Suma_Bodegas
+                FROM Inventario_Bodega
+                GROUP BY ID_Producto
+            ) b ON p.ID_Producto = b.ID_Producto
+            WHERE p.Existencias <> COALESCE(b.Suma_Bodegas, 0)
+            ORDER BY ABS(p.Existencias - COALESCE(b.Suma_Bodegas, 0)) DESC
+        """)
+        diferencias = list(cur.fetchall())
+
+        reparados = 0
+        if reparar and diferencias:
+            cur.execute("""
+                UPDATE Productos p
+                LEFT JOIN (
+                    SELECT ID_Producto, SUM(Existencias) as Suma_Bodegas
+                    FROM Inventario_Bodega
+                    GROUP BY ID_Producto
+                ) b ON p.ID_Producto = b.ID_Producto
+                SET p.Existencias = COALESCE(b.Suma_Bodegas, 0)
+                WHERE p.Existencias <> COALESCE(b.Suma_Bodegas, 0)
+            """)
+            reparados = cur.rowcount
+            conn.commit()
+            versiones.incrementar(conn, versiones.PRODUCTOS)
+
+        advertencias = []
+        if modo() == MODO_APLICACION and instalados:
+            advertencias.append(
+                'STOCK_MODO=aplicacion pero hay triggers de stock instalados (' + ', '.join(instalados) +
+                '): cada movimiento se descuenta dos veces. Ejecutar scripts/07_stock_modo_aplicacion.sql'
+            )
+        elif modo() == MODO_TRIGGERS and instalados != ['after_detalle_movimiento_insert']:
+            advertencias.append(
+                'STOCK_MODO=triggers requiere solo after_detalle_movimiento_insert (instalados: ' +
+                (', '.join(instalados) or 'ninguno') + '). Ejecutar scripts/03_triggers.sql'
+            )
+
+        return {
+            'modo': modo(),
+            'triggers': instalados,
+            'diferencias': diferencias,
+            'reparados': reparados,
+            'advertencias': advertencias,
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
@@ -0,0 +1,390 @@
+"""
+Cola de trabajos en segundo plano para las operaciones pesadas de
+administración (exportaciones, importación masiva, reconstrucción de
+resúmenes y reconciliación de stock).
+
+Los trabajos se guardan en la tabla ``Trabajos`` (scripts/11_trabajos.sql)
+y los ejecuta un proceso aparte (``flask --app app trabajador``): los
+workers web solo encolan y consultan el estado. Cada trabajador toma el
+siguiente pendiente con ``FOR UPDATE SKIP LOCKED``, así que pueden correr
+varios a la vez sin tomar el mismo trabajo.
+
+Las tareas se registran con el decorador ``tarea`` y reciben un
+``Contexto``. ``contexto.progreso()`` solo anota el avance en memoria; un
+hilo de latido lo escribe cada ``TRABAJOS_LATIDO`` segundos por una
+conexión propia y de paso lee si un administrador pidió cancelar, en cuyo
+caso la siguiente llamada a ``progreso()`` lanza ``TrabajoCancelado``. Los
+trabajos en curso sin latido por más de ``TRABAJOS_ABANDONO`` segundos
+(trabajador caído) se marcan con error.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = 'PENDIENTE'
+EN_CURSO = 'EN_CURSO'
+TERMINADO = 'TERMINADO'
+ERROR = 'ERROR'
+CANCELADO = 'CANCELADO'
+FINALES = (TERMINADO, ERROR, CANCELADO)
+
+_tareas = {}
+
+
+class TrabajoCancelado(Exception):
+    """Un administrador pidió cancelar el trabajo en curso"""
+
+
+class TareaDesconocida(ValueError):
+    """El tipo de trabajo no está registrado"""
+
+
+def tarea(nombre, descripcion, parametros=(), con_archivo=False):
+    """
+    Registra una tarea. ``parametros`` son los nombres que se aceptan al
+    encolarla desde la web (el resto se descarta); con ``con_archivo`` la
+    tarea recibe en ``parametros['archivo']`` el nombre del archivo subido,
+    guardado en ``directorio()``.
+    """
+    def registrar(funcion):
+        _tareas[nombre] = {'funcion': funcion, 'descripcion': descripcion,
+                           'parametros': tuple(parametros), 'con_archivo': con_archivo}
+        return funcion
+    return registrar
+
+
+def tareas():
+    return {nombre: datos['descripcion'] for nombre, datos in _tareas.items()}
+
+
+def parametros_permitidos(tipo):
+    if tipo not in _tareas:
+        raise TareaDesconocida(f'Tipo de trabajo desconocido: {tipo}')
+    return _tareas[tipo]['parametros']
+
+
+def requiere_archivo(tipo):
+    parametros_permitidos(tipo)
+    return _tareas[tipo]['con_archivo']
+
+
+def directorio():
+    """Directorio de archivos de entrada y resultados de los trabajos"""
+    ruta = current_app.config.get('TRABAJOS_DIR') or os.path.join(current_app.instance_path, 'trabajos')
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def _decodificar(fila):
+    if fila is None:
+        return None
+    fila['Parametros'] = json.loads(fila['Parametros']) if fila.get('Parametros') else {}
+    fila['Resultado'] = json.loads(fila['Resultado']) if fila.get('Resultado') else None
+    return fila
+
+
+def encolar(conn, tipo, parametros=None, usuario_id=None):
+    """Inserta un trabajo pendiente y devuelve su ID"""
+    parametros_permitidos(tipo)
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            INSERT INTO Trabajos (Tipo, Parametros, ID_Usuario)
+            VALUES (%s, %s, %s)
+        """, (tipo, json.dumps(parametros or {}), usuario_id))
+        trabajo_id = cur.lastrowid
+        conn.commit()
+        return trabajo_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def obtener(cur, trabajo_id):
+    cur.execute("""
+        SELECT t.*, u.NombreUsuario
+        FROM Trabajos t
+        LEFT JOIN Usuarios u ON t.ID_Usuario = u.ID_Usuario
+        WHERE t.ID_Trabajo = %s
+    """, (trabajo_id,))
+    return _decodificar(cur.fetchone())
+
+
+def listar(cur, limite=50):
+    cur.execute("""
+        SELECT t.ID_Trabajo, t.Tipo, t.Estado, t.Progreso, t.Mensaje, t.Archivo,
+               t.Fecha_Creacion, t.Fecha_Inicio, t.Fecha_Fin, u.NombreUsuario
+        FROM Trabajos t
+        LEFT JOIN Usuarios u ON t.ID_Usuario = u.ID_Usuario
+        ORDER BY t.ID_Trabajo DESC
+        LIMIT %s
+    """, (limite,))
+    return cur.fetchall()
+
+
+def cancelar(conn, trabajo_id):
+    """
+    Cancela un trabajo pendiente de inmediato; uno en curso se marca para
+    que el trabajador lo detenga en su próximo avance. Devuelve False si el
+    trabajo ya había terminado.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE Trabajos
+            SET Estado = 'CANCELADO', Mensaje = 'Cancelado antes de iniciar', Fecha_Fin = NOW()
+            WHERE ID_Trabajo = %s AND Estado = 'PENDIENTE'
+        """, (trabajo_id,))
+        afectados = cur.rowcount
+        if not afectados:
+            cur.execute("UPDATE Trabajos SET Cancelar = 1 WHERE ID_Trabajo = %s AND Estado = 'EN_CURSO'",
+                        (trabajo_id,))
+            afectados = cur.rowcount
+        conn.commit()
+        return afectados > 0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# --- Ejecución ------------------------------------------------------------
+
+class Contexto:
+    """Lo que recibe cada tarea: parámetros, avance y archivo de resultado"""
+
+    def __init__(self, trabajo):
+        self.trabajo_id = trabajo['ID_Trabajo']
+        self.parametros = trabajo['Parametros']
+        self.usuario_id = trabajo['ID_Usuario']
+        self.archivo_resultado = None
+        self._avance = (None, None)
+        self._cancelado = threading.Event()
+
+    def progreso(self, porcentaje=None, mensaje=None):
+        """Anota el avance (0-100) y lanza TrabajoCancelado si se pidió cancelar"""
+        if porcentaje is not None:
+            porcentaje = max(0, min(100, int(porcentaje)))
+        self._avance = (porcentaje, mensaje[:500] if mensaje else None)
+        if self._cancelado.is_set():
+            raise TrabajoCancelado()
+
+    def archivo(self, nombre):
+        """Ruta donde escribir el resultado descargable del trabajo"""
+        self.archivo_resultado = f'{self.trabajo_id}_{nombre}'
+        return os.path.join(directorio(), self.archivo_resultado)
+
+    def _sincronizar(self, conn):
+        porcentaje, mensaje = self._avance
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                UPDATE Trabajos
+                SET Progreso = COALESCE(%s, Progreso), Mensaje = COALESCE(%s, Mensaje), Latido = NOW()
+                WHERE ID_Trabajo = %s
+            """, (porcentaje, mensaje, self.trabajo_id))
+            cur.execute("SELECT Cancelar FROM Trabajos WHERE ID_Trabajo = %s", (self.trabajo_id,))
+            fila = cur.fetchone()
+            conn.commit()
+        finally:
+            cur.close()
+        if fila and fila['Cancelar']:
+            self._cancelado.set()
+
+
+class _Latido(threading.Thread):
+    def __init__(self, conn, contexto, intervalo):
+        super().__init__(name=f'latido-trabajo-{contexto.trabajo_id}', daemon=True)
+        self._conn = conn
+        self._contexto = contexto
+        self._intervalo = intervalo
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self._intervalo):
+            try:
+                self._contexto._sincronizar(self._conn)
+            except Exception:
+                logger.exception('No se pudo registrar el avance del trabajo %s', self._contexto.trabajo_id)
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+
+def _marcar_abandonados(conn, segundos):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE Trabajos
+            SET Estado = 'ERROR', Mensaje = 'El trabajador se detuvo sin terminar el trabajo', Fecha_Fin = NOW()
+            WHERE Estado = 'EN_CURSO' AND Latido < NOW() - INTERVAL %s SECOND
+        """, (segundos,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
+
+
+def _tomar_siguiente(conn, trabajador):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT ID_Trabajo
+            FROM Trabajos
+            WHERE Estado = 'PENDIENTE'
+            ORDER BY ID_Trabajo
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        fila = cur.fetchone()
+        if fila is None:
+            conn.commit()
+            return None
+        cur.execute("""
+            UPDATE Trabajos
+            SET Estado = 'EN_CURSO', Fecha_Inicio = NOW(), Latido = NOW(), Trabajador = %s
+            WHERE ID_Trabajo = %s
+        """, (trabajador, fila['ID_Trabajo']))
+        conn.commit()
+        return obtener(cur, fila['ID_Trabajo'])
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _finalizar(conn, contexto, estado, mensaje, resultado=None):
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            UPDATE Trabajos
+            SET Estado = %s, Mensaje = %s, Resultado = %s, Archivo = %s, Fecha_Fin = NOW(), Latido = NOW(),
+                Progreso = CASE WHEN %s = 'TERMINADO' THEN 100 ELSE Progreso END
+            WHERE ID_Trabajo = %s
+        """, (estado, mensaje[:500], json.dumps(resultado, default=str) if resultado is not None else None,
+              contexto.archivo_resultado if estado == TERMINADO else None, estado, contexto.trabajo_id))
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def ejecutar(app, control, trabajo, intervalo):
+    """Corre un trabajo ya tomado en su propio contexto de aplicación"""
+    contexto = Contexto(trabajo)
+    latido = _Latido(control, contexto, intervalo)
+    latido.start()
+    resultado = None
+    try:
+        tarea_registrada = _tareas.get(trabajo['Tipo'])
+        if tarea_registrada is None:
+            raise TareaDesconocida(f"Tipo de trabajo desconocido: {trabajo['Tipo']}")
+        # Contexto nuevo por trabajo: su conexión del pool se devuelve (con rollback) al terminar
+        with app.app_context():
+            resultado = tarea_registrada['funcion'](contexto)
+        estado, mensaje = TERMINADO, 'Terminado'
+    except TrabajoCancelado:
+        estado, mensaje = CANCELADO, 'Cancelado por el usuario'
+    except Exception as e:
+        logger.exception('Falló el trabajo %s (%s)', trabajo['ID_Trabajo'], trabajo['Tipo'])
+        estado, mensaje = ERROR, str(e) or e.__class__.__name__
+    finally:
+        latido.detener()
+
+    if estado != TERMINADO and contexto.archivo_resultado:
+        # Resultado parcial: no se ofrece para descarga
+        with app.app_context():
+            ruta = os.path.join(directorio(), contexto.archivo_resultado)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+    _finalizar(control, contexto, estado, mensaje, resultado)
+    return estado
+
+
+def trabajador(mysql, una_vez=False):
+    """
+    Bucle del proceso trabajador: toma y ejecuta trabajos de a uno. SIGTERM
+    termina el trabajo actual y sale; con ``una_vez`` sale cuando no quedan
+    pendientes.
+    """
+    app = current_app._get_current_object()
+    espera = app.config['TRABAJOS_ESPERA']
+    nombre = f'{socket.gethostname()}:{os.getpid()}'
+    detener = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: detener.set())
+
+    def reconectar(anterior):
+        mysql.pool.devolver(anterior, descartar=True)
+        nueva = None
+        while nueva is None and not detener.wait(espera):
+            try:
+                nueva = mysql.pool.obtener()
+            except Exception:
+                logger.exception('No se pudo reconectar a la base')
+        return nueva
+
+    # Conexión de control (toma, latido y cierre), separada de la que usan las tareas
+    entrada = mysql.pool.obtener()
+    try:
+        while not detener.is_set():
+            try:
+                abandonados = _marcar_abandonados(entrada.conn, app.config['TRABAJOS_ABANDONO'])
+                if abandonados:
+                    logger.warning('%s trabajos abandonados marcados con error', abandonados)
+                trabajo = _tomar_siguiente(entrada.conn, nombre)
+            except Exception:
+                logger.exception('Error al consultar la cola de trabajos; se reconecta')
+                entrada = reconectar(entrada)
+                continue
+
+            if trabajo is None:
+                if una_vez:
+                    break
+                detener.wait(espera)
+                continue
+
+            logger.info('Trabajo %s (%s) iniciado', trabajo['ID_Trabajo'], trabajo['Tipo'])
+            try:
+                estado = ejecutar(app, entrada.conn, trabajo, app.config['TRABAJOS_LATIDO'])
+            except Exception:
+                # No se pudo registrar el final: sin latido, el trabajo queda
+                # como abandonado y _marcar_abandonados lo cierra con error
+                logger.exception('No se pudo cerrar el trabajo %s; se reconecta', trabajo['ID_Trabajo'])
+                entrada = reconectar(entrada)
+                continue
+            logger.info('Trabajo %s: %s', trabajo['ID_Trabajo'], estado)
+    finally:
+        if entrada is not None:
+            mysql.pool.devolver(entrada)
+
+
+class CursorConAvance:
+    """
+    Envuelve un cursor sin buffer e informa el avance al contexto en cada
+    ``fetchmany``, para usarlo con las funciones de utils/exportacion.py
+    """
+
+    def __init__(self, cursor, contexto, total, etiqueta='filas'):
+        self._cursor = cursor
+        self._contexto = contexto
+        self._total = total
+        self._etiqueta = etiqueta
+        self.leidas = 0
+
+    def fetchmany(self, cantidad):
+        filas = self._cursor.fetchmany(cantidad)
+        self.leidas += len(filas)
+        self._contexto.progreso(self.leidas * 100 / self._total if self._total else None,
+                                f'{self.leidas} de {self._total} {self._etiqueta}')
+        return filas
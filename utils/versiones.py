@@ -0,0 +1,73 @@
+"""
+Contadores de versión de los datos (tabla ``Versiones_Datos``,
+scripts/13_versiones_datos.sql).
+
+Las vistas y procesos que escriben productos, movimientos o tablas de
+referencia llaman a ``incrementar`` después del commit: quien lea la
+versión nueva ya ve los datos nuevos, y un fragmento armado con datos más
+nuevos que su versión solo se vuelve a armar antes de lo necesario. El
+incremento es una sentencia aparte y breve, para no retener el lock de la
+fila durante la transacción de una venta.
+
+``obtener`` las lee con una caché local de ``VERSIONES_TTL`` segundos (por
+defecto 1) que ``incrementar`` descarta en el worker que escribió.
+"""
+import logging
+import threading
+from datetime import datetime, timezone
+
+from flask import current_app
+
+from utils.cache import TTLCache
+from utils.db_helpers import execute_query
+
+logger = logging.getLogger(__name__)
+
+PRODUCTOS = 'productos'        # altas, cambios y bajas de productos, ajustes de existencias
+MOVIMIENTOS = 'movimientos'    # ventas, entradas, salidas y traslados (cambian existencias)
+CATALOGOS = 'catalogos'        # categorías, unidades y proveedores (nombres en los listados)
+
+_cache = None
+_lock = threading.Lock()
+
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = TTLCache(ttl=current_app.config.get('VERSIONES_TTL', 1), maxsize=1)
+    return _cache
+
+
+def incrementar(conn, *nombres):
+    """
+    Incrementa las versiones indicadas. Se llama con los datos ya
+    confirmados; si falla solo se registra (las cachés vencen por TTL).
+    """
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute(f"""
+                UPDATE Versiones_Datos SET Version = Version + 1
+                WHERE Nombre IN ({', '.join(['%s'] * len(nombres))})
+            """, nombres)
+            conn.commit()
+        finally:
+            cur.close()
+    except Exception:
+        logger.exception('No se pudieron incrementar las versiones %s', ', '.join(nombres))
+    if _cache is not None:
+        _cache.invalidar('versiones')
+
+
+def obtener():
+    """``{nombre: {'version', 'modificada'}}`` de todos los contadores (``modificada`` en UTC)"""
+    return _get_cache().get_or_load('versiones', lambda: {
+        fila['Nombre']: {'version': fila['Version'],
+                         'modificada': datetime.fromtimestamp(float(fila['Modificada']), timezone.utc)}
+        for fila in execute_query("""
+            SELECT Nombre, Version, UNIX_TIMESTAMP(Fecha_Modificacion) as Modificada
+            FROM Versiones_Datos
+        """, fetch_all=True)
+    })